@@ -8,16 +8,22 @@ App settings can be configured in System > SDK Data."""
 
 from csclient import EventingCSClient
 from speedtest import Speedtest
+from result_cache import ResultCache
+from state_wait import wait_for_state
 import time
 import datetime
 import json
+import os
 
 defaults = {
     "MIN_DOWNLOAD_SPD": 0.0,  # Mbps
     "MIN_UPLOAD_SPD": 0.0,  # Mbps
     "SCHEDULE": 0,  # Run AutoInstall every {SCHEDULE} minutes. 0 = Only run on boot.
     "NUM_ACTIVE_SIMS": 0,  # Number of fastest (download) SIMs to keep active.  0 = all; do not disable SIMs
-    "ONLY_RUN_ONCE": False  # True means do not run if AutoInstall has been run on this device before.
+    "ONLY_RUN_ONCE": False,  # True means do not run if AutoInstall has been run on this device before.
+    "CACHE_TTL": 1440,  # Minutes to reuse a SIM's results while its cell and signal are unchanged. 0 = always test.
+    "RETEST_RSRP_DELTA": 6,  # Re-test a SIM if its RSRP changed by more than this many dB.
+    "RETEST_SINR_DELTA": 5  # Re-test a SIM if its SINR changed by more than this many dB.
 }
 
 class AutoInstallException(Exception):
@@ -47,6 +53,9 @@ class AutoInstall(object):
     SCHEDULE = 0  # Run AutoInstall every {SCHEDULE} minutes. 0 = Only run on boot.
     NUM_ACTIVE_SIMS = 0  # Number of fastest (download) SIMs to keep active.  0 = all; do not disable SIMs
     ONLY_RUN_ONCE = False  # True means do not run if AutoInstall has been run on this device before.
+    CACHE_TTL = 1440  # Minutes to reuse a SIM's results while its cell and signal are unchanged. 0 = always test.
+    RETEST_RSRP_DELTA = 6  # Re-test a SIM if its RSRP changed by more than this many dB.
+    RETEST_SINR_DELTA = 5  # Re-test a SIM if its SINR changed by more than this many dB.
 
     STATUS_DEVS_PATH = '/status/wan/devices'
     CFG_RULES2_PATH = '/config/wan/rules2'
@@ -54,11 +63,13 @@ class AutoInstall(object):
     API_URL = 'https://www.cradlepointecm.com/api/v2'
     CONNECTION_STATE_TIMEOUT = 15 * 60  # 7 Min
     NETPERF_TIMEOUT = 5 * 60  # 5 Min
+    RESULT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result_cache.json')
     sims = {}
 
     def __init__(self):
         self.client = EventingCSClient('AutoInstall')
         self.speedtest = Speedtest()
+        self.result_cache = ResultCache(self.RESULT_CACHE_FILE, log=self.client.log)
 
     def get_config(self, name):
         """Return config from /config/system/sdk/appdata."""
@@ -75,6 +86,11 @@ class AutoInstall(object):
         self.SCHEDULE = config["SCHEDULE"]
         self.NUM_ACTIVE_SIMS = config["NUM_ACTIVE_SIMS"]
         self.ONLY_RUN_ONCE = config["ONLY_RUN_ONCE"]
+        self.CACHE_TTL = config.get("CACHE_TTL", defaults["CACHE_TTL"])
+        self.RETEST_RSRP_DELTA = config.get("RETEST_RSRP_DELTA", defaults["RETEST_RSRP_DELTA"])
+        self.RETEST_SINR_DELTA = config.get("RETEST_SINR_DELTA", defaults["RETEST_SINR_DELTA"])
+        self.result_cache.ttl = self.CACHE_TTL * 60
+        self.result_cache.thresholds = {"RSRP": self.RETEST_RSRP_DELTA, "SINR": self.RETEST_SINR_DELTA}
         return
 
     def check_if_run_before(self):
@@ -209,21 +225,12 @@ class AutoInstall(object):
 
     def modem_state(self, sim, state):
         """Blocking call that will wait until a given state is shown as the modem's status."""
-        timeout_counter = 0
-        sleep_seconds = 0
         conn_path = '%s/%s/status/connection_state' % (self.STATUS_DEVS_PATH, sim)
         self.client.log(f'Connecting {self.port_sim(sim)}')
-        while True:
-            sleep_seconds += 5
-            conn_state = self.client.get(conn_path)
-            self.client.log(f'Waiting for {self.port_sim(sim)} to connect.  Current State={conn_state}')
-            if conn_state == state:
-                break
-            if timeout_counter > self.CONNECTION_STATE_TIMEOUT:
-                self.client.log(f'Timeout waiting on {self.port_sim(sim)}')
-                raise Timeout(conn_path)
-            time.sleep(min(sleep_seconds, 45))
-            timeout_counter += sleep_seconds
+        self.client.log(f'Waiting for {self.port_sim(sim)} to connect.  Current State={self.client.get(conn_path)}')
+        if not wait_for_state(self.client, conn_path, state, timeout=self.CONNECTION_STATE_TIMEOUT):
+            self.client.log(f'Timeout waiting on {self.port_sim(sim)}')
+            raise Timeout(conn_path)
         self.client.log(f'{self.port_sim(sim)} connected.')
         return True
 
@@ -250,6 +257,33 @@ class AutoInstall(object):
         self.client.log(f'Speedtest complete for {sim}.')
         return down, up
 
+    def use_cached_result(self, device, diagnostics=None):
+        """Reuse cached speedtest results if the SIM's cell and signal have not changed.  Returns True if used.
+
+        Without diagnostics, only a connected SIM is looked up, using freshly read diagnostics."""
+        if diagnostics is None:
+            if self.client.get(f'{self.STATUS_DEVS_PATH}/{device}/status/connection_state') != 'connected':
+                return False
+            diagnostics = self.client.get(f'{self.STATUS_DEVS_PATH}/{device}/diagnostics') or {}
+        cached = self.result_cache.lookup(diagnostics)
+        if not cached:
+            return False
+        self.sims[device]['diagnostics'] = diagnostics
+        self.sims[device]['download'], self.sims[device]['upload'] = cached["download"], cached["upload"]
+        self.client.log(
+            f'Cached Results: {self.port_sim(device)} TCP Download: {cached["download"]}Mbps TCP Upload: '
+            f'{cached["upload"]}Mbps from {int((time.time() - cached["time"]) / 60)} minutes ago')
+        return True
+
+    def meets_minimums(self, device):
+        """Verify minimum speeds of a tested SIM."""
+        if self.sims[device].get('download', 0.0) > self.MIN_DOWNLOAD_SPD and \
+                self.sims[device].get('upload', 0.0) > self.MIN_UPLOAD_SPD:
+            return True
+        else:  # Did not meet minimums
+            self.client.log(f'{self.port_sim(device)} Failed to meet minimums! MIN_DOWNLOAD_SPD: {self.MIN_DOWNLOAD_SPD} MIN_UPLOAD_SPD: {self.MIN_UPLOAD_SPD}')
+            return False
+
     def test_sim(self, device):
         """Get diagnostics, run speedtests, and verify minimums."""
         try:
@@ -261,19 +295,15 @@ class AutoInstall(object):
                 self.client.log(
                     f'Modem Diagnostics: {self.port_sim(device)} RSRP:{diagnostics.get("RSRP")}')
 
-                # Do speedtest and log results
-                self.sims[device]['download'], self.sims[device]['upload'] = self.do_speedtest(device)
-                self.client.log(
-                    f'Speedtest Results: {self.port_sim(device)} TCP Download: '
-                    f'{self.sims[device]["download"]}Mbps TCP Upload: {self.sims[device]["upload"]}Mbps')
-
-                # Verify minimum speeds
-                if self.sims[device].get('download', 0.0) > self.MIN_DOWNLOAD_SPD and \
-                        self.sims[device].get('upload', 0.0) > self.MIN_UPLOAD_SPD:
-                    return True
-                else:  # Did not meet minimums
-                    self.client.log(f'{self.port_sim(device)} Failed to meet minimums! MIN_DOWNLOAD_SPD: {self.MIN_DOWNLOAD_SPD} MIN_UPLOAD_SPD: {self.MIN_UPLOAD_SPD}')
-                    return False
+                # Do speedtest and log results, unless nothing changed since the last one
+                if not self.use_cached_result(device, diagnostics):
+                    self.sims[device]['download'], self.sims[device]['upload'] = self.do_speedtest(device)
+                    self.result_cache.store(diagnostics, self.sims[device]['download'], self.sims[device]['upload'])
+                    self.client.log(
+                        f'Speedtest Results: {self.port_sim(device)} TCP Download: '
+                        f'{self.sims[device]["download"]}Mbps TCP Upload: {self.sims[device]["upload"]}Mbps')
+
+                return self.meets_minimums(device)
         except Timeout:
             message = f'Timed out running speedtest on {self.port_sim(device)}'
             self.client.log(message)
@@ -351,20 +381,26 @@ class AutoInstall(object):
             if self.test_sim(primary_device):
                 success = True
 
-        # Disable all wan rules
-        wan_rules = self.client.get('config/wan/rules2')
-        for i, uid in enumerate(wan_rules):
-            self.client.put(f'config/wan/rules2/{i}/disabled', True)
-        time.sleep(5)
+        # Reuse cached results of SIMs whose cell and signal have not changed, without switching to them
+        for sim in self.sims:
+            if sim != primary_device and self.use_cached_result(sim) and self.meets_minimums(sim):
+                success = True
+        untested = [sim for sim in self.sims if not self.sims[sim].get('download')]
+
+        if untested:
+            # Disable all wan rules
+            wan_rules = self.client.get('config/wan/rules2')
+            for i, uid in enumerate(wan_rules):
+                self.client.put(f'config/wan/rules2/{i}/disabled', True)
+            time.sleep(5)
 
         # test remaining SIMs
-        for sim in self.sims:
-            if not self.sims[sim].get('download'):
-                rule_id = self.client.get(f'status/wan/devices/{sim}/config/_id_')
-                self.client.put(f'config/wan/rules2/{rule_id}/disabled', False)
-                if self.test_sim(sim):
-                    success = True
-                self.client.put(f'config/wan/rules2/{rule_id}/disabled', True)
+        for sim in untested:
+            rule_id = self.client.get(f'status/wan/devices/{sim}/config/_id_')
+            self.client.put(f'config/wan/rules2/{rule_id}/disabled', False)
+            if self.test_sim(sim):
+                success = True
+            self.client.put(f'config/wan/rules2/{rule_id}/disabled', True)
 
         # Prioritizes SIMs based on download speed
         sorted_results = sorted(self.sims, key=lambda x: int(self.sims[x]['download']), reverse=True)  # Sort by download speed
@@ -431,8 +467,12 @@ if __name__ == '__main__':
         # RUN AUTOINSTALL:
         manual_test(None, None)
 
-        # Sleep forever / wait for manual tests:
+        # Sleep forever / wait for manual tests, re-running every SCHEDULE minutes:
+        last_run = time.time()
         while True:
+            if autoinstall.SCHEDULE and time.time() - last_run >= autoinstall.SCHEDULE * 60:
+                last_run = time.time()
+                manual_test(None, None)
             time.sleep(1)
     except Exception as err:
         autoinstall.client.log(f"Failed with exception={type(err)} err={str(err)}")
@@ -0,0 +1,101 @@
+"""Persisted per-SIM speedtest results for skipping redundant re-tests.
+
+Results are keyed by ICCID and serving cell ID.  A cached result is reused
+while it is younger than the TTL and the SIM's signal metrics have not moved
+beyond the configured thresholds since it was measured; otherwise the SIM
+must be tested again.  The cache file is replaced atomically on each store.
+"""
+
+from threading import Lock
+import json
+import os
+import time
+
+DEFAULT_THRESHOLDS = {"RSRP": 6, "SINR": 5}  # dB change that forces a re-test
+
+
+def cache_key(diagnostics):
+    """Return ICCID:CELL_ID key for modem diagnostics, or None if either is unknown."""
+    iccid = (diagnostics or {}).get('ICCID')
+    cell_id = (diagnostics or {}).get('CELL_ID')
+    if not iccid or cell_id in (None, ''):
+        return None
+    return f'{iccid}:{cell_id}'
+
+
+class ResultCache:
+    """Per-ICCID/cell-ID speedtest results with TTL and signal change thresholds."""
+
+    def __init__(self, path=None, ttl=24 * 60 * 60, thresholds=None, log=print):
+        self.path = path
+        self.ttl = ttl
+        self.thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+        self.log = log
+        self.entries = {}
+        self._lock = Lock()
+        self._load()
+
+    def lookup(self, diagnostics):
+        """Return cached {"download", "upload", "time", ...} still valid for diagnostics, or None."""
+        key = cache_key(diagnostics)
+        if key is None or not self.ttl:
+            return None
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None or time.time() - entry["time"] > self.ttl:
+            return None
+        for metric, threshold in self.thresholds.items():
+            then, now = entry["signal"].get(metric), diagnostics.get(metric)
+            if then is None and now is None:
+                continue
+            try:
+                if abs(float(now) - float(then)) > threshold:
+                    return None
+            except (TypeError, ValueError):
+                return None
+        return entry
+
+    def store(self, diagnostics, download, upload):
+        """Cache download/upload (Mbps) measured with diagnostics and save."""
+        key = cache_key(diagnostics)
+        if key is None:
+            return
+        entry = {"download": download, "upload": upload, "time": time.time(),
+                 "signal": {metric: diagnostics.get(metric) for metric in self.thresholds}}
+        with self._lock:
+            self.entries[key] = entry
+            self._expire()
+        self.save()
+
+    def save(self):
+        """Write entries to path atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self.entries)
+        tmp = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp, 'w') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self.log(f'Unable to save result cache to {self.path}: {e}')
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        now = time.time()
+        for key in [k for k, v in self.entries.items() if now - v["time"] > self.ttl]:
+            del self.entries[key]
+
+    def _load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            self.log(f'Unable to load result cache from {self.path}: {e}')
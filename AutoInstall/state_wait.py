@@ -0,0 +1,95 @@
+"""Wait for config store values (i.e. a modem's connection_state) to reach a state.
+
+Registers for change events on the paths so a wait returns as soon as the value
+flips, and re-reads the paths every poll_interval seconds in case events are
+unavailable or missed.  Takes the EventingCSClient as an argument so csclient.py
+stays identical across apps.
+"""
+
+import sys
+import threading
+import time
+
+# EventingCSClient.register() allocates event ids without a lock, so waits started
+# from several threads register and unregister one at a time.
+_register_lock = threading.Lock()
+
+
+def wait_for_state(client, path, predicate, timeout=None, poll_interval=2):
+    """
+    Blocks until the value at path satisfies predicate.
+
+    Args:
+        client: EventingCSClient used to read and register for path.
+        path: String representing a path to a resource on a router tree,
+              (i.e. '/status/wan/devices/mdm-xyz/status/connection_state').
+        predicate: Function called with the current value, or a value to compare the current value with.
+        timeout: Seconds to wait. None waits forever.
+        poll_interval: Seconds between reads when no change event arrives.
+
+    Returns:
+        True if the state was reached, False on timeout.
+
+    """
+    return path in wait_for_states(client, [path], predicate, timeout, poll_interval)
+
+
+def wait_for_states(client, paths, predicate, timeout=None, poll_interval=2, count=None):
+    """
+    Blocks until the values at several paths (i.e. one per SIM) satisfy predicate.
+
+    Args:
+        client: EventingCSClient used to read and register for paths.
+        paths: List of paths to wait on.
+        predicate: Function called with the current value, or a value to compare the current value with.
+        timeout: Seconds to wait. None waits forever.
+        poll_interval: Seconds between reads when no change event arrives.
+        count: Return once this many paths have reached the state. Default is all of them.
+
+    Returns:
+        A dictionary of path: value for each path that reached the state.
+
+    """
+    if not callable(predicate):
+        expected = predicate
+        predicate = lambda value: value == expected
+    paths = list(paths)
+    count = len(paths) if count is None else count
+    changed = threading.Event()
+
+    def on_change(path, value, args):
+        changed.set()
+
+    eids = []
+    if 'linux' in sys.platform:
+        with _register_lock:
+            for path in paths:
+                try:
+                    client.register('put', path, on_change)
+                except Exception as e:
+                    client.log(f'Unable to register for changes to {path}, polling instead: {e}')
+            eids = [eid for eid, reg in list(client.registry.items()) if reg['cb'] is on_change]
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    reached = {}
+    try:
+        while True:
+            changed.clear()
+            for path in paths:
+                if path not in reached:
+                    value = client.get(path)
+                    if predicate(value):
+                        reached[path] = value
+            if len(reached) >= count:
+                return reached
+            wait = poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return reached
+                wait = min(wait, remaining)
+            changed.wait(wait)
+    finally:
+        with _register_lock:
+            for eid in eids:
+                client.unregister(eid)
@@ -1,18 +1,39 @@
 from csclient import EventingCSClient
-from threading import Thread
+from threading import Thread, Lock
 import concurrent.futures
-from speedtest import Speedtest
-from geopy import distance
+from speedtest import SpeedtestOrchestrator, SpeedtestServerCache
 from settings import settings
+from results_writer import ResultsWriter
+from results_store import ResultsStore, to_float
+from ring_buffer import RingBuffer
+from survey_index import SurveyIndex
+from uploader import Uploader
+from routing import RoutingProvisioner
+from probe import Prober
+from coverage import CoverageMap
+from pipeline import Stage, Fanout, BLOCK, DROP_OLDEST, DROP_NEWEST
 import requests
+import tornado.locks
+import tornado.util
 import tornado.web
 import json
+import io
 import os
+import signal
+import sys
 import time
 import datetime
 import configparser
 
 results_dir = 'results'
+db_path = 'survey.db'
+survey_points_path = 'survey_points.txt'
+outbox_path = 'outbox.db'
+coverage_path = 'coverage.json'
+speedtest_servers = SpeedtestServerCache()
+ping_lock = Lock()
+prober = Prober(count=10, interval=0.5, wait=2.0)
+native_ping_errors = {}  # Last native ping error per modem, logged once per change
 
 
 class TestHandler(tornado.web.RequestHandler):
@@ -41,7 +62,7 @@ class ClearHandler(tornado.web.RequestHandler):
 
     def get(self):
         """Clear the dispatcher results"""
-        dispatcher.results = ''
+        dispatcher.results.clear()
         self.redirect('/')
         return
 
@@ -53,7 +74,6 @@ class ConfigHandler(tornado.web.RequestHandler):
         """Return app config in JSON for web UI."""
         try:
             config = get_config('Mobile_Site_Survey')
-            config["results"] = dispatcher.results
             config["version"] = dispatcher.version
             self.write(json.dumps(config))
             return
@@ -61,6 +81,43 @@ class ConfigHandler(tornado.web.RequestHandler):
             cp.log(f'Exception in ConfigHandler: {e}')
 
 
+class LogHandler(tornado.web.RequestHandler):
+    """Handles log/ endpoint requests."""
+
+    async def get(self):
+        """Return UI log entries newer than cursor.  With wait > 0, long-poll up to wait seconds for new entries."""
+        try:
+            cursor = int(self.get_argument('cursor', 0))
+            epoch = self.get_argument('epoch', None)
+            epoch = int(epoch) if epoch else None
+            wait = min(60.0, float(self.get_argument('wait', 0)))
+        except ValueError as e:
+            self.set_status(400)
+            self.write({"error": f'Invalid argument: {e}'})
+            return
+        if wait <= 0:
+            self.write(dispatcher.results.since(cursor, epoch))
+            return
+        # Wait on the IOLoop for the next append or clear instead of holding a thread
+        event = tornado.locks.Event()
+        io_loop = tornado.ioloop.IOLoop.current()
+
+        def wake():
+            io_loop.add_callback(event.set)
+
+        dispatcher.results.subscribe(wake)
+        try:
+            entries = dispatcher.results.since(cursor, epoch)
+            if not entries["entries"] and epoch in (None, entries["epoch"]):
+                await event.wait(timeout=datetime.timedelta(seconds=wait))
+                entries = dispatcher.results.since(cursor, epoch)
+        except tornado.util.TimeoutError:
+            entries = dispatcher.results.since(cursor, epoch)
+        finally:
+            dispatcher.results.unsubscribe(wake)
+        self.write(entries)
+
+
 class SubmitHandler(tornado.web.RequestHandler):
     """Handles submit/ endpoint requests."""
 
@@ -122,6 +179,7 @@ class ResultsHandler(tornado.web.RequestHandler):
 
     def get(self):
         try:
+            dispatcher.writer.flush()
             files = os.listdir("./results")
             url = self.request.full_url().replace('http://aoobm-haproxy', 'https://aoobm-haproxy').replace('?', '')
             files_paths = sorted([f"{url}/{f}" for f in files])
@@ -130,14 +188,100 @@ class ResultsHandler(tornado.web.RequestHandler):
             cp.log(f'Exception in ResultsHandler: {e}')
 
 
+class QueryHandler(tornado.web.RequestHandler):
+    """Handles results/query endpoint requests."""
+
+    def get(self):
+        """Return paginated JSON of results filtered by time, carrier, ICCID and distance.
+
+        Args: since, until (epoch seconds), hours (last N hours), carrier, iccid,
+              lat, lon, radius (meters), page, per_page
+        """
+        if dispatcher.store is None:
+            self.set_status(503)
+            self.write({"error": "Results database is not enabled."})
+            return
+        try:
+            since = self.get_argument('since', None)
+            since = float(since) if since else None
+            until = self.get_argument('until', None)
+            until = float(until) if until else None
+            hours = self.get_argument('hours', None)
+            if hours:
+                since = time.time() - float(hours) * 3600
+            near = None
+            if self.get_argument('lat', None) and self.get_argument('lon', None):
+                near = (float(self.get_argument('lat')), float(self.get_argument('lon')),
+                        float(self.get_argument('radius', 500)))
+            page = max(1, int(self.get_argument('page', 1)))
+            per_page = min(1000, max(1, int(self.get_argument('per_page', 100))))
+        except ValueError as e:
+            self.set_status(400)
+            self.write({"error": f'Invalid argument: {e}'})
+            return
+        try:
+            rows, total = dispatcher.store.query(since=since, until=until, carrier=self.get_argument('carrier', None),
+                                                 iccid=self.get_argument('iccid', None), near=near,
+                                                 limit=per_page, offset=(page - 1) * per_page)
+            self.write({"results": rows, "total": total, "page": page, "per_page": per_page,
+                        "pages": (total + per_page - 1) // per_page})
+        except Exception as e:
+            cp.log(f'Exception in QueryHandler: {e}')
+            self.set_status(500)
+            self.write({"error": str(e)})
+
+
+class ExportHandler(tornado.web.RequestHandler):
+    """Handles results/export endpoint requests."""
+
+    def get(self):
+        """Return CSV of all results for an ICCID, derived from the results database."""
+        iccid = self.get_argument('iccid', None)
+        if dispatcher.store is None or not iccid:
+            self.set_status(404)
+            return
+        try:
+            self.set_header('Content-Type', 'text/csv')
+            filename = f'Mobile Site Survey v{dispatcher.version} - ICCID {iccid}.csv'.replace(':', '')
+            self.set_header('Content-Disposition', f'attachment; filename="{filename}"')
+            out = io.StringIO()
+            dispatcher.store.export_csv(iccid, out)
+            self.write(out.getvalue())
+        except Exception as e:
+            cp.log(f'Exception in ExportHandler: {e}')
+
+
+class CoverageHandler(tornado.web.RequestHandler):
+    """Handles coverage/z/x/y heat-map tile requests."""
+
+    def get(self, z, x, y):
+        """Return per-cell coverage statistics inside slippy map tile z/x/y."""
+        if dispatcher.coverage is None:
+            self.set_status(404)
+            return
+        try:
+            self.set_header('Cache-Control', 'no-cache')
+            self.write(dispatcher.coverage.tile(int(z), int(x), int(y)))
+        except Exception as e:
+            cp.log(f'Exception in CoverageHandler: {e}')
+            self.set_status(500)
+            self.write({"error": str(e)})
+
+
 class Dispatcher:
-    """Event Handler for tests"""
+    """Event Handler for tests
+
+    Stages are connected by bounded queues so location sampling and pings
+    keep running at full rate while surveys are in progress:
+
+        loop (location sampler) -> triggers -> surveys (per-modem test workers) -> sinks (CSV, SQLite, server, coverage, UI)
+    """
 
     def __init__(self):
         self.config = {}
         self.modems = []
         self.pings = {}
-        self.results = ''
+        self.results = RingBuffer(maxlen=500)
         self.version = ''
         self.surveyors = []
         self.manual = False
@@ -145,6 +289,23 @@ class Dispatcher:
         self.total_bytes = {}
         self.lat, self.long, self.accuracy = None, None, None
         self.serial_number, self.mac_address, self.router_id = None, None, None
+        self.writer = None
+        self.routing = RoutingProvisioner(cp)
+        self.uploader = None
+        self.survey_index = None
+        self.store = None
+        self.coverage = None
+        self.next_timer = None
+
+        self.triggers = Stage('triggers', self._evaluate_trigger, maxsize=5, policy=DROP_OLDEST, log=cp.log)
+        self.surveys = Stage('surveys', self._start_survey, maxsize=1, policy=DROP_NEWEST, log=cp.log)
+        self.sinks = Fanout(
+            Stage('csv', write_csv, maxsize=100, policy=BLOCK, log=cp.log),
+            Stage('sqlite', store_results, maxsize=100, policy=BLOCK, log=cp.log),
+            Stage('server', send_to_server, maxsize=100, policy=BLOCK, log=cp.log),
+            Stage('coverage', update_coverage, maxsize=100, policy=BLOCK, log=cp.log),
+            Stage('ui', show_results, maxsize=100, policy=DROP_OLDEST, log=cp.log)
+        )
 
         self._initialize_dispatcher()
 
@@ -159,39 +320,70 @@ class Dispatcher:
         patch = package.get('Mobile_Site_Survey', 'version_patch')
         self.version = f'{major}.{minor}.{patch}'
         cp.log(f'Version: {self.version}')
+        self.writer = ResultsWriter(results_dir, flush_rows=self.config["csv_flush_rows"],
+                                    flush_interval=self.config["csv_flush_interval"],
+                                    max_size=self.config["csv_max_size"],
+                                    rotate_daily=self.config["csv_rotate_daily"], log=cp.log).start()
+        self.uploader = Uploader(outbox_path, lambda: self.config, log=cp.log, notify=self.results.append).start()
+        self.survey_index = SurveyIndex(survey_points_path, cell_size=self.config.get("min_distance") or 50, log=cp.log)
+        cp.log(f'Loaded {len(self.survey_index)} prior survey points.')
+        self.coverage = CoverageMap(coverage_path, log=cp.log).start()
+        if self.config.get("write_db"):
+            try:
+                self.store = ResultsStore(db_path, batch_size=self.config["csv_flush_rows"],
+                                          flush_interval=self.config["csv_flush_interval"], log=cp.log).start()
+            except Exception as e:
+                cp.log(f'Unable to open results database {db_path}: {e}')
         if self.config.get("dead_reckoning"):
             enable_GPS_send_to_server()
 
+    def shutdown(self):
+        """Write buffered results and undo router changes made by the app before it stops"""
+        for sink in (self.writer, self.store):
+            if sink is not None:
+                try:
+                    sink.close()
+                except Exception as e:
+                    cp.log(f'Exception closing {type(sink).__name__}: {e}')
+        self.routing.cleanup()
+
     def loop(self):
-        last_location = None
-        next_timer = None
+        """Location sampler - feeds a GPS sample to the trigger evaluator every second"""
         self.router_id = cp.get('status/ecm/client_id') or 0
+        self.sinks.start()
+        self.surveys.start()
+        self.triggers.start()
+        Thread(target=self._ping_loop, daemon=True).start()
         while True:
             try:
                 self.modems = get_connected_wans()
-                self._run_pings()
-                next_timer = self._check_timer(next_timer)
                 gps_lock = cp.get('/status/gps/fix/lock')
-
+                sample = {"gps_lock": gps_lock, "location": None}
                 if self._should_run_test(gps_lock):
-                    latlong = self._get_location()
-                    too_close = self._check_minimum_distance(last_location, latlong)
-
-                    if self.config.get("enabled") and not too_close or self.manual:
-                        self._start_survey(latlong)
-                        last_location = latlong
-
+                    sample["location"] = self._get_location()
+                self.triggers.put(sample)
                 time.sleep(1)
             except Exception as e:
                 cp.log(f'Exception in dispatcher loop: {e}')
+                time.sleep(1)
+
+    def _ping_loop(self):
+        """Packet loss sampler - runs independently of surveys"""
+        while True:
+            try:
+                self._run_pings()
+            except Exception as e:
+                cp.log(f'Exception in ping loop: {e}')
+            time.sleep(1)
 
     def _run_pings(self):
         if self.config.get("packet_loss"):
-            for modem in self.modems:
+            modems = list(self.modems)
+            pongs = probe_modems(modems)
+            for modem in modems:
                 if not self.pings.get(modem):
                     self.pings[modem] = {"tx": 0, "rx": 0}
-                iface = cp.get(f'status/wan/devices/{modem}/info/iface')
-                pong = ping('8.8.8.8', iface)
+                pong = pongs.get(modem) or {}
                 debug_log(json.dumps(pong))
 
                 if pong.get('tx') and pong.get('rx'):
@@ -200,6 +392,28 @@ class Dispatcher:
                 debug_log(
                     f'Cumulative ping results for {modem}: {self.pings[modem]["rx"]} of {self.pings[modem]["tx"]}')
 
+    def _evaluate_trigger(self, sample):
+        """Trigger evaluator - queue a survey when timer, distance or manual conditions are met"""
+        self.next_timer = self._check_timer(self.next_timer)
+        if not self._should_run_test(sample["gps_lock"]):
+            return
+        lat, long, accuracy = sample["location"] or self._get_location()
+        latlong = (lat, long)
+        too_close = self._check_minimum_distance(latlong)
+
+        if self.config.get("enabled") and not too_close or self.manual:
+            survey = {"modems": list(self.modems), "timestamp": self.timestamp,
+                      "lat": lat, "long": long, "accuracy": accuracy}
+            if self.surveys.put(survey):
+                if None not in latlong:
+                    self.survey_index.add(*latlong)
+                self.timestamp = None
+                self.manual = False
+            elif self.manual:
+                debug_log('Survey in progress - manual trigger pending.')
+            else:
+                debug_log('Survey in progress - dropped survey trigger.')
+
     def _check_timer(self, next_timer):
         if self.config.get("enable_timer"):
             if next_timer is None:
@@ -218,53 +432,55 @@ class Dispatcher:
             self.lat, self.long, self.accuracy = get_location_DR()
         else:
             self.lat, self.long, self.accuracy = get_location()
-        return self.lat, self.long
-
-    def _check_minimum_distance(self, last_location, latlong):
-        if last_location is not None:
-            dist = distance.distance(latlong, last_location).m
-            if dist < self.config.get("min_distance", 0) and not self.manual:
-                cp.log(f'Vehicle within {self.config["min_distance"]}M of last location. Waiting 2 seconds!')
-                time.sleep(2)
-                return True
+        return self.lat, self.long, self.accuracy
+
+    def _check_minimum_distance(self, latlong):
+        """True if a prior survey point is within min_distance and its coverage cell has enough samples"""
+        min_distance = self.config.get("min_distance", 0)
+        if self.manual or not min_distance or None in latlong:
+            return False
+        self.survey_index.resize(min_distance)
+        dist = self.survey_index.nearest(*latlong, radius=min_distance)
+        if dist is not None and dist < min_distance:
+            cell_samples = self.config.get("cell_samples", 1)
+            if cell_samples > 1 and self.survey_index.count(*latlong) < cell_samples:
+                return False
+            debug_log(f'Vehicle within {min_distance}M of a surveyed location ({round(dist)}M).')
+            return True
         return False
 
-    def _start_survey(self, latlong):
+    def _start_survey(self, survey):
         cp.log('---> Starting Survey <---')
-        self._initialize_modems()
-        if self.timestamp is None:  # If not triggered remotely
-            self.timestamp = datetime.datetime.utcnow().timestamp()
-            self._start_surveyors()
-        self._run_tests_on_modems()
+        self._initialize_modems(survey["modems"])
+        if survey["timestamp"] is None:  # If not triggered remotely
+            survey["timestamp"] = datetime.datetime.utcnow().timestamp()
+            self._start_surveyors(survey["timestamp"])
+        self._run_tests_on_modems(survey)
         cp.log('---> Survey Complete <---')
-        self.timestamp = None
-        self.manual = False
 
-    def _initialize_modems(self):
-        for modem in self.modems:
+    def _initialize_modems(self, modems):
+        for modem in modems:
             if not self.total_bytes.get(modem):
                 self.total_bytes[modem] = 0
 
-    def _start_surveyors(self):
+    def _start_surveyors(self, timestamp):
         if self.config.get("enable_surveyors"):
             for surveyor in self.config.get("surveyors", []):
-                Thread(target=Surveyor.start, args=(surveyor, self.timestamp), daemon=True).start()
-
-    def _run_tests_on_modems(self):
-        if self.modems:
-            routing_policies = cp.get('config/routing/policies')
-            routing_tables = cp.get('config/routing/tables')
-            with concurrent.futures.ThreadPoolExecutor(len(self.modems)) as executor:
-                executor.map(run_tests, self.modems)
-            pretty_timestamp = datetime.datetime.fromtimestamp(self.timestamp).strftime('%I:%M:%S%p  %m/%d/%Y')
-            pretty_lat = '{:.6f}'.format(float(self.lat))
-            pretty_lon = '{:.6f}'.format(float(self.long))
-            title = f' ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n' \
-                    f' ┣┅➤  {pretty_timestamp}   ⌖{pretty_lat}, {pretty_lon} \n'
-            self.results = title + self.results
-
-            cp.put('config/routing/policies', routing_policies)
-            cp.put('config/routing/tables', routing_tables)
+                Thread(target=Surveyor.start, args=(surveyor, timestamp), daemon=True).start()
+
+    def _run_tests_on_modems(self, survey):
+        modems = survey["modems"]
+        if modems:
+            speedtests = run_speedtests(modems)
+            results = []
+            with concurrent.futures.ThreadPoolExecutor(len(modems)) as executor:
+                futures = {executor.submit(run_tests, modem, speedtests[modem], survey): modem for modem in modems}
+                for future, modem in futures.items():
+                    try:
+                        results.append(future.result())
+                    except Exception as e:  # One failing WAN must not discard the others' results
+                        cp.log(f'Exception testing {modem}: {e}')
+            self.sinks.put({"survey": survey, "results": [x for x in results if x]})
 
 class Surveyor:
     """Sends HTTP Requests to remote router"""
@@ -413,10 +629,9 @@ def get_config(name):
         cp.post('config/system/sdk/appdata', {"name": name, "value": json.dumps(config)})
         cp.log(f'No config found - Saved default config: {config}')
     else:  # Update config with any new settings
-        if config.get('dead_reckoning') is None:
-            config['dead_reckoning'] = settings['dead_reckoning']
-        if config.get('speedtest_url') is None:
-            config['speedtest_url'] = settings['speedtest_url']
+        for key, value in settings.items():
+            if config.get(key) is None:
+                config[key] = value
         save_config(config, 'Mobile_Site_Survey')
     return config
 
@@ -440,11 +655,41 @@ def log_all(msg, logs):
     logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     cp.log(msg)
     logs.append(f'{logstamp} {msg}')
-    dispatcher.results = f'{msg}\n\n' + dispatcher.results
+    dispatcher.results.append(msg)
+
+
+def probe_modems(modems, ifaces=None):
+    """Ping 8.8.8.8 on all modems concurrently and return dict of modem: ping results"""
+    ifaces = ifaces or {}
+    targets = {}
+    for modem in modems:
+        iface = ifaces.get(modem) or cp.get(f'status/wan/devices/{modem}/info/iface')
+        targets[modem] = {"host": '8.8.8.8', "iface": iface}
+    pongs = {}
+    if dispatcher.config.get("native_ping"):
+        try:
+            pongs = prober.probe(targets)
+        except Exception as e:
+            cp.log(f'Exception in native ping: {e}')
+    for modem, target in targets.items():
+        if modem not in pongs or pongs[modem].get('error'):  # Fall back to control/ping
+            error = pongs.get(modem, {}).get('error')
+            if error and native_ping_errors.get(modem) != error:
+                cp.log(f'Native ping failed on {modem} ({error}) - falling back to control/ping.')
+            native_ping_errors[modem] = error
+            pongs[modem] = ping(target["host"], target["iface"])
+        else:
+            native_ping_errors.pop(modem, None)
+    return pongs
 
 
 def ping(host, iface):
     """Ping host and return dict of results"""
+    with ping_lock:  # control/ping is a single shared facility
+        return _ping(host, iface)
+
+
+def _ping(host, iface):
     try:
         start = {"bind_ip": False, "deadline": "Same as timeout", "df": "do", "family": "inet", "fwmark": None,
                  "host": host, "iface": iface, "interval": 0.5, "num": 10, "size": 56, "srcaddr": None, "timeout": 15}
@@ -484,64 +729,63 @@ def ping(host, iface):
         cp.log(f'Exception in PING: {e}')
 
 
-def run_tests(modem):
-    """Main testing function - multithreaded by Dispatcher"""
+def run_speedtests(modems):
+    """Run Ookla speedtests on all modems concurrently and return per-modem results as a single batch"""
+    speedtests = {modem: {"source_ip": None, "results": None, "diagnostics": None, "logs": []} for modem in modems}
+    if not dispatcher.config.get("speedtests"):
+        return speedtests
+
+    sources = {}
+    for modem in modems:
+        logs = speedtests[modem]["logs"]
+        try:
+            source_ip = dispatcher.routing.ensure(modem)
+        except Exception as e:
+            log_all(f'Exception in routing: {e}', logs)
+            dispatcher.routing.invalidate(modem)
+            source_ip = None
+        speedtests[modem]["source_ip"] = source_ip
+        if source_ip is None or source_ip in sources:
+            log_all(f'No unique source IP for {modem} - skipping speedtest.', logs)
+            continue
+        sources[source_ip] = modem
+
+    def progress(source_ip, stage):
+        modem = sources[source_ip]
+        logs = speedtests[modem]["logs"]
+        logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        if stage == 'download':
+            logs.append(f'{logstamp} Starting Download Test on {modem}.')
+            cp.log(f'Starting Download Test on {modem}.')
+        elif stage == 'upload':
+            if modem.startswith('mdm'):  # Capture CA Bands for modems
+                speedtests[modem]["diagnostics"] = cp.get(f'status/wan/devices/{modem}/diagnostics')
+            logs.append(f'{logstamp} Starting Upload Test on {modem}.')
+            cp.log(f'Starting Upload Test on {modem}.')
+        else:
+            logs.append(f'{logstamp} Speedtest Complete on {modem}.')
+            cp.log(f'Speedtest Complete on {modem}.')
+
+    ookla = SpeedtestOrchestrator(sources, server_cache=speedtest_servers)
+    results = ookla.run(pre_allocate=False, callback=progress)
+    for source_ip, modem in sources.items():
+        speedtests[modem]["results"] = results.get(source_ip)
+        if ookla.errors.get(source_ip):
+            dispatcher.routing.invalidate(modem)
+            log_all(f'Exception running Ookla speedtest on {modem}: {ookla.errors[source_ip]}', speedtests[modem]["logs"])
+    return speedtests
+
+
+def run_tests(modem, speedtest, survey):
+    """Main testing function - multithreaded by Dispatcher.  Returns result dict for the result sinks."""
     download, upload, latency = 0.0, 0.0, 0.0
     bytes_sent, bytes_received, total_mb_used, packet_loss_percent = 0, 0, 0, 0
     share = ''
     server = None
-    source_ip = None
-    ookla = None
-    logs = []
-
-    if dispatcher.config.get("speedtests"):
-        # ROUTING - Packets sourced from modem IP egress modem device:
-        try:
-            source_ip = cp.get(f'status/wan/devices/{modem}/status/ipinfo/ip_address')
-            cp.put('config/routing/policies/0/priority', 10)
-            route_tables = cp.get('config/routing/tables')
-            exists = False
-            for table in route_tables:
-                if table["name"] == f'MSS-{modem}':  # avoid duplicate routes
-                    route_table_id = table["_id_"]
-                    exists = True
-            if not exists:
-                route_table = {"name": f'MSS-{modem}', "routes": [
-                    {"netallow": False, "ip_network": "0.0.0.0/0", "dev": modem, "auto_gateway": True}]}
-                req = cp.post('config/routing/tables/', route_table)
-                route_table_index = req["data"]
-                route_table_id = cp.get(f'config/routing/tables/{route_table_index}/_id_')
-                time.sleep(1)
-            route_policies = cp.get('config/routing/policies')
-            exists = False
-            for policy in route_policies:
-                if policy["table"] == route_table_id:  # avoid duplicate policies
-                    exists = True
-            if not exists:
-                route_policy = {"ip_version": "ip4", "priority": 1, "table": route_table_id,
-                                "src_ip_network": source_ip}
-                req = cp.post(f'config/routing/policies/', route_policy)
-                time.sleep(1)
-        except Exception as e:
-            msg = f'Exception in routing: {e}'
-            log_all(msg, logs)
-        try:
-            # Instantiate Ookla with source_ip from modem
-            retries = 0
-            while retries < 5:
-                try:
-                    ookla = Speedtest(source_address=source_ip)
-                    break
-                except:
-                    retries += 1
-                    cp.log(f'Ookla failed to start for source {source_ip} on {modem}.  Trying again...')
-                    time.sleep(1)
-            else:
-                log_all(f'Ookla is not accepting connections at the time.  Please try again later.  Device: {modem}', logs)
-                return
-        except Exception as e:
-            msg = f'Exception in Ookla startup: {e}'
-            log_all(msg, logs)
+    source_ip = speedtest["source_ip"]
+    ookla = speedtest["results"]
+    logs = speedtest["logs"]
+    cur_plmn = None
 
     wan_info = cp.get(f'status/wan/devices/{modem}/info')
     wan_type = wan_info.get('type')
@@ -566,14 +810,13 @@ def run_tests(modem):
         carrier = source_ip
         iccid = modem
         product = modem
-        cur_plmn = None
 
     # Latency test:
-    pong = ping('8.8.8.8', iface)
-    if pong.get('loss') == 100.0:
+    pong = probe_modems([modem], {modem: iface})[modem] or {}
+    if pong.get('loss') == 100.0 or pong.get('avg') is None:
         latency = 'FAIL'
     else:
-        latency = round(pong.get('avg'))
+        latency = round(pong['avg'])
 
     # Calculate packet loss
     try:
@@ -592,41 +835,21 @@ def run_tests(modem):
         cp.log(f'Exception calculating packet loss: {e}')
         tx, rx, packet_loss_percent = 0, 0, 0
 
-    if dispatcher.config.get("speedtests"):
+    if dispatcher.config.get("speedtests") and ookla is not None:
         # Ookla Speedtest
         try:
-            retries = 0
-            while retries < 3:
-                try:
-                    ookla.get_best_server()
-                    break
-                except Exception as e:
-                    retries += 1
-                    cp.log(f'Attempt {retries} of 3 to get_best_server() failed: {e}')
-
-            logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            logs.append(f'{logstamp} Starting Download Test on {product} {carrier}.')
-            cp.log(f'Starting Download Test on {product} {carrier}.')
-            ookla.download()  # Ookla Download Test
-            if wan_type == 'mdm':  # Capture CA Bands for modems
-                diagnostics = cp.get(f'status/wan/devices/{modem}/diagnostics')
-            logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            logs.append(f'{logstamp} Starting Upload Test on {product} {carrier}.')
-            cp.log(f'Starting Upload Test on {product} {carrier}.')
-            ookla.upload(pre_allocate=False)  # Ookla upload test
-            logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            logs.append(f'{logstamp} Speedtest Complete on {product} {carrier}.')
-            cp.log(f'Speedtest Complete on {product} {carrier}.')
+            if wan_type == 'mdm' and speedtest["diagnostics"]:  # CA Bands captured during the speedtest
+                diagnostics = speedtest["diagnostics"]
 
             # Format results
             try:
-                download = round(ookla.results.download / 1000 / 1000, 2)
-                upload = round(ookla.results.upload / 1000 / 1000, 2)
-                latency = round(ookla.results.ping)
-                bytes_sent = ookla.results.bytes_sent
-                bytes_received = ookla.results.bytes_received
-                server = ookla.results.server["host"]
-                share = ookla.results.share()
+                download = round(ookla.download / 1000 / 1000, 2)
+                upload = round(ookla.upload / 1000 / 1000, 2)
+                latency = round(ookla.ping)
+                bytes_sent = ookla.bytes_sent
+                bytes_received = ookla.bytes_received
+                server = ookla.server["host"]
+                share = ookla.share()
             except Exception as e:
                 cp.log(f'Exception formatting Ookla results: {e}')
 
@@ -637,12 +860,15 @@ def run_tests(modem):
             msg = f'Exception running Ookla speedtest for {product} {carrier}: {e}'
             log_all(msg, logs)
 
-    # SEND TO SERVER:
-    pretty_timestamp = datetime.datetime.fromtimestamp(dispatcher.timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    post_success = ''
+    pretty_timestamp = datetime.datetime.fromtimestamp(survey["timestamp"]).strftime('%Y-%m-%d %H:%M:%S')
+    result = {"modem": modem, "iccid": iccid, "carrier": carrier, "wan_type": wan_type,
+              "diagnostics": diagnostics, "logs": logs, "payload": None, "text": None, "header": None,
+              "pretty": None, "download": download, "upload": upload, "latency": latency,
+              "packet_loss_percent": packet_loss_percent}
+
+    # BUILD SERVER PAYLOAD:
     if dispatcher.config.get("send_to_server"):
         try:
-            post_success = '⇪ 5g-ready:❌   '
             scell0 = diagnostics.get("BAND_SCELL0")
             scell1 = diagnostics.get("BAND_SCELL1")
             scell2 = diagnostics.get("BAND_SCELL2")
@@ -676,9 +902,9 @@ def run_tests(modem):
                 "mac_address": dispatcher.mac_address,
                 "router_id": dispatcher.router_id,
                 "timestamp": pretty_timestamp,
-                "latitude": str(dispatcher.lat),
-                "longitude": str(dispatcher.long),
-                "accuracy": str(dispatcher.accuracy),
+                "latitude": str(survey["lat"]),
+                "longitude": str(survey["long"]),
+                "accuracy": str(survey["accuracy"]),
                 "carrier": carrier,
                 "cur_plmn": str(cur_plmn),
                 "tac": str(tac),
@@ -712,35 +938,14 @@ def run_tests(modem):
                 payload["diagnostics"] = json.dumps(diagnostics)
             if dispatcher.config.get("include_logs"):
                 payload["logs"] = ';  '.join(logs)
-            url = dispatcher.config.get("server_url")
-            headers = {'Content-Type': 'application/json'}
-            if dispatcher.config.get("server_token"):
-                headers['Authorization'] = f'Bearer {dispatcher.config["server_token"]}'
-
-            debug_log(f'HTTP POST - URL: {url}')
-            debug_log(f'HTTP POST - Headers: {headers}')
-            debug_log(f'HTTP POST - Payload: {payload}')
-
-            # retries
-            retries = 0
-            while retries < 5:
-                try:
-                    req = requests.post(url, headers=headers, json=payload)
-                    if req.status_code < 300:
-                        post_success = '⇪ 5g-ready:✓️   '
-                        break
-                except Exception as e:
-                    cp.log(f'Exception in POST: {e}')
-                    time.sleep(1)
-                retries += 1
-            cp.log(f'HTTP POST Result: {req.status_code} {req.text}')
+            result["payload"] = payload
         except Exception as e:
             msg = f'Exception in Send to Server: {e}'
             log_all(msg, logs)
 
     # Log results
     try:
-        row = [pretty_timestamp, dispatcher.lat, dispatcher.long, dispatcher.accuracy,
+        row = [pretty_timestamp, survey["lat"], survey["long"], survey["accuracy"],
                carrier, download, upload, latency, packet_loss_percent, bytes_sent, bytes_received, share]
         if wan_type == 'wwan' or (wan_type == 'mdm' and dispatcher.config.get("full_diagnostics")):
             row = row + [str(x).replace(',', ' ') for x in diagnostics.values()]
@@ -774,58 +979,129 @@ def run_tests(modem):
         logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         logs.append(f'{logstamp} Results: {text}')
         cp.log(f'Results: {text}')
-        # cp.put('config/system/desc', text[:1000])
-        pretty_results = f' ┣┅┅┅  ☏{carrier} {cur_plmn}  ⇄ {packet_loss_percent}% loss ({tx - rx} of {tx})\n' \
-                         f' ┣┅┅┅  ↓{download}Mbps  ↑{upload}Mbps  ⏱{latency}ms\n' \
-                         f' ┣┅┅┅  ⛁ {server}\n' \
-                         f' ┗┅┅┅  {post_success}⛗{total_mb_used}MB used.'
-        log_all(pretty_results, logs)
+        result["text"] = text
+        result["header"] = csv_header(wan_type, diagnostics)
+        result["pretty"] = f' ┣┅┅┅  ☏{carrier} {cur_plmn}  ⇄ {packet_loss_percent}% loss ({tx - rx} of {tx})\n' \
+                           f' ┣┅┅┅  ↓{download}Mbps  ↑{upload}Mbps  ⏱{latency}ms\n' \
+                           f' ┣┅┅┅  ⛁ {server}\n' \
+                           f' ┗┅┅┅  ⛗{total_mb_used}MB used.'
     except Exception as e:
         msg = f'Exception formatting results: {e}'
-        text = msg
+        result["pretty"] = msg
         log_all(msg, logs)
+    return result
+
+
+def send_to_server(batch):
+    """Server sink - queue each result payload in the store-and-forward uploader"""
+    if not dispatcher.config.get("send_to_server"):
+        return
+    for result in batch["results"]:
+        payload = result["payload"]
+        if payload is None:
+            continue
+        debug_log(f'Queued HTTP POST - Payload: {payload}')
+        dispatcher.uploader.put(payload)
+
+
+def show_results(batch):
+    """UI sink - add survey results to the web UI log"""
+    survey = batch["survey"]
+    for result in batch["results"]:
+        if result["pretty"]:
+            log_all(result["pretty"], result["logs"])
+    pretty_timestamp = datetime.datetime.fromtimestamp(survey["timestamp"]).strftime('%I:%M:%S%p  %m/%d/%Y')
+    try:
+        pretty_lat = '{:.6f}'.format(float(survey["lat"]))
+        pretty_lon = '{:.6f}'.format(float(survey["long"]))
+    except (TypeError, ValueError):
+        pretty_lat, pretty_lon = survey["lat"], survey["long"]
+    title = f' ┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n' \
+            f' ┣┅➤  {pretty_timestamp}   ⌖{pretty_lat}, {pretty_lon} \n'
+    dispatcher.results.append(title, kind='title')
+
+
+def store_results(batch):
+    """SQLite sink - add each result to the indexed results store"""
+    if dispatcher.store is None:
+        return
+    survey = batch["survey"]
+    for result in batch["results"]:
+        if result["text"] is None:
+            continue
+        diagnostics = result["diagnostics"] or {}
+        dispatcher.store.add({
+            "timestamp": survey["timestamp"],
+            "modem": result["modem"],
+            "iccid": result["iccid"],
+            "carrier": result["carrier"],
+            "wan_type": result["wan_type"],
+            "lat": survey["lat"],
+            "lon": survey["long"],
+            "accuracy": to_float(survey["accuracy"]),
+            "download": result["download"],
+            "upload": result["upload"],
+            "latency": to_float(result["latency"]),
+            "packet_loss_percent": result["packet_loss_percent"],
+            "rsrp": to_float(diagnostics.get('RSRP')),
+            "sinr": to_float(diagnostics.get('SINR')),
+            "cell_id": diagnostics.get('CELL_ID'),
+            "header": result["header"],
+            "row": result["text"]
+        })
+
+
+def update_coverage(batch):
+    """Coverage sink - fold each result into the heat-map cells"""
+    if dispatcher.coverage is None:
+        return
+    survey = batch["survey"]
+    lat, lon = to_float(survey["lat"]), to_float(survey["long"])
+    if lat is None or lon is None:
+        return
+    for result in batch["results"]:
+        if result["text"] is None:
+            continue
+        diagnostics = result["diagnostics"] or {}
+        dispatcher.coverage.add(lat, lon, rsrp=to_float(diagnostics.get('RSRP')),
+                                sinr=to_float(diagnostics.get('SINR')),
+                                download=result["download"], upload=result["upload"])
+
+
+def csv_header(wan_type, diagnostics):
+    """Return CSV header line for results of wan_type with diagnostics"""
+    header = ['Timestamp', 'Lat', 'Long', 'Accuracy', 'Carrier', 'Download', 'Upload',
+              'Latency', 'Packet Loss Percent', 'bytes_sent', 'bytes_received', 'Results Image']
+    if diagnostics:
+        if wan_type == 'wwan' or (wan_type == 'mdm' and dispatcher.config.get("full_diagnostics")):
+            header = header + [*diagnostics]
+        elif wan_type == 'mdm' and not dispatcher.config.get("full_diagnostics"):
+            header = header + ['DBM', 'SINR', 'RSRP', 'RSRQ', 'SINR_5G', 'RSRP_5G', 'RSRQ_5G', 'Cell ID',
+                               'PCI', 'CUR_PLMN', 'TAC', 'LAC', 'NR Cell ID', 'Serice Display', 'RF Band',
+                               'RF Band 5G', 'SCELL0', 'SCELL1', 'SCELL2', 'SCELL3']
+    return ','.join(header) + '\n'
 
-    # Write to CSV:
-    if dispatcher.config.get("write_csv"):
+
+def write_csv(batch):
+    """CSV sink - buffer each result row into its per-ICCID CSV file"""
+    if not dispatcher.config.get("write_csv"):
+        return
+    for result in batch["results"]:
+        if result["text"] is None:
+            continue
         diag = ''
         if dispatcher.config.get("full_diagnostics"):
             diag = ' Diagnostics'
-        filename = f'Mobile Site Survey v{dispatcher.version} - ICCID {iccid}{diag}.csv'.replace(':', '')
-
-        # CREATE results_dir if it doesn't exist:
-        if not os.path.exists(results_dir):
-            os.makedirs(results_dir)
-
-        # CREATE CSV IF IT DOESN'T EXIST:
-        debug_log(' '.join(os.listdir(results_dir)))
-        if not os.path.isfile(f'{results_dir}/{filename}'):
-            logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            logs.append(f'{logstamp} {filename} not found.')
-            cp.log(f'{filename} not found.')
-            with open(f'{results_dir}/{filename}', 'wt') as f:
-                header = ['Timestamp', 'Lat', 'Long', 'Accuracy', 'Carrier', 'Download', 'Upload',
-                          'Latency', 'Packet Loss Percent', 'bytes_sent', 'bytes_received', 'Results Image']
-                if diagnostics:
-                    if wan_type == 'wwan' or (wan_type == 'mdm' and dispatcher.config.get("full_diagnostics")):
-                        header = header + [*diagnostics]
-                    elif wan_type == 'mdm' and not dispatcher.config.get("full_diagnostics"):
-                        header = header + ['DBM', 'SINR', 'RSRP', 'RSRQ', 'SINR_5G', 'RSRP_5G', 'RSRQ_5G', 'Cell ID',
-                                           'PCI', 'CUR_PLMN', 'TAC', 'LAC', 'NR Cell ID', 'Serice Display', 'RF Band',
-                                           'RF Band 5G', 'SCELL0', 'SCELL1', 'SCELL2', 'SCELL3']
-                line = ','.join(header) + '\n'
-                f.write(line)
-            logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            logs.append(f'{logstamp} Created new {filename} file.')
-            cp.log(f'Created new {filename} file.')
-
-        # APPEND TO CSV:
+        filename = f'Mobile Site Survey v{dispatcher.version} - ICCID {result["iccid"]}{diag}.csv'.replace(':', '')
         try:
-            with open(f'{results_dir}/{filename}', 'a') as f:
-                f.write(text)
-                debug_log(f'Successfully wrote to {filename}.')
+            if dispatcher.writer.write(filename, result["header"], result["text"]):
+                logstamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                result["logs"].append(f'{logstamp} Created new {filename} file.')
+                cp.log(f'Created new {filename} file.')
+            debug_log(f'Buffered row for {filename}.')
         except Exception as e:
             msg = f'Unable to write to {filename}. {e}'
-            log_all(msg, logs)
+            log_all(msg, result["logs"])
 
 
 def manual_test(path, value, *args):
@@ -844,14 +1120,29 @@ if __name__ == "__main__":
     time.sleep(3)
 
     dispatcher = Dispatcher()
+
+    def stop(signum, frame):
+        """Clean up on SIGTERM, then stop the event loop thread so the process can exit"""
+        cp.log('Stopping...')
+        try:
+            dispatcher.shutdown()
+        finally:
+            cp.stop()
+            sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)  # Replaces csclient's handler, which stops a new unstarted client
     Thread(target=dispatcher.loop, daemon=True).start()
     cp.on('put', 'config/system/desc', manual_test)
     application = tornado.web.Application([
         (r"/config", ConfigHandler),
         (r"/submit", SubmitHandler),
         (r"/results", ResultsHandler),
+        (r"/results/query", QueryHandler),
+        (r"/results/export", ExportHandler),
+        (r"/coverage/(\d+)/(\d+)/(\d+)", CoverageHandler),
         (r"/test", TestHandler),
         (r"/clear", ClearHandler),
+        (r"/log", LogHandler),
         (r"/(.*)", tornado.web.StaticFileHandler,
          {"path": os.path.dirname(__file__), "default_filename": "index.html"})
     ])
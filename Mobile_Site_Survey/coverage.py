@@ -0,0 +1,230 @@
+"""Incremental coverage heat-map aggregation for Mobile Site Survey.
+
+Each result is folded into per-geohash-cell statistics at several precisions
+(zoom levels): count, mean/min/max RSRP and SINR, and download/upload
+quantiles from a compact log-bucket sketch.  Map tiles are answered from the
+cell dictionaries, so a query costs O(cells in the tile) no matter how many
+results have been collected.  Cells are persisted as compact JSON arrays.
+"""
+
+from threading import Thread, Lock
+import json
+import math
+import os
+import time
+import geohash
+
+PRECISIONS = (5, 6, 7, 8)
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+class Sketch:
+    """Log-bucket quantile sketch with relative accuracy of about +/- accuracy."""
+
+    def __init__(self, accuracy=0.05, buckets=None, zeros=0):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = buckets or {}
+        self.zeros = zeros
+
+    def add(self, value):
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def quantile(self, q):
+        """Return approximate q quantile, or None if empty"""
+        total = self.count()
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def dump(self):
+        return [self.zeros, {str(k): v for k, v in self.buckets.items()}]
+
+    @classmethod
+    def load(cls, data):
+        return cls(buckets={int(k): v for k, v in data[1].items()}, zeros=data[0])
+
+
+class Stat:
+    """Running count/sum/min/max."""
+
+    def __init__(self, count=0, total=0.0, low=None, high=None):
+        self.count, self.total, self.low, self.high = count, total, low, high
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.low = value if self.low is None else min(self.low, value)
+        self.high = value if self.high is None else max(self.high, value)
+
+    def summary(self):
+        if not self.count:
+            return None
+        return {"mean": round(self.total / self.count, 2), "min": self.low, "max": self.high}
+
+    def dump(self):
+        return [self.count, self.total, self.low, self.high]
+
+
+class Cell:
+    """Statistics of all results in one geohash cell."""
+
+    def __init__(self, data=None):
+        data = data or [0, [0, 0.0, None, None], [0, 0.0, None, None], [0, {}], [0, {}]]
+        self.count = data[0]
+        self.rsrp = Stat(*data[1])
+        self.sinr = Stat(*data[2])
+        self.download = Sketch.load(data[3])
+        self.upload = Sketch.load(data[4])
+
+    def add(self, rsrp=None, sinr=None, download=None, upload=None):
+        self.count += 1
+        if rsrp is not None:
+            self.rsrp.add(rsrp)
+        if sinr is not None:
+            self.sinr.add(sinr)
+        if download is not None:
+            self.download.add(download)
+        if upload is not None:
+            self.upload.add(upload)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "rsrp": self.rsrp.summary(),
+            "sinr": self.sinr.summary(),
+            "download": {f'p{int(q * 100)}': self.download.quantile(q) for q in QUANTILES},
+            "upload": {f'p{int(q * 100)}': self.upload.quantile(q) for q in QUANTILES}
+        }
+
+    def dump(self):
+        return [self.count, self.rsrp.dump(), self.sinr.dump(), self.download.dump(), self.upload.dump()]
+
+
+def tile_bounds(z, x, y):
+    """Return (min_lat, min_lon, max_lat, max_lon) of slippy map tile z/x/y"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360 - 180, lat(y), (x + 1) / n * 360 - 180
+
+
+def precision_for_zoom(z):
+    """Return geohash precision giving at most a few hundred cells per tile at zoom z"""
+    return min(max(z // 2, PRECISIONS[0]), PRECISIONS[-1])
+
+
+class CoverageMap:
+    """Per-geohash-cell coverage statistics at several precisions."""
+
+    def __init__(self, path=None, precisions=PRECISIONS, save_interval=60, log=print):
+        self.path = path
+        self.precisions = precisions
+        self.save_interval = save_interval
+        self.log = log
+        self.levels = {p: {} for p in precisions}
+        self.dirty = False
+        self._lock = Lock()
+        self._thread = None
+        self._load()
+
+    def start(self):
+        """Start background thread that saves changes every save_interval seconds."""
+        self._thread = Thread(target=self._save_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def add(self, lat, lon, rsrp=None, sinr=None, download=None, upload=None):
+        """Fold one result into every precision level."""
+        cell_hash = geohash.encode(float(lat), float(lon), max(self.precisions))
+        with self._lock:
+            for precision, cells in self.levels.items():
+                key = cell_hash[:precision]
+                cell = cells.get(key)
+                if cell is None:
+                    cell = cells[key] = Cell()
+                cell.add(rsrp, sinr, download, upload)
+            self.dirty = True
+
+    def tile(self, z, x, y):
+        """Return dict of cell summaries inside slippy map tile z/x/y"""
+        precision = precision_for_zoom(z)
+        min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+        lat_step, lon_step = geohash.cell_size(precision)
+        rows = math.ceil((max_lat - min_lat) / lat_step) + 1
+        cols = math.ceil((max_lon - min_lon) / lon_step) + 1
+        with self._lock:
+            cells = self.levels[precision]
+            if rows * cols <= len(cells):  # Enumerate grid cells in tile
+                keys = set()
+                for r in range(rows):
+                    lat = min(max_lat, min_lat + r * lat_step)
+                    for c in range(cols):
+                        keys.add(geohash.encode(lat, min(max_lon, min_lon + c * lon_step), precision))
+                found = {key: cells[key] for key in keys if key in cells}
+            else:  # Fewer stored cells than grid cells - scan them
+                found = {}
+                for key, cell in cells.items():
+                    lat, lon = geohash.decode(key)
+                    if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                        found[key] = cell
+            results = []
+            for key, cell in found.items():
+                summary = cell.summary()
+                summary["geohash"] = key
+                summary["bounds"] = geohash.bounds(key)
+                results.append(summary)
+        return {"z": z, "x": x, "y": y, "precision": precision, "cells": results}
+
+    def save(self):
+        """Write cells to path atomically if changed."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self.dirty:
+                return
+            data = {str(p): {k: c.dump() for k, c in cells.items()} for p, cells in self.levels.items()}
+            self.dirty = False
+        tmp = f'{self.path}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self.log(f'Unable to save coverage map to {self.path}: {e}')
+            self.dirty = True
+
+    def _load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for precision in self.precisions:
+                self.levels[precision] = {k: Cell(v) for k, v in data.get(str(precision), {}).items()}
+        except (OSError, ValueError) as e:
+            self.log(f'Unable to load coverage map from {self.path}: {e}')
+
+    def _save_loop(self):
+        while True:
+            time.sleep(self.save_interval)
+            self.save()
@@ -0,0 +1,114 @@
+"""Batch geodesic tests
+
+Run with
+
+    python3 -m unittest -v geographiclib.test.test_many
+
+executed in this directory's parent directory.
+
+"""
+
+import unittest
+import math
+
+from geographiclib.geodesic import Geodesic
+from geographiclib.test.test_geodesic import GeodesicTest
+
+class ManyTest(unittest.TestCase):
+  """InverseMany/DirectMany test suite"""
+
+  def setUp(self):
+    cases = GeodesicTest.testcases
+    self.lat1s = [l[0] for l in cases]
+    self.lon1s = [l[1] for l in cases]
+    self.azi1s = [l[2] for l in cases]
+    self.lat2s = [l[3] for l in cases]
+    self.lon2s = [l[4] for l in cases]
+    self.s12s = [l[6] for l in cases]
+
+  def test_InverseMany(self):
+    """InverseMany is identical to Inverse"""
+    outmask = Geodesic.ALL | Geodesic.LONG_UNROLL
+    many = Geodesic.WGS84.InverseMany(self.lat1s, self.lon1s,
+                                      self.lat2s, self.lon2s, outmask)
+    for i, args in enumerate(zip(self.lat1s, self.lon1s,
+                                 self.lat2s, self.lon2s)):
+      single = Geodesic.WGS84.Inverse(*args, outmask)
+      self.assertEqual(set(many), set(single))
+      for key, value in single.items():
+        self.assertEqual(many[key][i], value)
+
+  def test_DirectMany(self):
+    """DirectMany is identical to Direct"""
+    outmask = Geodesic.ALL | Geodesic.LONG_UNROLL
+    many = Geodesic.WGS84.DirectMany(self.lat1s, self.lon1s,
+                                     self.azi1s, self.s12s, outmask)
+    for i, args in enumerate(zip(self.lat1s, self.lon1s,
+                                 self.azi1s, self.s12s)):
+      single = Geodesic.WGS84.Direct(*args, outmask)
+      self.assertEqual(set(many), set(single))
+      for key, value in single.items():
+        self.assertEqual(many[key][i], value)
+
+  def test_broadcast(self):
+    """Scalar arguments apply to every problem"""
+    many = Geodesic.WGS84.InverseMany(40.6, -73.8, [49.0, 1.3], [2.6, 103.9])
+    self.assertEqual(many['s12'],
+                     [Geodesic.WGS84.Inverse(40.6, -73.8, 49.0, 2.6)['s12'],
+                      Geodesic.WGS84.Inverse(40.6, -73.8, 1.3, 103.9)['s12']])
+    many = Geodesic.WGS84.DirectMany(40.6, -73.8, 45, range(0, 3000, 1000))
+    self.assertEqual(many['lat2'][2],
+                     Geodesic.WGS84.Direct(40.6, -73.8, 45, 2000)['lat2'])
+    self.assertEqual(Geodesic.WGS84.InverseMany(1, 2, 3, 4)['s12'],
+                     [Geodesic.WGS84.Inverse(1, 2, 3, 4)['s12']])
+
+  def test_repeated_and_nan(self):
+    """Repeated pairs give the same answers and NaN stays NaN"""
+    many = Geodesic.WGS84.InverseMany([10, 10, math.nan], 20, 11, 21)
+    self.assertEqual(many['s12'][0], many['s12'][1])
+    self.assertTrue(math.isnan(many['s12'][2]))
+
+  def test_empty(self):
+    """Empty input gives an empty column for every output key"""
+    outmask = Geodesic.ALL | Geodesic.LONG_UNROLL
+    many = Geodesic.WGS84.InverseMany([], [], [], [], outmask)
+    self.assertEqual(set(many),
+                     set(Geodesic.WGS84.Inverse(0, 0, 0, 0, outmask)))
+    self.assertTrue(all(column == [] for column in many.values()))
+    many = Geodesic.WGS84.DirectMany([], 0, 0, [], outmask)
+    self.assertEqual(set(many),
+                     set(Geodesic.WGS84.Direct(0, 0, 0, 0, outmask)))
+    self.assertEqual(many['s12'], [])
+
+  def test_signed_zero(self):
+    """0.0 and -0.0 are distinct problems, as they are for the scalar calls"""
+    many = Geodesic.WGS84.InverseMany(0, 0, 0, [0.0, -0.0])
+    for i, lon2 in enumerate([0.0, -0.0]):
+      single = Geodesic.WGS84.Inverse(0, 0, 0, lon2)
+      self.assertEqual(math.copysign(1, many['azi1'][i]),
+                       math.copysign(1, single['azi1']))
+      self.assertEqual(many['azi1'][i], single['azi1'])
+    many = Geodesic.WGS84.DirectMany(0, [0.0, -0.0], 90, 0)
+    for i, lon1 in enumerate([0.0, -0.0]):
+      single = Geodesic.WGS84.Direct(0, lon1, 90, 0)
+      self.assertEqual(math.copysign(1, many['lon1'][i]),
+                       math.copysign(1, single['lon1']))
+
+  def test_length_mismatch(self):
+    """Sequences of different lengths are rejected"""
+    with self.assertRaises(ValueError):
+      Geodesic.WGS84.InverseMany([1, 2], [1, 2, 3], 0, 0)
+
+  def test_numpy(self):
+    """NumPy arrays give NumPy arrays of the broadcast shape"""
+    try:
+      import numpy
+    except ImportError:
+      self.skipTest('numpy not installed')
+    lat2s = numpy.array([[49.0, 1.3], [35.7, -33.9]])
+    many = Geodesic.WGS84.InverseMany(40.6, -73.8, lat2s, 10.0)
+    self.assertEqual(many['s12'].shape, (2, 2))
+    self.assertEqual(many['s12'][1, 0],
+                     Geodesic.WGS84.Inverse(40.6, -73.8, 35.7, 10.0)['s12'])
+    empty = Geodesic.WGS84.InverseMany(numpy.array([]), 0, 0, 0)
+    self.assertEqual(empty['s12'].shape, (0,))
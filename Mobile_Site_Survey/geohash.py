@@ -0,0 +1,102 @@
+"""Geohash encoding helpers for indexing survey locations."""
+
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DECODE = {c: i for i, c in enumerate(BASE32)}
+EARTH_RADIUS = 6371008.8  # meters
+
+
+def encode(lat, lon, precision=9):
+    """Return geohash of lat, lon with precision characters"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit, ch, even = [16, 8, 4, 2, 1], 0, 0, True
+    while len(geohash) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch |= bits[bit]
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        if bit < 4:
+            bit += 1
+        else:
+            geohash.append(BASE32[ch])
+            bit, ch = 0, 0
+    return ''.join(geohash)
+
+
+def bounds(geohash):
+    """Return (min_lat, min_lon, max_lat, max_lon) of geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = DECODE[c]
+        for mask in (16, 8, 4, 2, 1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value & mask:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def decode(geohash):
+    """Return (lat, lon) of geohash cell center"""
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def cell_size(precision):
+    """Return (lat_degrees, lon_degrees) spanned by a cell of precision characters"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def precision_for(radius, lat=0.0):
+    """Return the longest precision whose cells are at least radius meters on each side at lat"""
+    for precision in range(12, 0, -1):
+        lat_deg, lon_deg = cell_size(precision)
+        height = math.radians(lat_deg) * EARTH_RADIUS
+        width = math.radians(lon_deg) * EARTH_RADIUS * math.cos(math.radians(lat))
+        if min(height, width) >= radius:
+            return precision
+    return 1
+
+
+def neighbors(geohash):
+    """Return list of geohash and its 8 neighboring cells"""
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    height, width = max_lat - min_lat, max_lon - min_lon
+    lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    cells = []
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            nlat = lat + dlat
+            if not -90 <= nlat <= 90:
+                continue
+            nlon = (lon + dlon + 180) % 360 - 180
+            cell = encode(nlat, nlon, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def covering(lat, lon, radius):
+    """Return geohash prefixes that together cover a circle of radius meters around lat, lon"""
+    return neighbors(encode(lat, lon, precision_for(radius, lat)))
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Return great-circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,11 @@
+"""
+
+test_cache: test geopy.extra.cache.CachingGeocoder
+
+Run these tests with
+
+    python3 -m unittest -v geopy.test.test_cache
+
+executed in this directory's parent directory.
+
+"""
@@ -0,0 +1,154 @@
+"""Tests of geopy.extra.cache.CachingGeocoder against a local stand-in geocoder
+
+Run with
+
+    python3 -m unittest -v geopy.test.test_cache
+
+executed in this directory's parent directory.
+
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from geopy.exc import GeocoderServiceError
+from geopy.extra.cache import CachingGeocoder
+from geopy.location import Location
+
+class StandIn:
+  """Geocoder returning made-up locations and counting requests"""
+
+  def __init__(self):
+    self.calls = []
+    self.gate = None
+
+  def geocode(self, query, **kwargs):
+    self.calls.append(('geocode', query, kwargs))
+    if self.gate is not None:
+      self.gate.wait()
+    if query == 'nowhere':
+      return None
+    if query == 'fail':
+      raise GeocoderServiceError('unavailable')
+    return Location(query.title(), (43.6, -116.2), {'query': query})
+
+  def reverse(self, query, **kwargs):
+    self.calls.append(('reverse', query, kwargs))
+    lat, lon = query
+    return Location('{:.3f}, {:.3f}'.format(lat, lon), (lat, lon),
+                    {'lat': lat, 'lon': lon})
+
+class CachingGeocoderTest(unittest.TestCase):
+  """CachingGeocoder test suite"""
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'geocode.sqlite')
+    self.geocoder = StandIn()
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  def cache(self, **kwargs):
+    cache = CachingGeocoder(self.geocoder, path = self.path, **kwargs)
+    self.addCleanup(cache.close)
+    return cache
+
+  def test_normalized_query(self):
+    """Case and whitespace variants of a query share one request"""
+    cache = self.cache()
+    first = cache.geocode('Boise,  Idaho')
+    self.assertEqual(cache.geocode(' boise, IDAHO '), first)
+    self.assertEqual(len(self.geocoder.calls), 1)
+    cache.geocode('boise, idaho', language = 'de')
+    self.assertEqual(len(self.geocoder.calls), 2)
+
+  def test_reverse_precision(self):
+    """Points rounding to the same coordinates share one request"""
+    cache = self.cache(precision = 3)
+    cache.reverse((43.61501, -116.20001))
+    cache.reverse((43.61499, -116.19999))
+    self.assertEqual(len(self.geocoder.calls), 1)
+    cache.reverse((43.61601, -116.20001))
+    self.assertEqual(len(self.geocoder.calls), 2)
+
+  def test_disk_tier(self):
+    """Results and empty results survive a restart"""
+    cache = self.cache(maxsize = 1)
+    location = cache.reverse((43.6, -116.2))
+    self.assertIsNone(cache.geocode('nowhere'))
+    cache.close()
+    cache = self.cache()
+    self.assertEqual(cache.reverse((43.6, -116.2)), location)
+    self.assertEqual(cache.reverse((43.6, -116.2)).raw, location.raw)
+    self.assertIsNone(cache.geocode('nowhere'))
+    self.assertEqual(len(self.geocoder.calls), 2)
+
+  def test_closed_disk_tier(self):
+    """After close() the memory tier keeps working"""
+    cache = self.cache()
+    cache.geocode('boise')
+    cache.close()
+    self.assertEqual(cache.geocode('boise').address, 'Boise')
+    self.assertEqual(cache.geocode('nampa').address, 'Nampa')
+    self.assertEqual(len(self.geocoder.calls), 2)
+
+  def test_ttl(self):
+    """Expired results are requested again"""
+    cache = self.cache(ttl = -1)
+    cache.geocode('boise')
+    cache.geocode('boise')
+    self.assertEqual(len(self.geocoder.calls), 2)
+
+  def test_errors_not_cached(self):
+    """Failures are raised and retried on the next call"""
+    cache = self.cache(max_retries = 0)
+    for _ in range(2):
+      with self.assertRaises(GeocoderServiceError):
+        cache.geocode('fail')
+    self.assertEqual(len(self.geocoder.calls), 2)
+
+  def test_concurrent_dedupe(self):
+    """Concurrent identical queries result in a single request"""
+    cache = self.cache()
+    self.geocoder.gate = threading.Event()
+    results = []
+    threads = [threading.Thread(target = lambda: results.append(
+      cache.geocode('boise'))) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    while not self.geocoder.calls:
+      threading.Event().wait(0.001)
+    self.geocoder.gate.set()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(self.geocoder.calls), 1)
+    self.assertEqual(len(results), 8)
+    self.assertTrue(all(result == results[0] for result in results))
+
+  def test_batch_rate_limits_misses_only(self):
+    """Batches answer hits without waiting and request each miss once"""
+    cache = self.cache(min_delay_seconds = 1)
+    clock, sleeps = [0.0], []
+    def sleep(seconds):
+      sleeps.append(seconds)
+      clock[0] += seconds
+    cache._limiter._clock = lambda: clock[0]
+    cache._limiter._sleep = sleep
+    cache.geocode_many(['boise', 'nampa'])
+    self.geocoder.calls.clear()
+    sleeps.clear()
+    results = cache.geocode_many(['Boise', 'meridian', 'nampa', 'Meridian'])
+    self.assertEqual([call[1] for call in self.geocoder.calls], ['meridian'])
+    self.assertEqual([r.address for r in results],
+                     ['Boise', 'Meridian', 'Nampa', 'Meridian'])
+    self.assertEqual(sleeps, [1])  # Only the miss waits for the last request
+    points = [(43.6, -116.2), (43.6, -116.2), (43.7, -116.3)]
+    self.assertEqual(len(cache.reverse_many(points)), 3)
+    self.assertEqual(len(self.geocoder.calls), 3)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,92 @@
+"""Bounded-queue pipeline stages for the Mobile Site Survey dispatcher.
+
+Each Stage owns a worker thread fed by a bounded queue.  When the queue is
+full the stage applies its drop policy:
+
+    BLOCK       - producer waits for room (backpressure, nothing is lost)
+    DROP_OLDEST - oldest queued item is discarded to make room
+    DROP_NEWEST - incoming item is discarded
+"""
+
+from threading import Thread, Lock
+import queue
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+
+
+class Stage:
+    """Worker thread that passes each queued item to handler."""
+
+    def __init__(self, name, handler, maxsize=10, policy=BLOCK, log=print):
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.log = log
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.processed = 0
+        self._lock = Lock()
+        self._thread = None
+
+    def start(self):
+        """Start worker thread and return self."""
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, item):
+        """Queue item according to drop policy.  Returns False if an item was dropped."""
+        if self.policy == BLOCK:
+            self.queue.put(item)
+            return True
+        with self._lock:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return False
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                except queue.Empty:
+                    pass
+                self.queue.put_nowait(item)
+                return False
+
+    def stats(self):
+        """Return dict of queue statistics."""
+        return {"queued": self.queue.qsize(), "processed": self.processed, "dropped": self.dropped}
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self.handler(item)
+            except Exception as e:
+                self.log(f'Exception in {self.name} stage: {e}')
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+
+class Fanout:
+    """Deliver each item to several stages."""
+
+    def __init__(self, *stages):
+        self.stages = list(stages)
+
+    def put(self, item):
+        for stage in self.stages:
+            stage.put(item)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,207 @@
+"""Concurrent packet loss/latency probes for Mobile Site Survey.
+
+Sends ICMP echo (or UDP echo) probes to a host on several interfaces at the
+same time from non-blocking sockets driven by one selector, instead of
+running the router's single control/ping facility once per modem.  Each
+socket is bound to its interface with SO_BINDTODEVICE and/or to the
+interface source address.
+
+Returns the same tx/rx/loss/min/avg/max dict as the control/ping parser.
+
+Try it locally over loopback:
+    python probe.py 127.0.0.1 lo
+"""
+
+import itertools
+import selectors
+import socket
+import struct
+import time
+import os
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+UDP_MAGIC = b'MSSP'
+
+_ids = itertools.count((os.getpid() * 7) & 0xffff)
+
+
+def checksum(data):
+    """Return internet checksum of data"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def icmp_echo(ident, seq, size):
+    """Return ICMP echo request packet"""
+    payload = bytes(size)
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum(header + payload), ident, seq) + payload
+
+
+class Target:
+    """Probe state for one interface."""
+
+    def __init__(self, key, host, iface=None, source=None, mode='icmp', port=7):
+        self.key = key
+        self.host = host
+        self.iface = iface
+        self.source = source
+        self.mode = mode
+        self.port = port
+        self.ident = next(_ids) & 0xffff
+        self.raw = False
+        self.sent = {}
+        self.rtts = []
+        self.error = None
+        self.sock = self._open()
+
+    def _open(self):
+        address = socket.gethostbyname(self.host)
+        if self.mode == 'udp':
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            except PermissionError:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+                self.raw = True
+        try:
+            if self.iface:
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, getattr(socket, 'SO_BINDTODEVICE', 25),
+                                    self.iface.encode())
+                except OSError:
+                    if not self.source:
+                        raise
+            if self.source:
+                sock.bind((self.source, 0))
+            sock.setblocking(False)
+            sock.connect((address, self.port if self.mode == 'udp' else 0))
+        except OSError:
+            sock.close()
+            raise
+        if not self.raw and self.mode != 'udp':
+            self.ident = sock.getsockname()[1]  # Kernel assigns echo id for unprivileged ICMP sockets
+        return sock
+
+    def send(self, seq, size):
+        if self.mode == 'udp':
+            packet = UDP_MAGIC + struct.pack('!HH', self.ident, seq) + bytes(max(0, size - 8))
+        else:
+            packet = icmp_echo(self.ident, seq, size)
+        self.sent[seq] = time.monotonic()
+        try:
+            self.sock.send(packet)
+        except OSError as e:
+            self.error = str(e)
+
+    def receive(self):
+        now = time.monotonic()
+        while True:
+            try:
+                data = self.sock.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.error = str(e)
+                return
+            seq = self._parse(data)
+            if seq is not None and seq in self.sent:
+                self.rtts.append((now - self.sent.pop(seq)) * 1000)
+
+    def _parse(self, data):
+        """Return sequence number of our echo reply in data, or None"""
+        if self.mode == 'udp':
+            if data[:4] != UDP_MAGIC or len(data) < 8:
+                return None
+            ident, seq = struct.unpack('!HH', data[4:8])
+            return seq if ident == self.ident else None
+        if self.raw:
+            data = data[(data[0] & 0x0f) * 4:]  # Strip IP header
+        if len(data) < 8:
+            return None
+        kind, code, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+        if kind != ICMP_ECHO_REPLY or (self.raw and ident != self.ident):
+            return None
+        return seq
+
+    def stats(self, tx):
+        result = {"host": self.host, "iface": self.iface, "tx": tx, "rx": len(self.rtts),
+                  "loss": round((tx - len(self.rtts)) / tx * 100, 1) if tx else 100.0}
+        if self.rtts:
+            result.update({"min": round(min(self.rtts), 3), "avg": round(sum(self.rtts) / len(self.rtts), 3),
+                           "max": round(max(self.rtts), 3)})
+        if self.error:
+            result["error"] = self.error
+        return result
+
+    def close(self):
+        self.sock.close()
+
+
+class Prober:
+    """Sends count probes every interval seconds to all targets concurrently."""
+
+    def __init__(self, count=10, interval=0.5, wait=2.0, size=56, mode='icmp', port=7):
+        self.count = count
+        self.interval = interval
+        self.wait = wait
+        self.size = size
+        self.mode = mode
+        self.port = port
+
+    def probe(self, targets):
+        """Probe targets concurrently.
+
+        targets is a dict of key: {"host": host, "iface": iface, "source": source_ip}.
+        Returns dict of key: {"tx", "rx", "loss", "min", "avg", "max"} (plus "error" on failure).
+        """
+        results = {}
+        active = []
+        selector = selectors.DefaultSelector()
+        for key, target in targets.items():
+            try:
+                t = Target(key, target["host"], target.get("iface"), target.get("source"), self.mode, self.port)
+            except OSError as e:
+                results[key] = {"host": target["host"], "iface": target.get("iface"), "tx": 0, "rx": 0,
+                                "loss": 100.0, "error": str(e)}
+                continue
+            selector.register(t.sock, selectors.EVENT_READ, t)
+            active.append(t)
+        try:
+            start = time.monotonic()
+            deadline = start + (self.count - 1) * self.interval + self.wait
+            seq = 0
+            while active:
+                now = time.monotonic()
+                if seq < self.count and now >= start + seq * self.interval:
+                    for t in active:
+                        t.send(seq, self.size)
+                    seq += 1
+                    continue
+                if seq >= self.count and (now >= deadline or not any(t.sent for t in active)):
+                    break
+                next_event = start + seq * self.interval if seq < self.count else deadline
+                for key, _ in selector.select(max(0.0, next_event - now)):
+                    key.data.receive()
+        finally:
+            for t in active:
+                results[t.key] = t.stats(self.count)
+                selector.unregister(t.sock)
+                t.close()
+            selector.close()
+        return results
+
+
+if __name__ == '__main__':
+    import sys
+    host = sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1'
+    ifaces = sys.argv[2:] or ['lo']
+    prober = Prober(count=5, interval=0.2)
+    for iface, result in prober.probe({iface: {"host": host, "iface": iface} for iface in ifaces}).items():
+        print(iface, result)
@@ -0,0 +1,190 @@
+"""Indexed SQLite store for Mobile Site Survey results.
+
+Results are buffered and inserted in batches into a WAL-mode database with
+indexes on timestamp, carrier, ICCID and geohash so the web UI can query by
+time window, carrier and distance without reading the CSV files.  The CSV
+files remain available as a derived view via export_csv().
+"""
+
+from threading import Thread, Lock
+import sqlite3
+import time
+import geohash
+
+GEOHASH_PRECISION = 9
+GEOHASH_END = '~'  # Sorts after every geohash character
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    modem TEXT,
+    iccid TEXT,
+    carrier TEXT,
+    wan_type TEXT,
+    lat REAL,
+    lon REAL,
+    accuracy REAL,
+    geohash TEXT,
+    download REAL,
+    upload REAL,
+    latency REAL,
+    packet_loss_percent REAL,
+    rsrp REAL,
+    sinr REAL,
+    cell_id TEXT,
+    header TEXT,
+    row TEXT
+);
+CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp);
+CREATE INDEX IF NOT EXISTS results_carrier ON results (carrier, timestamp);
+CREATE INDEX IF NOT EXISTS results_iccid ON results (iccid, timestamp);
+CREATE INDEX IF NOT EXISTS results_geohash ON results (geohash);
+'''
+
+COLUMNS = ['timestamp', 'modem', 'iccid', 'carrier', 'wan_type', 'lat', 'lon', 'accuracy', 'geohash',
+           'download', 'upload', 'latency', 'packet_loss_percent', 'rsrp', 'sinr', 'cell_id', 'header', 'row']
+
+QUERY_COLUMNS = ['id'] + COLUMNS[:-2]
+
+
+def to_float(value):
+    """Return value as float or None"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """SQL function - distance in meters between two points, NULL if either is unknown"""
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    return geohash.haversine(lat1, lon1, lat2, lon2)
+
+
+class ResultsStore:
+    """Batched SQLite results store with time, carrier and location queries."""
+
+    def __init__(self, path, batch_size=20, flush_interval=30, log=print):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log = log
+        self.pending = []
+        self.first_pending = None
+        self._lock = Lock()
+        self._thread = None
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.create_function('distance_m', 4, distance_m)
+
+    def start(self):
+        """Start background thread that flushes batches older than flush_interval."""
+        self._thread = Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def add(self, record):
+        """Buffer a result record (dict with COLUMNS keys) for insertion."""
+        lat, lon = to_float(record.get('lat')), to_float(record.get('lon'))
+        record = dict(record, lat=lat, lon=lon)
+        if lat is not None and lon is not None:
+            record['geohash'] = geohash.encode(lat, lon, GEOHASH_PRECISION)
+        with self._lock:
+            if not self.pending:
+                self.first_pending = time.time()
+            self.pending.append(tuple(record.get(column) for column in COLUMNS))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        """Insert all pending records."""
+        with self._lock:
+            self._flush()
+
+    def query(self, since=None, until=None, carrier=None, iccid=None, near=None, limit=100, offset=0):
+        """Return (rows, total) of results newest first.
+
+        near is (lat, lon, radius_meters).  Rows are dicts of QUERY_COLUMNS plus distance when near is given.
+        """
+        where, params = [], []
+        if since is not None:
+            where.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('timestamp < ?')
+            params.append(until)
+        if carrier:
+            where.append('carrier = ?')
+            params.append(carrier)
+        if iccid:
+            where.append('iccid = ?')
+            params.append(iccid)
+        columns = ', '.join(QUERY_COLUMNS)
+        if near:
+            lat, lon, radius = near
+            cells = geohash.covering(lat, lon, radius)
+            # Prefix ranges rather than LIKE, which is case-insensitive and so cannot use the geohash index
+            where.append('(' + ' OR '.join(['(geohash >= ? AND geohash < ?)'] * len(cells)) + ')')
+            for cell in cells:
+                params.extend([cell, cell + GEOHASH_END])
+            where.append('distance_m(lat, lon, ?, ?) <= ?')
+            params.extend([lat, lon, radius])
+            columns += ', distance_m(lat, lon, ?, ?) AS distance'
+        clause = f' WHERE {" AND ".join(where)}' if where else ''
+        # Unary + keeps the planner from walking the timestamp index to avoid a sort, which scans every row
+        order = '+timestamp DESC, +id DESC' if near else 'timestamp DESC, id DESC'
+        self.flush()
+        with self._lock:
+            total = self.db.execute(f'SELECT COUNT(*) FROM results{clause}', params).fetchone()[0]
+            select_params = ([lat, lon] if near else []) + params + [limit, offset]
+            rows = self.db.execute(f'SELECT {columns} FROM results{clause} ORDER BY {order} '
+                                   f'LIMIT ? OFFSET ?', select_params).fetchall()
+        return [dict(row) for row in rows], total
+
+    def carriers(self):
+        """Return list of distinct carriers."""
+        self.flush()
+        with self._lock:
+            return [row[0] for row in self.db.execute('SELECT DISTINCT carrier FROM results ORDER BY carrier')]
+
+    def export_csv(self, iccid, out):
+        """Write CSV of all results for iccid to file-like out, in timestamp order."""
+        self.flush()
+        header = None
+        with self._lock:
+            rows = self.db.execute('SELECT header, row FROM results WHERE iccid = ? ORDER BY timestamp, id',
+                                   (iccid,)).fetchall()
+        for row in rows:
+            if row['header'] != header:
+                header = row['header']
+                out.write(header)
+            out.write(row['row'])
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self.db.close()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        try:
+            with self.db:
+                self.db.executemany(f'INSERT INTO results ({", ".join(COLUMNS)}) '
+                                    f'VALUES ({", ".join("?" * len(COLUMNS))})', self.pending)
+            self.pending = []
+            self.first_pending = None
+        except Exception as e:
+            self.log(f'Exception writing results to {self.path}: {e}')
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(1)
+            with self._lock:
+                if self.first_pending and time.time() - self.first_pending >= self.flush_interval:
+                    self._flush()
@@ -0,0 +1,132 @@
+"""Buffered CSV results writer for Mobile Site Survey.
+
+Keeps one open file handle per results file, remembers which files already
+have a header, and batches rows in memory.  Buffers are flushed and fsynced
+when flush_rows rows are pending or the oldest pending row is flush_interval
+seconds old, so at most one batch is lost on power failure.  Files are
+rotated when they exceed max_size bytes or, optionally, when the day changes.
+"""
+
+from threading import Thread, Lock
+import datetime
+import os
+import time
+
+
+class ResultsFile:
+    """Open CSV file with its pending rows."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.rows = []
+        self.first_pending = None
+        self.day = datetime.date.today()
+        self.created = not os.path.isfile(path)
+        self.handle = open(path, 'a')
+        self.size = self.handle.tell()
+        if self.created or self.size == 0:
+            self.handle.write(header)
+            self.size += len(header)
+
+    def append(self, text):
+        if not self.rows:
+            self.first_pending = time.time()
+        self.rows.append(text)
+
+    def flush(self):
+        if self.rows:
+            text = ''.join(self.rows)
+            self.handle.write(text)
+            self.size += len(text)
+            self.rows = []
+            self.first_pending = None
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    def close(self):
+        self.flush()
+        self.handle.close()
+
+
+class ResultsWriter:
+    """Per-file buffered CSV writer with time/size flush and rotation."""
+
+    def __init__(self, results_dir, flush_rows=20, flush_interval=30, max_size=0, rotate_daily=False, log=print):
+        self.results_dir = results_dir
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.rotate_daily = rotate_daily
+        self.log = log
+        self.files = {}
+        self._lock = Lock()
+        self._thread = None
+        os.makedirs(results_dir, exist_ok=True)
+
+    def start(self):
+        """Start background thread that flushes buffers older than flush_interval."""
+        self._thread = Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, filename, header, text):
+        """Buffer text for filename, creating the file with header if needed.  Returns True if file was created."""
+        with self._lock:
+            results_file = self._open(filename, header)
+            results_file.append(text)
+            created, results_file.created = results_file.created, False
+            if len(results_file.rows) >= self.flush_rows:
+                self._flush(filename, results_file)
+            return created
+
+    def flush(self):
+        """Flush all pending rows to disk."""
+        with self._lock:
+            for filename, results_file in list(self.files.items()):
+                self._flush(filename, results_file)
+
+    def close(self):
+        """Flush and close all files."""
+        with self._lock:
+            for results_file in self.files.values():
+                results_file.close()
+            self.files = {}
+
+    def _open(self, filename, header):
+        results_file = self.files.get(filename)
+        if results_file is None:
+            results_file = ResultsFile(os.path.join(self.results_dir, filename), header)
+            self.files[filename] = results_file
+        elif self.rotate_daily and results_file.day != datetime.date.today():
+            results_file = self._rotate(filename, results_file)
+        return results_file
+
+    def _flush(self, filename, results_file):
+        try:
+            results_file.flush()
+        except Exception as e:
+            self.log(f'Unable to write to {filename}. {e}')
+            return
+        if self.max_size and results_file.size >= self.max_size:
+            self._rotate(filename, results_file)
+
+    def _rotate(self, filename, results_file):
+        """Close results_file, rename it with a timestamp suffix and start a new one."""
+        results_file.close()
+        stem, ext = os.path.splitext(results_file.path)
+        stamp = datetime.datetime.now().strftime('%Y-%m-%d %H%M%S')
+        os.rename(results_file.path, f'{stem} {stamp}{ext}')
+        self.log(f'Rotated {filename}.')
+        results_file = ResultsFile(results_file.path, results_file.header)
+        self.files[filename] = results_file
+        return results_file
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(1)
+            now = time.time()
+            with self._lock:
+                for filename, results_file in list(self.files.items()):
+                    if results_file.first_pending and now - results_file.first_pending >= self.flush_interval:
+                        self._flush(filename, results_file)
@@ -0,0 +1,76 @@
+"""Bounded, thread-safe ring buffer of UI log entries.
+
+Each entry gets an increasing id so the web UI can poll for entries newer
+than the last id it has seen (its cursor) instead of downloading the whole
+log on every refresh.  clear() bumps epoch so clients know to reset; epoch
+starts at the process start time so an app restart resets clients too.
+
+Long-poll handlers subscribe() a callback that is called from the appending
+thread on every append or clear, instead of blocking a thread per request.
+"""
+
+from collections import deque
+from itertools import islice
+from threading import Lock
+import time
+
+
+class RingBuffer:
+    """Keeps the newest maxlen entries."""
+
+    def __init__(self, maxlen=500):
+        self.entries = deque(maxlen=maxlen)
+        self.epoch = int(time.time())
+        self._next_id = 1
+        self._waiters = set()
+        self._lock = Lock()
+
+    def append(self, msg, kind='log'):
+        """Add msg and wake subscribers.  Returns the new entry."""
+        with self._lock:
+            entry = {"id": self._next_id, "time": time.time(), "kind": kind, "msg": msg}
+            self._next_id += 1
+            self.entries.append(entry)
+            waiters = list(self._waiters)
+        self._wake(waiters)
+        return entry
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self.entries.clear()
+            self.epoch += 1
+            waiters = list(self._waiters)
+        self._wake(waiters)
+
+    def cursor(self):
+        """Return id of newest entry."""
+        return self._next_id - 1
+
+    def since(self, cursor=0, epoch=None):
+        """Return dict of entries newer than cursor (oldest first), new cursor and epoch.
+
+        A cursor from another epoch or ahead of the newest entry (app restarted) returns all entries.
+        """
+        with self._lock:
+            if (epoch is not None and epoch != self.epoch) or cursor > self._next_id - 1:
+                cursor = 0
+            start = max(0, cursor - self.entries[0]["id"] + 1) if self.entries else 0
+            entries = list(islice(self.entries, start, None))
+            return {"entries": entries, "cursor": self._next_id - 1, "epoch": self.epoch}
+
+    def subscribe(self, callback):
+        """Call callback() after every append or clear until unsubscribed."""
+        with self._lock:
+            self._waiters.add(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._waiters.discard(callback)
+
+    def _wake(self, waiters):
+        for callback in waiters:
+            try:
+                callback()
+            except Exception:
+                pass
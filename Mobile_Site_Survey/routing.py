@@ -0,0 +1,134 @@
+"""Routing table/policy provisioning for per-modem tests.
+
+Each modem gets a routing table (MSS-<modem>) with a default route out of
+the modem and a policy routing packets sourced from the modem IP to that
+table, so speedtests bound to the modem IP egress the right WAN.
+
+RoutingProvisioner applies only what is missing or changed and caches the
+assigned table id per modem and source IP.  The cache entry is
+invalidated when the modem's IP changes (config store event) or a test on it
+fails, so normal surveys need a single config store read per modem.
+
+cleanup() removes the MSS tables and policies and restores the priority of
+the policy they were placed ahead of, so nothing is left behind when the
+app stops.
+"""
+
+from threading import Lock
+import time
+
+
+class RoutingProvisioner:
+    """Creates and caches MSS routing tables and policies."""
+
+    def __init__(self, cp, log=None):
+        self.cp = cp
+        self.log = log or cp.log
+        self.assigned = {}
+        self.registered = set()
+        self.demoted = None  # (_id_, original priority) of the policy moved behind MSS policies
+        self._lock = Lock()
+
+    def ensure(self, modem):
+        """Return source IP of modem, provisioning its routing table and policy if needed."""
+        with self._lock:
+            assigned = self.assigned.get(modem)
+            if assigned:
+                return assigned["source_ip"]
+            self._register(modem)
+            source_ip = self.cp.get(f'status/wan/devices/{modem}/status/ipinfo/ip_address')
+            if not source_ip:
+                return None
+            changed, table_id, mss_tables = self._ensure_table(modem)
+            changed |= self._ensure_policy(table_id, source_ip, mss_tables)
+            if changed:
+                time.sleep(1)  # Allow routing changes to apply
+            self.assigned[modem] = {"source_ip": source_ip, "table_id": table_id}
+            return source_ip
+
+    def invalidate(self, modem=None):
+        """Forget cached routing for modem (or all modems)."""
+        with self._lock:
+            if modem is None:
+                self.assigned.clear()
+            else:
+                self.assigned.pop(modem, None)
+
+    def cleanup(self):
+        """Remove MSS routing tables and policies and restore the demoted policy's priority."""
+        with self._lock:
+            self.assigned.clear()
+            try:
+                tables = self.cp.get('config/routing/tables') or []
+                mss_tables = {table["_id_"] for table in tables if table["name"].startswith('MSS-')}
+                policies = self.cp.get('config/routing/policies') or []
+                # Delete from the end so earlier indexes stay valid
+                for index in reversed(range(len(policies))):
+                    if policies[index].get("table") in mss_tables:
+                        self.cp.delete(f'config/routing/policies/{index}')
+                for index in reversed(range(len(tables))):
+                    if tables[index]["_id_"] in mss_tables:
+                        self.cp.delete(f'config/routing/tables/{index}')
+                if self.demoted:
+                    policy_id, priority = self.demoted
+                    policies = self.cp.get('config/routing/policies') or []
+                    for index, policy in enumerate(policies):
+                        if policy.get("_id_") == policy_id:
+                            self.cp.put(f'config/routing/policies/{index}/priority', priority)
+                            break
+                    self.demoted = None
+                if mss_tables:
+                    self.log(f'Removed {len(mss_tables)} MSS routing tables.')
+            except Exception as e:
+                self.log(f'Unable to remove MSS routing: {e}')
+
+    def _ip_changed(self, path, value, args):
+        modem = args[0]
+        assigned = self.assigned.get(modem)
+        if assigned and (not isinstance(value, dict) or value.get('ip_address') != assigned["source_ip"]):
+            self.log(f'WAN IP changed on {modem} - updating routing.')
+            self.invalidate(modem)
+
+    def _register(self, modem):
+        if modem in self.registered or not hasattr(self.cp, 'on'):
+            return
+        try:
+            self.cp.on('put', f'status/wan/devices/{modem}/status/ipinfo', self._ip_changed, modem)
+            self.registered.add(modem)
+        except Exception as e:
+            self.log(f'Unable to register for {modem} IP changes: {e}')
+
+    def _ensure_table(self, modem):
+        """Return (changed, table_id, ids of all MSS tables) of the MSS routing table for modem."""
+        name = f'MSS-{modem}'
+        tables = self.cp.get('config/routing/tables') or []
+        mss_tables = {table["_id_"] for table in tables if table["name"].startswith('MSS-')}
+        for table in tables:
+            if table["name"] == name:
+                return False, table["_id_"], mss_tables
+        route_table = {"name": name, "routes": [
+            {"netallow": False, "ip_network": "0.0.0.0/0", "dev": modem, "auto_gateway": True}]}
+        req = self.cp.post('config/routing/tables/', route_table)
+        route_table_index = req["data"]
+        table_id = self.cp.get(f'config/routing/tables/{route_table_index}/_id_')
+        return True, table_id, mss_tables | {table_id}
+
+    def _ensure_policy(self, table_id, source_ip, mss_tables):
+        """Create or update the policy for table_id.  Returns True if config changed."""
+        changed = False
+        policies = self.cp.get('config/routing/policies') or []
+        # MSS policies (priority 1) must take precedence over the first existing policy
+        if policies and policies[0].get("table") not in mss_tables and policies[0].get("priority") != 10:
+            if self.demoted is None:
+                self.demoted = (policies[0].get("_id_"), policies[0].get("priority", 0))
+            self.cp.put('config/routing/policies/0/priority', 10)
+            changed = True
+        for index, policy in enumerate(policies):
+            if policy.get("table") == table_id:
+                if policy.get("src_ip_network") not in (source_ip, f'{source_ip}/32'):
+                    self.cp.put(f'config/routing/policies/{index}/src_ip_network', source_ip)
+                    changed = True
+                return changed
+        route_policy = {"ip_version": "ip4", "priority": 1, "table": table_id, "src_ip_network": source_ip}
+        self.cp.post('config/routing/policies/', route_policy)
+        return True
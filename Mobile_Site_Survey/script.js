@@ -33,10 +33,49 @@ function loadForm(config) {
     $('#surveyors').attr('value', config.surveyors);
     $('#debug').attr('checked', config.debug);
     $('#version').text('Mobile Site Survey v' + config.version);
-    if (config.results) {
-        $('#results').val(config.results);
+}
+
+// Results log - long-poll for entries newer than cursor and prepend them
+// Keeps at most log_max entries (the server's ring buffer size), newest first
+var log_cursor = 0;
+var log_epoch = null;
+var log_entries = [];
+const log_max = 500;
+
+function formatEntry(entry) {
+    if (entry.kind == 'title') {
+        return entry.msg;
+    }
+    return entry.msg + '\n\n';
+}
+
+async function pollLog() {
+    try {
+        var url = '/log?wait=25&cursor=' + log_cursor + (log_epoch == null ? '' : '&epoch=' + log_epoch);
+        const response = await fetch(url);
+        var log = await response.json();
+        // Log cleared or app restarted - the server resends everything it has
+        if ((log_epoch != null && log.epoch != log_epoch) || log.cursor < log_cursor) {
+            log_entries = [];
+        }
+        log_epoch = log.epoch;
+        log_cursor = log.cursor;
+        if (log.entries.length) {
+            for (const entry of log.entries) {
+                log_entries.unshift(formatEntry(entry));
+            }
+            log_entries.length = Math.min(log_entries.length, log_max);
+            $('#results').val(log_entries.join(''));
+        } else if (!log_entries.length) {
+            $('#results').val('Waiting for test results...');
+        }
+        setTimeout(pollLog, 100);
+    } catch (e) {
+        console.log(e);
+        setTimeout(pollLog, 5000);
     }
 }
 
 // Calling that async function
 getapi(api_url);
+pollLog();
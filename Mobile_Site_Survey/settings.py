@@ -2,19 +2,28 @@ settings = {
     "enabled": True,
     "all_wans": False,
     "min_distance": 50,
+    "cell_samples": 1,
     "enable_timer": False,
     "min_time": 0,
     "speedtests": True,
     "dead_reckoning": False,
     "packet_loss": True,
+    "native_ping": True,
     "write_csv": True,
+    "write_db": True,
     "debug": False,
     "send_to_server": False,
     "full_diagnostics": False,
     "include_logs": False,
     "server_url": "https://5g-ready.io/injector",
     "server_token": "",
+    "server_batch_size": 1,
+    "server_gzip": False,
     "enable_surveyors": False,
     "surveyors": [],
-    "speedtest_url": "www.speedtest.net/speedtest-config.php"
+    "speedtest_url": "www.speedtest.net/speedtest-config.php",
+    "csv_flush_rows": 20,
+    "csv_flush_interval": 30,
+    "csv_max_size": 10000000,
+    "csv_rotate_daily": False
 }
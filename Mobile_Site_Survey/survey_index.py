@@ -0,0 +1,112 @@
+"""Spatial grid index of survey points for Mobile Site Survey.
+
+Points are bucketed into a uniform grid of roughly cell_size x cell_size
+meter cells.  With cell_size equal to the minimum survey distance, any point
+within that distance of a location lies in the location's cell or one of its
+neighbors, so spacing checks cost O(1) per GPS fix regardless of how many
+points have been surveyed.  Points are appended to a file so the index
+survives restarts.
+"""
+
+from threading import Lock
+import math
+import os
+from geohash import haversine
+
+METERS_PER_DEGREE = 111320.0
+
+
+class SurveyIndex:
+    """Grid of prior survey points."""
+
+    def __init__(self, path=None, cell_size=50, log=print):
+        self.path = path
+        self.log = log
+        self.points = []
+        self.cells = {}
+        self._lock = Lock()
+        self.cell_size = max(1.0, float(cell_size))
+        self._load()
+
+    def __len__(self):
+        return len(self.points)
+
+    def resize(self, cell_size):
+        """Rebuild grid for new cell_size (e.g. when minimum distance changes)."""
+        cell_size = max(1.0, float(cell_size))
+        with self._lock:
+            if cell_size == self.cell_size:
+                return
+            self.cell_size = cell_size
+            self.cells = {}
+            for lat, lon in self.points:
+                self.cells.setdefault(self.cell(lat, lon), []).append((lat, lon))
+
+    def cell(self, lat, lon):
+        """Return (row, col) grid cell of lat, lon"""
+        row_height = self.cell_size / METERS_PER_DEGREE
+        row = math.floor((lat + 90) / row_height)
+        return row, math.floor((lon + 180) / self._col_width(row))
+
+    def add(self, lat, lon):
+        """Add survey point and persist it."""
+        lat, lon = float(lat), float(lon)
+        with self._lock:
+            self.points.append((lat, lon))
+            self.cells.setdefault(self.cell(lat, lon), []).append((lat, lon))
+            if self.path:
+                try:
+                    with open(self.path, 'a') as f:
+                        f.write(f'{lat},{lon}\n')
+                except OSError as e:
+                    self.log(f'Unable to save survey point to {self.path}: {e}')
+
+    def count(self, lat, lon):
+        """Return number of survey points in the grid cell containing lat, lon"""
+        with self._lock:
+            return len(self.cells.get(self.cell(float(lat), float(lon)), ()))
+
+    def nearest(self, lat, lon, radius=None):
+        """Return distance in meters to the nearest survey point within radius (default cell_size), or None"""
+        radius = self.cell_size if radius is None else radius
+        lat, lon = float(lat), float(lon)
+        best = None
+        with self._lock:
+            for cell in self._neighborhood(lat, lon, radius):
+                for point in self.cells.get(cell, ()):
+                    dist = haversine(lat, lon, point[0], point[1])
+                    if dist <= radius and (best is None or dist < best):
+                        best = dist
+        return best
+
+    def _col_width(self, row):
+        row_height = self.cell_size / METERS_PER_DEGREE
+        lat = min(89.9, abs(row * row_height - 90 + row_height / 2))
+        return min(360.0, self.cell_size / (METERS_PER_DEGREE * math.cos(math.radians(lat))))
+
+    def _neighborhood(self, lat, lon, radius):
+        """Yield grid cells that may contain points within radius of lat, lon"""
+        row_height = self.cell_size / METERS_PER_DEGREE
+        reach = max(1, math.ceil(radius / self.cell_size))
+        row = math.floor((lat + 90) / row_height)
+        for r in range(row - reach, row + reach + 1):
+            col_width = self._col_width(r)
+            col = math.floor((lon + 180) / col_width)
+            col_reach = reach + 1  # column widths differ slightly between rows
+            for c in range(col - col_reach, col + col_reach + 1):
+                yield r, c
+
+    def _load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        lat, lon = (float(x) for x in line.split(','))
+                    except ValueError:
+                        continue
+                    self.points.append((lat, lon))
+                    self.cells.setdefault(self.cell(lat, lon), []).append((lat, lon))
+        except OSError as e:
+            self.log(f'Unable to load survey points from {self.path}: {e}')
@@ -0,0 +1,95 @@
+"""
+Unit tests for the coverage heat-map aggregation.
+Checks the quantile sketch, per-cell statistics, tile lookups and persistence.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import tempfile
+import unittest
+from coverage import CoverageMap, Sketch
+
+BOISE = (43.6150, -116.2023)
+
+
+def tile_of(lat, lon, z):
+    """Return x, y of the slippy map tile containing lat, lon at zoom z."""
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+class TestSketch(unittest.TestCase):
+    """Test cases for the log-bucket quantile sketch."""
+
+    def test_relative_accuracy(self):
+        """Test that quantiles are within the sketch's relative accuracy."""
+        sketch = Sketch(accuracy=0.05)
+        for value in range(1, 101):
+            sketch.add(value)
+        self.assertAlmostEqual(sketch.quantile(0.5), 50, delta=50 * 0.05 + 1)
+        self.assertAlmostEqual(sketch.quantile(0.9), 90, delta=90 * 0.05 + 1)
+
+    def test_zeros_and_empty(self):
+        """Test that zero values count toward the lowest quantiles and an empty sketch has none."""
+        sketch = Sketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        sketch.add(0)
+        sketch.add(0)
+        sketch.add(10)
+        self.assertEqual(sketch.quantile(0.1), 0.0)
+
+    def test_dump_load(self):
+        """Test that a dumped sketch loads with the same quantiles."""
+        sketch = Sketch()
+        for value in (3, 30, 300):
+            sketch.add(value)
+        self.assertEqual(Sketch.load(sketch.dump()).quantile(0.5), sketch.quantile(0.5))
+
+
+class TestCoverageMap(unittest.TestCase):
+    """Test cases for CoverageMap cells and tiles."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'coverage.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_tile_summarises_cell(self):
+        """Test that results in one cell are summarised in the tile containing it."""
+        coverage = CoverageMap()
+        coverage.add(*BOISE, rsrp=-90, sinr=10, download=100.0, upload=10.0)
+        coverage.add(*BOISE, rsrp=-100, sinr=0, download=50.0)
+        x, y = tile_of(*BOISE, 14)
+        tile = coverage.tile(14, x, y)
+        self.assertEqual(len(tile["cells"]), 1)
+        cell = tile["cells"][0]
+        self.assertEqual(cell["count"], 2)
+        self.assertEqual(cell["rsrp"], {"mean": -95.0, "min": -100, "max": -90})
+        self.assertIsNotNone(cell["download"]["p90"])
+        self.assertEqual(cell["sinr"]["mean"], 5.0)
+
+    def test_other_tile_is_empty(self):
+        """Test that a tile elsewhere has no cells."""
+        coverage = CoverageMap()
+        coverage.add(*BOISE, rsrp=-90)
+        x, y = tile_of(*BOISE, 14)
+        self.assertEqual(coverage.tile(14, x + 2, y)["cells"], [])
+
+    def test_save_load_round_trip(self):
+        """Test that saved cells are loaded by a new map on the same file."""
+        coverage = CoverageMap(self.path)
+        coverage.add(*BOISE, rsrp=-90, download=100.0)
+        coverage.save()
+        x, y = tile_of(*BOISE, 12)
+        reloaded = CoverageMap(self.path)
+        self.assertEqual(reloaded.tile(12, x, y)["cells"], coverage.tile(12, x, y)["cells"])
+
+
+if __name__ == '__main__':
+    unittest.main()
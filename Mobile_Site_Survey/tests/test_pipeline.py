@@ -0,0 +1,103 @@
+"""
+Unit tests for the bounded-queue pipeline stages.
+Checks each drop policy with a handler that is held until the test releases it.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import unittest
+from pipeline import Stage, Fanout, BLOCK, DROP_OLDEST, DROP_NEWEST
+
+
+class TestStage(unittest.TestCase):
+    """Test cases for Stage drop policies."""
+
+    def setUp(self):
+        self.handled = []
+        self.release = threading.Event()
+        self.busy = threading.Event()
+
+    def handler(self, item):
+        self.busy.set()
+        self.release.wait(5)
+        self.handled.append(item)
+
+    def start_busy(self, policy):
+        """Return a started stage of size 1 whose worker is busy with item 0."""
+        stage = Stage('test', self.handler, maxsize=1, policy=policy, log=lambda msg: None).start()
+        stage.put(0)
+        self.assertTrue(self.busy.wait(5))
+        return stage
+
+    def finish(self, stage):
+        self.release.set()
+        stage.queue.join()
+
+    def test_drop_newest(self):
+        """Test that a full DROP_NEWEST stage refuses the incoming item."""
+        stage = self.start_busy(DROP_NEWEST)
+        self.assertTrue(stage.put(1))
+        self.assertFalse(stage.put(2))
+        self.finish(stage)
+        self.assertEqual(self.handled, [0, 1])
+        self.assertEqual(stage.stats(), {"queued": 0, "processed": 2, "dropped": 1})
+
+    def test_drop_oldest(self):
+        """Test that a full DROP_OLDEST stage replaces the queued item with the incoming one."""
+        stage = self.start_busy(DROP_OLDEST)
+        self.assertTrue(stage.put(1))
+        self.assertFalse(stage.put(2))
+        self.finish(stage)
+        self.assertEqual(self.handled, [0, 2])
+        self.assertEqual(stage.dropped, 1)
+
+    def test_block(self):
+        """Test that a full BLOCK stage makes the producer wait and loses nothing."""
+        stage = self.start_busy(BLOCK)
+        stage.put(1)
+        producer = threading.Thread(target=stage.put, args=(2,))
+        producer.start()
+        producer.join(0.1)
+        self.assertTrue(producer.is_alive())
+        self.finish(stage)
+        producer.join(5)
+        stage.queue.join()
+        self.assertEqual(self.handled, [0, 1, 2])
+        self.assertEqual(stage.dropped, 0)
+
+    def test_handler_exception_is_logged(self):
+        """Test that a failing handler is logged and the worker keeps running."""
+        logs = []
+        handled = []
+
+        def handler(item):
+            if item == 'bad':
+                raise ValueError('boom')
+            handled.append(item)
+        stage = Stage('test', handler, log=logs.append).start()
+        stage.put('bad')
+        stage.put('good')
+        stage.queue.join()
+        self.assertEqual(handled, ['good'])
+        self.assertEqual(logs, ['Exception in test stage: boom'])
+
+
+class TestFanout(unittest.TestCase):
+    """Test cases for delivering items to several stages."""
+
+    def test_every_stage_gets_item(self):
+        """Test that each stage handles every item."""
+        a, b = [], []
+        fanout = Fanout(Stage('a', a.append), Stage('b', b.append)).start()
+        for i in range(3):
+            fanout.put(i)
+        for stage in fanout.stages:
+            stage.queue.join()
+        self.assertEqual((a, b), ([0, 1, 2], [0, 1, 2]))
+        self.assertEqual(set(fanout.stats()), {'a', 'b'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Unit tests for the concurrent packet loss probes.
+Probes 127.0.0.1 over ICMP and UDP, so no modem or network is needed.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socket
+import threading
+import unittest
+from probe import Prober, checksum, icmp_echo
+
+
+def icmp_available():
+    """True if this user may open an ICMP socket (unprivileged or raw)."""
+    for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP).close()
+            return True
+        except OSError:
+            pass
+    return False
+
+
+class UDPEcho(threading.Thread):
+    """Echoes datagrams sent to 127.0.0.1 on an ephemeral port."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            self.sock.sendto(data, address)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        self.sock.close()
+
+
+class TestChecksum(unittest.TestCase):
+    """Test cases for the ICMP packet helpers."""
+
+    def test_echo_checksum_verifies(self):
+        """A packet with its checksum filled in sums to zero."""
+        self.assertEqual(checksum(icmp_echo(0x1234, 7, 56)), 0)
+
+    def test_odd_length(self):
+        """Odd length data is padded with a zero byte."""
+        self.assertEqual(checksum(b'\x01'), checksum(b'\x01\x00'))
+
+
+class TestUDPProbe(unittest.TestCase):
+    """Test cases for UDP echo probes over loopback."""
+
+    def setUp(self):
+        self.echo = UDPEcho()
+        self.echo.start()
+
+    def tearDown(self):
+        self.echo.stop()
+
+    def test_all_replies_received(self):
+        """Every probe sent to a UDP echo server is answered."""
+        prober = Prober(count=5, interval=0.05, wait=1.0, mode='udp', port=self.echo.port)
+        result = prober.probe({"lo": {"host": '127.0.0.1'}})["lo"]
+        self.assertEqual(result["tx"], 5)
+        self.assertEqual(result["rx"], 5)
+        self.assertEqual(result["loss"], 0.0)
+        self.assertLessEqual(result["min"], result["avg"])
+        self.assertLessEqual(result["avg"], result["max"])
+        self.assertNotIn("error", result)
+
+    def test_concurrent_targets(self):
+        """Several targets probed at once each count only their own replies."""
+        prober = Prober(count=3, interval=0.05, wait=0.5, mode='udp', port=self.echo.port)
+        results = prober.probe({"a": {"host": '127.0.0.1'}, "b": {"host": '127.0.0.1'}})
+        self.assertEqual([results["a"]["rx"], results["b"]["rx"]], [3, 3])
+
+
+@unittest.skipUnless(icmp_available(), 'ICMP sockets not permitted for this user')
+class TestICMPProbe(unittest.TestCase):
+    """Test cases for ICMP echo probes over loopback."""
+
+    def test_all_replies_received(self):
+        """Every echo request to 127.0.0.1 is answered."""
+        prober = Prober(count=5, interval=0.05, wait=1.0)
+        result = prober.probe({"lo": {"host": '127.0.0.1'}})["lo"]
+        self.assertEqual(result["tx"], 5)
+        self.assertEqual(result["rx"], 5)
+        self.assertEqual(result["loss"], 0.0)
+
+    def test_concurrent_targets(self):
+        """Several targets probed at once each get their own replies."""
+        prober = Prober(count=3, interval=0.05, wait=1.0)
+        results = prober.probe({"a": {"host": '127.0.0.1'}, "b": {"host": '127.0.0.1'}})
+        self.assertEqual([results["a"]["rx"], results["b"]["rx"]], [3, 3])
+
+
+class TestFailures(unittest.TestCase):
+    """Test cases for lost probes and targets whose socket cannot be set up."""
+
+    def test_no_echo_server(self):
+        """Probes to a closed port are all lost."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        prober = Prober(count=3, interval=0.05, wait=0.3, mode='udp', port=port)
+        result = prober.probe({"lo": {"host": '127.0.0.1'}})["lo"]
+        self.assertEqual(result["tx"], 3)
+        self.assertEqual(result["rx"], 0)
+        self.assertEqual(result["loss"], 100.0)
+
+    def test_unknown_interface(self):
+        """An interface that cannot be bound is reported as an error, not raised."""
+        prober = Prober(count=2, interval=0.05, wait=0.2, mode='udp', port=9)
+        result = prober.probe({"mdm": {"host": '127.0.0.1', "iface": 'no-such-iface0'}})["mdm"]
+        self.assertEqual(result["rx"], 0)
+        self.assertEqual(result["loss"], 100.0)
+        self.assertIn("error", result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Unit tests for the indexed SQLite results store.
+Checks the time, carrier, ICCID and distance filters of query() against a temporary database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import tempfile
+import unittest
+from results_store import ResultsStore
+
+BOISE = (43.6150, -116.2023)
+NAMPA = (43.5407, -116.5635)  # About 30 km west of Boise
+
+
+class TestQuery(unittest.TestCase):
+    """Test cases for ResultsStore.query filters."""
+
+    def setUp(self):
+        """Set up a store with results from two carriers in two cities."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.tmp_dir.name, 'survey.db'), batch_size=100)
+        self.add(100, 'Verizon', '8901', BOISE)
+        self.add(200, 'T-Mobile', '8902', (BOISE[0] + 0.0005, BOISE[1]))  # About 55 m north
+        self.add(300, 'Verizon', '8901', NAMPA)
+        self.add(400, 'T-Mobile', '8902', (None, None))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def add(self, timestamp, carrier, iccid, location):
+        self.store.add({"timestamp": timestamp, "carrier": carrier, "iccid": iccid, "lat": location[0],
+                        "lon": location[1], "header": 'h\n', "row": f'{timestamp}\n'})
+
+    def timestamps(self, **kwargs):
+        rows, total = self.store.query(**kwargs)
+        self.assertEqual(total, len(rows))
+        return [row["timestamp"] for row in rows]
+
+    def test_newest_first(self):
+        """Test that unfiltered results are returned newest first, including pending ones."""
+        self.assertEqual(self.timestamps(), [400, 300, 200, 100])
+
+    def test_time_window(self):
+        """Test that since is inclusive and until is exclusive."""
+        self.assertEqual(self.timestamps(since=200, until=400), [300, 200])
+
+    def test_carrier_and_iccid(self):
+        """Test that carrier and ICCID filters combine."""
+        self.assertEqual(self.timestamps(carrier='Verizon'), [300, 100])
+        self.assertEqual(self.timestamps(carrier='Verizon', iccid='8902'), [])
+        self.assertEqual(self.timestamps(iccid='8902'), [400, 200])
+
+    def test_near(self):
+        """Test that near returns results within the radius with their distance."""
+        rows, total = self.store.query(near=(BOISE[0], BOISE[1], 100))
+        self.assertEqual(total, 2)
+        self.assertEqual([row["timestamp"] for row in rows], [200, 100])
+        self.assertAlmostEqual(rows[1]["distance"], 0.0, places=3)
+        self.assertAlmostEqual(rows[0]["distance"], 55.6, delta=1.0)
+
+    def test_near_excludes_outside_radius(self):
+        """Test that points just outside the radius and results without a fix are excluded."""
+        self.assertEqual(self.timestamps(near=(BOISE[0], BOISE[1], 40)), [100])
+        self.assertEqual(self.timestamps(near=(NAMPA[0], NAMPA[1], 1000)), [300])
+
+    def test_near_uses_geohash_index(self):
+        """Test that the geohash cells are searched with the index, not a table scan."""
+        self.store.flush()
+        statements = []
+        self.store.db.set_trace_callback(statements.append)
+        self.store.query(near=(BOISE[0], BOISE[1], 100))
+        self.store.db.set_trace_callback(None)
+        select = next(sql for sql in statements if sql.startswith('SELECT id'))
+        plan = ' '.join(row["detail"] for row in self.store.db.execute(f'EXPLAIN QUERY PLAN {select}'))
+        self.assertIn('results_geohash', plan)
+        self.assertNotIn('SCAN results', plan)
+
+    def test_paging(self):
+        """Test that limit and offset page through results while total counts all matches."""
+        rows, total = self.store.query(limit=2, offset=1)
+        self.assertEqual([row["timestamp"] for row in rows], [300, 200])
+        self.assertEqual(total, 4)
+
+    def test_export_csv(self):
+        """Test that export writes the header once followed by the ICCID's rows in time order."""
+        out = io.StringIO()
+        self.store.export_csv('8901', out)
+        self.assertEqual(out.getvalue(), 'h\n100\n300\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for the UI log ring buffer.
+Checks the size bound, cursor and epoch handling and the subscriber wakeups used by the /log long-poll.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+import unittest
+from ring_buffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    """Test cases for RingBuffer entries and cursors."""
+
+    def test_keeps_newest_maxlen(self):
+        """Test that only the newest maxlen entries are kept while ids keep increasing."""
+        buffer = RingBuffer(maxlen=3)
+        for i in range(10):
+            buffer.append(str(i))
+        log = buffer.since(0)
+        self.assertEqual([entry["msg"] for entry in log["entries"]], ['7', '8', '9'])
+        self.assertEqual([entry["id"] for entry in log["entries"]], [8, 9, 10])
+        self.assertEqual(log["cursor"], 10)
+
+    def test_since_cursor(self):
+        """Test that since() returns only entries newer than the cursor."""
+        buffer = RingBuffer(maxlen=5)
+        for i in range(4):
+            buffer.append(str(i))
+        self.assertEqual([entry["msg"] for entry in buffer.since(2)["entries"]], ['2', '3'])
+        self.assertEqual(buffer.since(4)["entries"], [])
+
+    def test_cursor_behind_buffer(self):
+        """Test that a cursor older than the oldest kept entry returns everything kept."""
+        buffer = RingBuffer(maxlen=2)
+        for i in range(5):
+            buffer.append(str(i))
+        self.assertEqual([entry["msg"] for entry in buffer.since(1)["entries"]], ['3', '4'])
+
+    def test_clear_bumps_epoch(self):
+        """Test that clear() removes entries and changes the epoch."""
+        buffer = RingBuffer()
+        buffer.append('a')
+        epoch = buffer.epoch
+        buffer.clear()
+        log = buffer.since(0)
+        self.assertEqual(log["entries"], [])
+        self.assertNotEqual(log["epoch"], epoch)
+
+    def test_stale_cursor_resets(self):
+        """Test that a cursor from another epoch or ahead of the newest id (app restarted) returns all entries."""
+        buffer = RingBuffer()
+        buffer.append('a')
+        buffer.append('b')
+        self.assertEqual(len(buffer.since(2, buffer.epoch - 1)["entries"]), 2)
+        self.assertEqual(len(buffer.since(50)["entries"]), 2)
+
+
+class TestSubscribers(unittest.TestCase):
+    """Test cases for the wakeups long-poll requests wait on."""
+
+    def test_append_and_clear_wake_subscribers(self):
+        """Test that subscribers are called on append and clear until unsubscribed."""
+        buffer = RingBuffer()
+        calls = []
+        callback = lambda: calls.append(1)
+        buffer.subscribe(callback)
+        buffer.append('a')
+        buffer.clear()
+        buffer.unsubscribe(callback)
+        buffer.append('b')
+        self.assertEqual(len(calls), 2)
+
+    def test_failing_subscriber_does_not_block_append(self):
+        """Test that an exception in one subscriber does not stop the others or the append."""
+        buffer = RingBuffer()
+        woken = threading.Event()
+        buffer.subscribe(lambda: 1 / 0)
+        buffer.subscribe(woken.set)
+        buffer.append('a')
+        self.assertTrue(woken.is_set())
+        self.assertEqual(buffer.cursor(), 1)
+
+    def test_waiter_wakes_on_append_from_another_thread(self):
+        """Test that a waiting reader is woken as soon as another thread appends."""
+        buffer = RingBuffer()
+        woken = threading.Event()
+        buffer.subscribe(woken.set)
+        start = time.monotonic()
+        threading.Timer(0.05, buffer.append, args=('survey done',)).start()
+        self.assertTrue(woken.wait(5))
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(buffer.since(0)["entries"][0]["msg"], 'survey done')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Unit tests for per-modem routing table and policy provisioning.
+Runs against an in-memory config store, so no router is needed.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from unittest.mock import patch
+from routing import RoutingProvisioner
+
+
+class FakeConfigStore:
+    """In-memory config/routing tables and policies with router-style list paths."""
+
+    def __init__(self):
+        self.config = {"tables": [{"_id_": 'main', "name": 'main'}],
+                       "policies": [{"_id_": 'default', "priority": 0, "table": 'main'}]}
+        self.ips = {'mdm-1': '10.0.1.2', 'mdm-2': '10.0.2.2'}
+        self.logs = []
+        self.next_id = 0
+
+    def log(self, msg):
+        self.logs.append(msg)
+
+    def get(self, path):
+        parts = path.strip('/').split('/')
+        if parts[0] == 'status':
+            return self.ips.get(parts[3])
+        items = self.config[parts[2]]
+        if len(parts) == 5:
+            return items[int(parts[3])][parts[4]]
+        return [dict(item) for item in items]
+
+    def post(self, path, value):
+        items = self.config[path.strip('/').split('/')[2]]
+        self.next_id += 1
+        items.append(dict(value, _id_=f'id{self.next_id}'))
+        return {"data": len(items) - 1}
+
+    def put(self, path, value):
+        _, _, kind, index, field = path.split('/')
+        self.config[kind][int(index)][field] = value
+
+    def delete(self, path):
+        _, _, kind, index = path.split('/')
+        del self.config[kind][int(index)]
+
+
+class TestRoutingProvisioner(unittest.TestCase):
+    """Test cases for provisioning, caching and cleanup of MSS routing."""
+
+    def setUp(self):
+        self.cp = FakeConfigStore()
+        self.routing = RoutingProvisioner(self.cp)
+        sleep = patch('routing.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def tables(self):
+        return [table["name"] for table in self.cp.config["tables"]]
+
+    def test_provisions_table_and_policy(self):
+        """Test that a modem gets an MSS table and a source policy ahead of the existing policy."""
+        self.assertEqual(self.routing.ensure('mdm-1'), '10.0.1.2')
+        self.assertEqual(self.tables(), ['main', 'MSS-mdm-1'])
+        policies = self.cp.config["policies"]
+        self.assertEqual(policies[0]["priority"], 10)
+        self.assertEqual(policies[1]["src_ip_network"], '10.0.1.2')
+        self.assertEqual(policies[1]["priority"], 1)
+
+    def test_cached_until_invalidated(self):
+        """Test that ensure() is answered from cache and re-read after invalidate()."""
+        self.routing.ensure('mdm-1')
+        self.cp.ips['mdm-1'] = '10.0.1.9'
+        self.assertEqual(self.routing.ensure('mdm-1'), '10.0.1.2')
+        self.routing.invalidate('mdm-1')
+        self.assertEqual(self.routing.ensure('mdm-1'), '10.0.1.9')
+        self.assertEqual(self.tables(), ['main', 'MSS-mdm-1'])
+        self.assertEqual(self.cp.config["policies"][1]["src_ip_network"], '10.0.1.9')
+
+    def test_no_ip(self):
+        """Test that a modem without an IP is not provisioned."""
+        self.assertIsNone(self.routing.ensure('mdm-3'))
+        self.assertEqual(self.tables(), ['main'])
+
+    def test_cleanup_restores_config(self):
+        """Test that cleanup removes MSS tables and policies and restores the demoted priority."""
+        original = {kind: [dict(item) for item in items] for kind, items in self.cp.config.items()}
+        self.routing.ensure('mdm-1')
+        self.routing.ensure('mdm-2')
+        self.routing.cleanup()
+        self.assertEqual(self.cp.config, original)
+        self.assertEqual(self.routing.assigned, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Unit tests for the survey point grid index.
+Checks distance lookups and that points saved to disk are loaded again after a restart.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from survey_index import SurveyIndex
+
+BOISE = (43.6150, -116.2023)
+
+
+class TestSurveyIndex(unittest.TestCase):
+    """Test cases for SurveyIndex lookups and persistence."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'survey_points.txt')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_nearest_within_radius(self):
+        """Test that nearest finds a point in a neighboring cell and ignores points beyond the radius."""
+        index = SurveyIndex(cell_size=50)
+        index.add(BOISE[0] + 0.0004, BOISE[1])  # About 44 m north
+        index.add(BOISE[0], BOISE[1] + 0.01)  # About 800 m east
+        self.assertAlmostEqual(index.nearest(*BOISE), 44.5, delta=1.0)
+        self.assertIsNone(index.nearest(*BOISE, radius=40))
+        self.assertAlmostEqual(index.nearest(*BOISE, radius=1000), 44.5, delta=1.0)
+
+    def test_empty_index(self):
+        """Test that an empty index has no nearest point."""
+        self.assertIsNone(SurveyIndex().nearest(*BOISE))
+
+    def test_resize_keeps_points(self):
+        """Test that changing the cell size rebuilds the grid without losing points."""
+        index = SurveyIndex(cell_size=50)
+        index.add(BOISE[0] + 0.0004, BOISE[1])
+        index.resize(500)
+        self.assertEqual(index.cell_size, 500)
+        self.assertAlmostEqual(index.nearest(*BOISE), 44.5, delta=1.0)
+
+    def test_count_per_cell(self):
+        """Test that count returns the number of points in the location's cell."""
+        index = SurveyIndex(cell_size=100)
+        for _ in range(3):
+            index.add(*BOISE)
+        self.assertEqual(index.count(*BOISE), 3)
+        self.assertEqual(index.count(BOISE[0] + 1, BOISE[1]), 0)
+
+    def test_persistence_round_trip(self):
+        """Test that points added before a restart are loaded by a new index on the same file."""
+        index = SurveyIndex(self.path, cell_size=50)
+        index.add(*BOISE)
+        index.add(BOISE[0] + 0.001, BOISE[1] - 0.001)
+
+        reloaded = SurveyIndex(self.path, cell_size=50)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.points, index.points)
+        self.assertAlmostEqual(reloaded.nearest(*BOISE), 0.0, places=3)
+
+    def test_corrupt_lines_skipped(self):
+        """Test that a torn or invalid line in the points file does not stop loading."""
+        with open(self.path, 'w') as f:
+            f.write(f'{BOISE[0]},{BOISE[1]}\nnot a point\n43.6')
+        index = SurveyIndex(self.path)
+        self.assertEqual(index.points, [BOISE])
+
+
+if __name__ == '__main__':
+    unittest.main()
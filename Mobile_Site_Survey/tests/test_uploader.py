@@ -0,0 +1,114 @@
+"""
+Unit tests for the store-and-forward uploader.
+Checks the outbox and the split-on-reject retry against a fake server, so no network is needed.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from uploader import Outbox, Uploader
+
+CONFIG = {"send_to_server": True, "server_url": 'http://localhost/results', "server_batch_size": 8}
+
+
+class TestOutbox(unittest.TestCase):
+    """Test cases for the durable outbox."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'outbox.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fifo_survives_reopen(self):
+        """Test that payloads are returned oldest first and remain after reopening until acked."""
+        outbox = Outbox(self.path)
+        for i in range(3):
+            outbox.put({"n": i})
+        reopened = Outbox(self.path)
+        batch = reopened.peek(2)
+        self.assertEqual([payload["n"] for _, payload in batch], [0, 1])
+        reopened.ack([x for x, _ in batch])
+        self.assertEqual([payload["n"] for _, payload in reopened.peek(10)], [2])
+
+
+class TestDeliver(unittest.TestCase):
+    """Test cases for sending batches and splitting rejected ones."""
+
+    def setUp(self):
+        """Set up an uploader whose server rejects batches over max_batch and the payloads in bad."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.logs = []
+        self.uploader = Uploader(os.path.join(self.tmp_dir.name, 'outbox.db'), lambda: CONFIG,
+                                 log=self.logs.append)
+        self.requests = []
+        self.accepted = []
+        self.max_batch = 8
+        self.bad = set()
+        self.status = None
+        self.uploader._send = self.send
+
+    def tearDown(self):
+        self.uploader.outbox.db.close()
+        self.tmp_dir.cleanup()
+
+    def send(self, config, payloads):
+        self.requests.append([payload["n"] for payload in payloads])
+        if self.status is not None:
+            return self.status
+        if len(payloads) > self.max_batch:
+            return 413
+        if any(payload["n"] in self.bad for payload in payloads):
+            return 422
+        self.accepted.extend(payload["n"] for payload in payloads)
+        return 200
+
+    def deliver(self, count):
+        for i in range(count):
+            self.uploader.put({"n": i})
+        return self.uploader._deliver(CONFIG, self.uploader.outbox.peek(count))
+
+    def test_accepted_batch(self):
+        """Test that an accepted batch is sent in one request and removed from the outbox."""
+        self.assertTrue(self.deliver(4))
+        self.assertEqual(self.requests, [[0, 1, 2, 3]])
+        self.assertEqual(len(self.uploader.outbox), 0)
+        self.assertEqual(self.uploader.sent, 4)
+
+    def test_oversized_batch_is_split(self):
+        """Test that a 413 splits the batch in halves until the server accepts every row."""
+        self.max_batch = 2
+        self.assertTrue(self.deliver(5))
+        self.assertEqual(sorted(self.accepted), [0, 1, 2, 3, 4])
+        self.assertEqual(len(self.uploader.outbox), 0)
+        self.assertFalse(any('dropping' in msg for msg in self.logs))
+
+    def test_only_rejected_row_is_dropped(self):
+        """Test that a row rejected on its own is dropped and logged while the rest are delivered."""
+        self.bad = {3}
+        self.assertTrue(self.deliver(6))
+        self.assertEqual(sorted(self.accepted), [0, 1, 2, 4, 5])
+        self.assertEqual(len(self.uploader.outbox), 0)
+        dropped = [msg for msg in self.logs if 'dropping' in msg]
+        self.assertEqual(len(dropped), 1)
+        self.assertIn('result 4 (422)', dropped[0])  # Outbox ids start at 1
+
+    def test_server_error_keeps_batch(self):
+        """Test that a non-rejection failure keeps the whole batch queued for a retry."""
+        self.status = 503
+        self.assertFalse(self.deliver(3))
+        self.assertEqual(len(self.uploader.outbox), 3)
+        self.assertEqual(self.requests, [[0, 1, 2]])
+
+    def test_network_error_keeps_batch(self):
+        """Test that a failed request (no status) keeps the batch queued."""
+        self.uploader._send = lambda config, payloads: None
+        self.assertFalse(self.deliver(2))
+        self.assertEqual(len(self.uploader.outbox), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""Store-and-forward uploader for Mobile Site Survey send-to-server.
+
+Payloads are appended to a durable SQLite outbox and drained in order by a
+background sender using a keep-alive requests.Session.  Several payloads can
+be sent per request as a JSON array, optionally gzip compressed.  Failed
+sends are retried with exponential backoff, so results survive WAN outages
+and restarts and the survey never waits on the server.
+"""
+
+from threading import Thread, Lock, Event
+import requests
+import sqlite3
+import gzip
+import json
+import time
+
+REJECTED = (400, 413, 415, 422)  # Statuses the server will keep returning for the same payloads
+
+
+class Outbox:
+    """Durable FIFO queue of JSON payloads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)')
+        self.db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def put(self, payload):
+        """Append payload."""
+        with self._lock, self.db:
+            self.db.execute('INSERT INTO outbox (payload) VALUES (?)', (json.dumps(payload),))
+
+    def peek(self, limit=1):
+        """Return list of (id, payload) of the oldest limit payloads."""
+        with self._lock:
+            rows = self.db.execute('SELECT id, payload FROM outbox ORDER BY id LIMIT ?', (limit,)).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def ack(self, ids):
+        """Remove sent payloads."""
+        with self._lock, self.db:
+            self.db.executemany('DELETE FROM outbox WHERE id = ?', [(x,) for x in ids])
+
+
+class Uploader:
+    """Background sender draining an Outbox to the configured server."""
+
+    def __init__(self, path, get_config, log=print, notify=None, min_backoff=1, max_backoff=300):
+        self.outbox = Outbox(path)
+        self.get_config = get_config
+        self.log = log
+        self.notify = notify or (lambda msg: None)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0
+        self.sent = 0
+        self.session = requests.Session()
+        self._wake = Event()
+        self._thread = None
+
+    def start(self):
+        """Start background sender and return self."""
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, payload):
+        """Queue payload for sending.  Never blocks on the network."""
+        self.outbox.put(payload)
+        self._wake.set()
+
+    def stats(self):
+        return {"queued": len(self.outbox), "sent": self.sent, "backoff": self.backoff}
+
+    def _run(self):
+        while True:
+            try:
+                config = self.get_config()
+                batch = self.outbox.peek(max(1, int(config.get("server_batch_size", 1))))
+                if not batch or not config.get("send_to_server") or not config.get("server_url"):
+                    self._wake.wait(30)
+                    self._wake.clear()
+                    continue
+                if self._deliver(config, batch):
+                    self.backoff = 0
+                else:
+                    self.backoff = min(self.max_backoff, self.backoff * 2 or self.min_backoff)
+                    self.log(f'Send to Server failed - {len(self.outbox)} results queued, retrying in {self.backoff}s.')
+                    time.sleep(self.backoff)
+            except Exception as e:
+                self.log(f'Exception in uploader: {e}')
+                time.sleep(self.min_backoff)
+
+    def _deliver(self, config, batch):
+        """Send batch of (id, payload) and remove it from the outbox.  Returns False to retry later.
+
+        A rejected batch is split in half and each half sent again, so only the rows the server
+        rejects on their own are dropped."""
+        status = self._send(config, [payload for _, payload in batch])
+        if status is not None and status < 300:
+            self.outbox.ack([x for x, _ in batch])
+            self.sent += len(batch)
+            self.notify(f' ⇪ 5g-ready:✓️  sent {len(batch)} result{"s" if len(batch) > 1 else ""}')
+            return True
+        if status not in REJECTED:
+            return False
+        if len(batch) == 1:
+            self.log(f'Server rejected result {batch[0][0]} ({status}) - dropping it.')
+            self.notify(f' ⇪ 5g-ready:❌  rejected 1 result ({status})')
+            self.outbox.ack([batch[0][0]])  # Server will never accept it - don't block the queue
+            return True
+        half = len(batch) // 2
+        return self._deliver(config, batch[:half]) and self._deliver(config, batch[half:])
+
+    def _send(self, config, payloads):
+        """POST payloads.  Returns the HTTP status code, or None if the request failed."""
+        headers = {'Content-Type': 'application/json'}
+        if config.get("server_token"):
+            headers['Authorization'] = f'Bearer {config["server_token"]}'
+        body = payloads[0] if len(payloads) == 1 and config.get("server_batch_size", 1) <= 1 else payloads
+        data = json.dumps(body).encode()
+        if config.get("server_gzip"):
+            data = gzip.compress(data)
+            headers['Content-Encoding'] = 'gzip'
+        try:
+            req = self.session.post(config["server_url"], headers=headers, data=data, timeout=30)
+        except requests.RequestException as e:
+            self.log(f'Exception in POST: {e}')
+            return None
+        self.log(f'HTTP POST Result: {req.status_code} {req.text}')
+        return req.status_code
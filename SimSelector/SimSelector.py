@@ -15,6 +15,7 @@ The app can be manually triggered again by clearing out the description field in
     todo: create a local webpage for techs
 """
 
+import concurrent.futures
 import configparser
 import datetime
 import os
@@ -22,7 +23,10 @@ import sys
 import time
 import state_manager
 from csclient import EventingCSClient
-from speedtest import Speedtest
+from result_cache import ResultCache
+from routing import SourceRouting
+from speedtest import Speedtest, SpeedtestOrchestrator, SpeedtestServerCache
+from state_wait import wait_for_state
 
 
 class SimSelectorException(Exception):
@@ -52,6 +56,9 @@ class SimSelector(object):
     SCHEDULE = 0  # Run SimSelector every {SCHEDULE} minutes. 0 = Only run on boot.
     NUM_ACTIVE_SIMS = 1  # Number of fastest (download) SIMs to keep active.  0 = all; do not disable SIMs
     ONLY_RUN_ONCE = False  # True means do not run if SimSelector has been run on this device before.
+    CACHE_TTL = 24 * 60  # Minutes to reuse a SIM's results while its cell and signal are unchanged. 0 = always test.
+    RETEST_RSRP_DELTA = 6  # Re-test a SIM if its RSRP changed by more than this many dB.
+    RETEST_SINR_DELTA = 5  # Re-test a SIM if its SINR changed by more than this many dB.
 
     APP_NAME = "SimSelector 2.5.9"
 
@@ -61,6 +68,7 @@ class SimSelector(object):
     API_URL = 'https://www.cradlepointecm.com/api/v2'
     CONNECTION_STATE_TIMEOUT = 7 * 60  # 7 Min
     NETPERF_TIMEOUT = 5 * 60  # 5 Min
+    RESULT_CACHE_FILE = '/data/simselector_result_cache.json'
     sims = {}
     wan_devs = {}
     rules_map = {}
@@ -80,6 +88,11 @@ class SimSelector(object):
     def __init__(self):
         global DYN_APP_NAME
         self.client = EventingCSClient('SimSelector')
+        self.routing = SourceRouting(self.client)
+        self.speedtest_servers = SpeedtestServerCache()
+        self.result_cache = ResultCache(self.RESULT_CACHE_FILE, ttl=self.CACHE_TTL * 60,
+                                        thresholds={"RSRP": self.RETEST_RSRP_DELTA, "SINR": self.RETEST_SINR_DELTA},
+                                        log=self.client.log)
         
         # Initialize speedtest with proper error handling
         try:
@@ -280,23 +293,14 @@ class SimSelector(object):
 
     def modem_state(self, sim, state):
         """Blocking call that will wait until a given state is shown as the modem's status."""
-        timeout_counter = 0
-        sleep_seconds = 0
         conn_path = '%s/%s/status/connection_state' % (self.STATUS_DEVS_PATH, sim)
         self.client.log(f'Connecting {self.port_sim(sim)}')
-        while True:
-            sleep_seconds += 5
-            conn_state = self.client.get(conn_path)
-            self.client.log(f'Waiting for {self.port_sim(sim)} to connect.  '
-                            f'Current State={conn_state}. timeout in {self.CONNECTION_STATE_TIMEOUT-timeout_counter}')
-            if conn_state == state:
-                break
-            if timeout_counter > self.CONNECTION_STATE_TIMEOUT:
-                self.client.log(f'Timeout waiting on {self.port_sim(sim)}. Testing Alternate APNs')
-                self.update_custom(sim)
-                raise Timeout(conn_path)
-            time.sleep(min(sleep_seconds, 45))
-            timeout_counter += sleep_seconds
+        self.client.log(f'Waiting for {self.port_sim(sim)} to connect.  '
+                        f'Current State={self.client.get(conn_path)}. timeout in {self.CONNECTION_STATE_TIMEOUT}')
+        if not wait_for_state(self.client, conn_path, state, timeout=self.CONNECTION_STATE_TIMEOUT):
+            self.client.log(f'Timeout waiting on {self.port_sim(sim)}. Testing Alternate APNs')
+            self.update_custom(sim)
+            raise Timeout(conn_path)
         self.client.log(f'{self.port_sim(sim)} connected.')
         return True
 
@@ -309,7 +313,7 @@ class SimSelector(object):
         """Return port value for sim."""
         return f'{self.sims[sim]["info"]["port"]} {self.sims[sim]["info"]["sim"]}'
 
-    def do_speedtest(self, sim, staging):
+    def do_speedtest(self, sim, staging=False):
         """Run Ookla speedtests and return TCP down and TCP up in Mbps."""
         servers = []
         self._ensure_speedtest_ready().get_servers(servers)
@@ -325,6 +329,48 @@ class SimSelector(object):
             return down, up
         else:
             return self.do_speedtest(sim)
+
+    def do_concurrent_speedtests(self, sims, rule_ids=None):
+        """Run Ookla speedtests on several connected SIMs at once, each bound to its modem IP.
+
+        Sets download and upload (Mbps) on each SIM.  SIMs without a routable source IP are
+        tested one at a time over the default route, with every other rule in rule_ids (SIM: rule
+        ID of the round) disabled so the traffic cannot leave through another SIM."""
+        sources = {}
+        for sim in sims:
+            try:
+                source_ip = self.routing.ensure(sim)
+            except Exception as e:
+                self.client.log(f'Unable to route speedtest for {self.port_sim(sim)}: {e}')
+                source_ip = None
+            if source_ip:
+                sources[source_ip] = sim
+        if len(sources) > 1:
+            self.client.log(f'Running concurrent speedtests on {", ".join(self.port_sim(x) for x in sources.values())}...')
+            orchestrator = SpeedtestOrchestrator(sources, server_cache=self.speedtest_servers)
+            results = orchestrator.run(pre_allocate=False)
+            for source_ip, sim in sources.items():
+                if results.get(source_ip) is None:
+                    self.client.log(f'Speedtest failed for {self.port_sim(sim)}: {orchestrator.errors.get(source_ip)}')
+                    self.sims[sim]['download'] = self.sims[sim]['upload'] = 0.0
+                    continue
+                self.sims[sim]['download'] = results[source_ip].download / 1000 / 1000
+                self.sims[sim]['upload'] = results[source_ip].upload / 1000 / 1000
+                self.client.log(f'Speedtest complete for {sim}.')
+            remaining = [sim for sim in sims if sim not in sources.values()]
+        else:
+            remaining = list(sims)
+        for sim in remaining:
+            if rule_ids and len(rule_ids) > 1:
+                for other, rule_id in rule_ids.items():
+                    self.client.put(f'config/wan/rules2/{rule_id}/disabled', other != sim)
+                time.sleep(2)  # allow change to apply
+                conn_path = f'{self.STATUS_DEVS_PATH}/{sim}/status/connection_state'
+                if not wait_for_state(self.client, conn_path, 'connected', timeout=self.CONNECTION_STATE_TIMEOUT):
+                    self.client.log(f'{self.port_sim(sim)} did not reconnect for its speedtest.')
+                    self.sims[sim]['download'] = self.sims[sim]['upload'] = 0.0
+                    continue
+            self.sims[sim]['download'], self.sims[sim]['upload'] = self.do_speedtest(sim)
     
     def send_update(self, message, level=7):
         """
@@ -410,8 +456,8 @@ class SimSelector(object):
             self.clear_apn(found_manuals)
         
 
-    def test_sim(self, device, staging=False):
-        """Get diagnostics, run speedtests, and verify minimums."""
+    def connect_sim(self, device):
+        """Wait for SIM to connect and collect its diagnostics.  Returns True if connected."""
         try:
             if self.modem_state(device, 'connected'):
                 self.sims[device]['OK'] = True
@@ -420,34 +466,135 @@ class SimSelector(object):
                 self.sims[device]['diagnostics'] = diagnostics
                 self.send_update(
                     f'Modem Diagnostics: {self.port_sim(device)} RSRP:{diagnostics.get("RSRP")}', 1)
-
-                # Do speedtest and log results
-                if not staging:
-                    self.sims[device]['download'], self.sims[device]['upload'] = self.do_speedtest(device)
-                    self.send_update(
-                        f'Speedtest Results: {self.port_sim(device)} TCP Download: '
-                        f'{self.sims[device]["download"]}Mbps TCP Upload: {self.sims[device]["upload"]}Mbps', 1)
-
-                tech = self.sims[device]['info'].get('tech', "LTE")
-                # Verify minimum speeds
-                #  if device is 5G use 5G speeds if not use LTE speeds
-                if self.sims[device].get('download', 0.0) > self.MIN_DOWNLOAD_SPD.get(tech, 10) and \
-                        self.sims[device].get('upload', 0.0) > self.MIN_UPLOAD_SPD.get(tech, 1):
-                    self.sims[device]['low-speed'] = False
-                    return True
-                elif not staging:  # Did not meet minimums
-                    self.send_update(f'{self.port_sim(device)} Failed to meet minimums! '
-                                     f'MIN_DOWNLOAD_SPD: {self.MIN_DOWNLOAD_SPD} '
-                                     f'MIN_UPLOAD_SPD: {self.MIN_UPLOAD_SPD}', 1)
-                    self.sims[device]['low-speed'] = True
-                    return True
-
+                return True
         except Timeout:
             message = f'Timed out running speedtest on {self.port_sim(device)}'
             self.send_update(message, 7)
             self.sims[device]['download'] = self.sims[device]['upload'] = 0.0
             self.sims[device]['OK'] = False
+        return False
+
+    def use_cached_result(self, device, diagnostics=None):
+        """Reuse cached speedtest results if the SIM's cell and signal have not changed.  Returns True if used.
+
+        Without diagnostics, only a connected SIM is looked up, using freshly read diagnostics.  The
+        diagnostics of a SIM whose rule is disabled are not live and may be stale."""
+        if diagnostics is None:
+            if self.client.get(f'{self.STATUS_DEVS_PATH}/{device}/status/connection_state') != 'connected':
+                return False
+            diagnostics = self.client.get(f'{self.STATUS_DEVS_PATH}/{device}/diagnostics') or {}
+        cached = self.result_cache.lookup(diagnostics)
+        if not cached:
+            return False
+        self.sims[device]['diagnostics'] = diagnostics
+        self.sims[device]['download'], self.sims[device]['upload'] = cached["download"], cached["upload"]
+        self.sims[device]['OK'] = True
+        self.send_update(
+            f'Cached Results: {self.port_sim(device)} TCP Download: {cached["download"]}Mbps TCP Upload: '
+            f'{cached["upload"]}Mbps from {int((time.time() - cached["time"]) / 60)} minutes ago', 1)
+        return True
+
+    def check_minimums(self, device, staging=False):
+        """Verify minimum speeds of a tested SIM."""
+        if not staging:
+            self.send_update(
+                f'Speedtest Results: {self.port_sim(device)} TCP Download: '
+                f'{self.sims[device]["download"]}Mbps TCP Upload: {self.sims[device]["upload"]}Mbps', 1)
+
+        tech = self.sims[device]['info'].get('tech', "LTE")
+        # Verify minimum speeds
+        #  if device is 5G use 5G speeds if not use LTE speeds
+        if self.sims[device].get('download', 0.0) > self.MIN_DOWNLOAD_SPD.get(tech, 10) and \
+                self.sims[device].get('upload', 0.0) > self.MIN_UPLOAD_SPD.get(tech, 1):
+            self.sims[device]['low-speed'] = False
+            return True
+        elif not staging:  # Did not meet minimums
+            self.send_update(f'{self.port_sim(device)} Failed to meet minimums! '
+                             f'MIN_DOWNLOAD_SPD: {self.MIN_DOWNLOAD_SPD} '
+                             f'MIN_UPLOAD_SPD: {self.MIN_UPLOAD_SPD}', 1)
+            self.sims[device]['low-speed'] = True
+            return True
+
+    def test_sim(self, device, staging=False):
+        """Get diagnostics, run speedtests, and verify minimums."""
+        if not self.connect_sim(device):
             return False
+        if not staging:
+            self.sims[device]['download'], self.sims[device]['upload'] = self.do_speedtest(device)
+        return self.check_minimums(device, staging)
+
+    def schedule_sims(self, sims):
+        """Group SIMs into test rounds with at most one SIM per modem port.
+
+        SIMs on different ports can be tested at the same time; SIMs sharing a modem are
+        spread over consecutive rounds."""
+        ports = {}
+        for uid in sorted(sims, key=lambda k: self.sims[k]['info'].get('sim', '')):
+            ports.setdefault(self.sims[uid]['info'].get('port'), []).append(uid)
+        rounds = max((len(x) for x in ports.values()), default=0)
+        return [[port_sims[i] for port_sims in ports.values() if i < len(port_sims)] for i in range(rounds)]
+
+    def test_sims(self, sims, staging=False, on_result=None):
+        """Test SIMs one round at a time, concurrently across modem ports.
+
+        Connected SIMs with a still valid cached result are not switched to or tested again, and
+        other SIMs skip the speedtest if the diagnostics read once connected match a cached result.
+        on_result(sim, result) is called as each SIM completes.
+        Returns dict of SIM: test_sim result for each SIM tested."""
+        results = {}
+        if not staging:
+            with state_manager.batch():
+                for sim in sims:
+                    if self.use_cached_result(sim):
+                        results[sim] = self.check_minimums(sim)
+                        if on_result:
+                            on_result(sim, results[sim])
+            sims = [sim for sim in sims if sim not in results]
+        try:
+            for round_sims in self.schedule_sims(sims):
+                rule_ids = {}
+                for sim in round_sims:
+                    rule_id = self.sims[sim].get("rule_id") or \
+                        self.client.get(f'{self.STATUS_DEVS_PATH}/{sim}/config/_id_')
+                    if rule_id is None:
+                        self.client.log(f"ERROR: No rule_id for {sim}, cannot test.")
+                        continue
+                    rule_ids[sim] = rule_id
+                    # Enable this rule to test the SIM
+                    self.client.put(f'config/wan/rules2/{rule_id}/disabled', False)
+                if not rule_ids:
+                    continue
+                time.sleep(2)  # allow change to apply
+                self.client.log(f'Testing {", ".join(self.port_sim(x) for x in rule_ids)}')
+
+                with concurrent.futures.ThreadPoolExecutor(max_workers=len(rule_ids)) as executor:
+                    connected = dict(zip(rule_ids, executor.map(self.connect_sim, rule_ids)))
+                connected_sims = [sim for sim, ok in connected.items() if ok]
+                cached = []
+                if not staging:
+                    cached = [sim for sim in connected_sims
+                              if self.use_cached_result(sim, self.sims[sim]['diagnostics'])]
+                    tested = [sim for sim in connected_sims if sim not in cached]
+                    if tested:
+                        self.do_concurrent_speedtests(tested, rule_ids)
+                with state_manager.batch():  # One journal write for the round's results
+                    for sim, ok in connected.items():
+                        if ok and not staging and sim not in cached and self.sims[sim].get('download'):
+                            self.result_cache.store(self.sims[sim]['diagnostics'],
+                                                    self.sims[sim]['download'], self.sims[sim]['upload'])
+                        results[sim] = self.check_minimums(sim, staging) if ok else False
+                        if on_result:
+                            on_result(sim, results[sim])
+
+                # Disable rules again to isolate the next round
+                for rule_id in rule_ids.values():
+                    self.client.put(f'config/wan/rules2/{rule_id}/disabled', True)
+        finally:
+            try:
+                self.routing.release()
+            except Exception as e:
+                self.client.log(f'Unable to remove speedtest routing: {e}')
+        return results
 
     def create_message(self, uid, *args):
         """Create text results message for log, alert, and description."""
@@ -523,7 +670,9 @@ def manual_test(path, desc, *args):
     # Handle reset command - restart from validation phase
     if "reset" in desc_lower:
         try:
-            state_manager.set_state('phase', 'validation')
+            with state_manager.batch():
+                state_manager.clear_results()
+                state_manager.set_state('phase', 'validation')
             simselector.send_update("State reset to validation phase. Restart device to begin fresh validation.", 7)
             return
         except Exception as e:
@@ -633,26 +782,21 @@ def run_validation_phase():
     # Disable all wan rules so we can test them one by one
     simselector.set_all_rule_states(True)
 
+    # SIMs on different modems are tested at the same time, SIMs sharing a modem one after another
     for sim in simselector.sims:
-        rule_id = simselector.sims[sim].get("rule_id")
-        if rule_id:
-            # Enable this rule to test the SIM
-            simselector.client.put(f'config/wan/rules2/{rule_id}/disabled', False)
-            time.sleep(2)  # allow change to apply
-
-            # test_sim in staging mode checks for connection and gets diagnostics
-            if simselector.test_sim(sim, staging=True):
-                # Classify and store signal quality
-                diagnostics = simselector.sims[sim].get('diagnostics', {})
-                rsrp = diagnostics.get('RSRP')
-                signal_quality = simselector.classify_signal(rsrp)
-                simselector.sims[sim]['signal_quality'] = signal_quality
-                simselector.client.log(f"SIM {sim}: RSRP={rsrp}, Quality={signal_quality}")
-
-            # Disable rule again to isolate the next test
-            simselector.client.put(f'config/wan/rules2/{rule_id}/disabled', True)
-        else:
+        if not simselector.sims[sim].get("rule_id"):
             simselector.client.log(f"Could not find rule_id for {sim} during validation.")
+    testable = [sim for sim in simselector.sims if simselector.sims[sim].get("rule_id")]
+
+    # test_sims in staging mode checks for connection and gets diagnostics
+    for sim, result in simselector.test_sims(testable, staging=True).items():
+        if result:
+            # Classify and store signal quality
+            diagnostics = simselector.sims[sim].get('diagnostics', {})
+            rsrp = diagnostics.get('RSRP')
+            signal_quality = simselector.classify_signal(rsrp)
+            simselector.sims[sim]['signal_quality'] = signal_quality
+            simselector.client.log(f"SIM {sim}: RSRP={rsrp}, Quality={signal_quality}")
 
     # Build the feedback string
     feedback_parts = []
@@ -693,22 +837,33 @@ def run_performance_phase():
 
     success = False  # SimSelector Success Status
 
-    # test remaining SIMs
+    # Resume an interrupted run - restore SIMs that already completed testing
+    for sim, result in state_manager.get_results().items():
+        if sim in simselector.sims:
+            simselector.sims[sim].update(result["sim"])
+            success = success or result["passed"]
+            simselector.client.log(f"Restored results for {simselector.port_sim(sim)} from previous run.")
+
+    def save_result(sim, passed):
+        sim_data = simselector.sims[sim]
+        state_manager.record_result(sim, {"passed": bool(passed), "sim": {
+            key: sim_data[key] for key in ('OK', 'download', 'upload', 'diagnostics', 'low-speed') if key in sim_data}})
+
+    # test remaining SIMs - concurrently across modems, one SIM per modem at a time
+    completed = state_manager.get_results()
+    remaining = []
     for sim in simselector.sims:
-        if not simselector.sims[sim].get('OK'):
-            rule_id = simselector.client.get(f'status/wan/devices/{sim}/config/_id_')
-            if rule_id is not None:
-                simselector.client.put(f'config/wan/rules2/{rule_id}/disabled', False)
-            else:
+        if sim not in completed and not simselector.sims[sim].get('OK'):
+            if simselector.client.get(f'status/wan/devices/{sim}/config/_id_') is None:
                 simselector.set_all_rule_states(False)
                 # This indicates a problem, should probably restart the whole process.
                 # For now, we'll log it and let it fail.
                 simselector.client.log(f"ERROR: No rule_id for {sim}, cannot test.")
                 continue
+            remaining.append(sim)
 
-            if simselector.test_sim(sim, staging=False):
-                success = True
-            simselector.client.put(f'config/wan/rules2/{rule_id}/disabled', True)
+    if any(simselector.test_sims(remaining, staging=False, on_result=save_result).values()):
+        success = True
 
     # Prioritizes SIMs based on advanced sorting logic from PRD
     def advanced_sort_key(sim_uid):
@@ -792,7 +947,9 @@ def run_performance_phase():
     simselector.send_update(results_text[:1023], 7)
 
     # Mark as Complete
-    state_manager.set_state('phase', 'complete')
+    with state_manager.batch():
+        state_manager.clear_results()
+        state_manager.set_state('phase', 'complete')
     simselector.client.log("Performance phase complete. Set state to 'complete'.")
 
     # Resume NCM
@@ -0,0 +1,77 @@
+"""Source-address routing for testing several modems at the same time.
+
+While SIMs on different modem ports are tested concurrently only one of
+them is the primary WAN.  Each modem under test gets a routing table
+(SimSelector-<modem>) with a default route out of the modem and a policy
+routing packets sourced from the modem IP to that table, so a speedtest
+bound to the modem IP egresses that modem.  Everything created is removed
+again by release() once testing is finished.
+"""
+
+from threading import Lock
+import time
+
+TABLE_PREFIX = 'SimSelector-'
+
+
+class SourceRouting:
+    """Creates and removes per-modem routing tables and policies."""
+
+    def __init__(self, client):
+        self.client = client
+        self.assigned = {}
+        self._lock = Lock()
+
+    def ensure(self, modem):
+        """Return source IP of modem, provisioning its routing table and policy if needed."""
+        with self._lock:
+            source_ip = self.client.get(f'status/wan/devices/{modem}/status/ipinfo/ip_address')
+            if not source_ip:
+                return None
+            assigned = self.assigned.get(modem)
+            if assigned and assigned["source_ip"] == source_ip:
+                return source_ip
+            changed, table_id = self._ensure_table(modem)
+            changed |= self._ensure_policy(table_id, source_ip)
+            if changed:
+                time.sleep(1)  # Allow routing changes to apply
+            self.assigned[modem] = {"source_ip": source_ip, "table_id": table_id}
+            return source_ip
+
+    def release(self):
+        """Remove all SimSelector routing policies and tables."""
+        with self._lock:
+            policies = self.client.get('config/routing/policies') or []
+            tables = self.client.get('config/routing/tables') or []
+            table_ids = {table["_id_"] for table in tables if table.get("name", '').startswith(TABLE_PREFIX)}
+            # Delete from the end so remaining indexes stay valid
+            for index in reversed(range(len(policies))):
+                if policies[index].get("table") in table_ids:
+                    self.client.delete(f'config/routing/policies/{index}')
+            for index in reversed(range(len(tables))):
+                if tables[index].get("_id_") in table_ids:
+                    self.client.delete(f'config/routing/tables/{index}')
+            self.assigned.clear()
+
+    def _ensure_table(self, modem):
+        """Return (changed, table_id) of the routing table for modem."""
+        name = f'{TABLE_PREFIX}{modem}'
+        for table in self.client.get('config/routing/tables') or []:
+            if table.get("name") == name:
+                return False, table["_id_"]
+        route_table = {"name": name, "routes": [
+            {"netallow": False, "ip_network": "0.0.0.0/0", "dev": modem, "auto_gateway": True}]}
+        index = self.client.post('config/routing/tables/', route_table)["data"]
+        return True, self.client.get(f'config/routing/tables/{index}/_id_')
+
+    def _ensure_policy(self, table_id, source_ip):
+        """Create or update the policy for table_id.  Returns True if config changed."""
+        for index, policy in enumerate(self.client.get('config/routing/policies') or []):
+            if policy.get("table") == table_id:
+                if policy.get("src_ip_network") in (source_ip, f'{source_ip}/32'):
+                    return False
+                self.client.put(f'config/routing/policies/{index}/src_ip_network', source_ip)
+                return True
+        route_policy = {"ip_version": "ip4", "priority": 1, "table": table_id, "src_ip_network": source_ip}
+        self.client.post('config/routing/policies/', route_policy)
+        return True
@@ -1668,6 +1668,204 @@ class Speedtest(object):
         return self.results.upload
 
 
+def cpu_count():
+    """Return the number of CPUs available, falling back to 1"""
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        pass
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+class SpeedtestServerCache(object):
+    """Thread-safe cache of the speedtest.net server list, shared by
+    several ``Speedtest`` instances so the list is only downloaded once
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._servers = []
+        self._stamp = 0
+
+    def clear(self):
+        """Discard the cached server list"""
+
+        with self._lock:
+            self._servers = []
+            self._stamp = 0
+
+    def load(self, speedtest):
+        """Populate ``speedtest.servers`` from the cache, downloading the
+        server list through ``speedtest`` if the cache is empty or stale
+        """
+
+        with self._lock:
+            age = timeit.time.time() - self._stamp
+            if not self._servers or age > self.ttl:
+                speedtest.get_servers()
+                servers = []
+                for server_list in speedtest.servers.values():
+                    servers.extend(server_list)
+                if servers:
+                    self._servers = servers
+                    self._stamp = timeit.time.time()
+                return speedtest.servers
+            servers = [dict(s) for s in self._servers]
+
+        # Distances are relative to each client's own location
+        speedtest.servers.clear()
+        for attrib in servers:
+            if int(attrib.get('id')) in speedtest.config['ignore_servers']:
+                continue
+            try:
+                d = distance(speedtest.lat_lon,
+                             (float(attrib.get('lat')),
+                              float(attrib.get('lon'))))
+            except Exception:
+                continue
+            attrib['d'] = d
+            try:
+                speedtest.servers[d].append(attrib)
+            except KeyError:
+                speedtest.servers[d] = [attrib]
+        return speedtest.servers
+
+
+class SpeedtestOrchestrator(object):
+    """Class for running speedtests from several source addresses, one per
+    WAN interface, either concurrently or in staggered order.
+
+    All tests share a ``SpeedtestServerCache`` and a CPU-aware budget of
+    download/upload threads, and results are returned as a single batch
+    keyed by source address.
+    """
+
+    threads_per_cpu = 4
+    min_threads = 2
+
+    def __init__(self, source_addresses, concurrent=True, stagger=0,
+                 thread_budget=None, server_cache=None, timeout=10,
+                 secure=False, shutdown_event=None, retries=5):
+        self.source_addresses = list(source_addresses)
+        self.concurrent = concurrent
+        self.stagger = stagger
+        self.thread_budget = (thread_budget or
+                              cpu_count() * self.threads_per_cpu)
+        self.server_cache = server_cache or SpeedtestServerCache()
+        self.retries = max(1, retries)
+
+        self._timeout = timeout
+        self._secure = secure
+
+        if shutdown_event:
+            self._shutdown_event = shutdown_event
+        else:
+            self._shutdown_event = FakeShutdownEvent()
+
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def threads_per_test(self):
+        """Number of threads each test may use so that all tests running
+        at the same time stay within ``thread_budget``
+        """
+
+        workers = len(self.source_addresses) if self.concurrent else 1
+        return max(self.min_threads, self.thread_budget // max(1, workers))
+
+    def run(self, download=True, upload=True, pre_allocate=True,
+            callback=do_nothing):
+        """Test every source address and return a dict mapping each source
+        address to its ``SpeedtestResults``, or ``None`` if the test failed.
+        Failures are recorded in ``errors``.
+
+        ``callback`` is called as ``callback(source_address, stage)`` with
+        ``stage`` one of ``'download'``, ``'upload'`` or ``'done'``
+        """
+
+        self.results = {}
+        self.errors = {}
+
+        if not self.concurrent:
+            for i, source_address in enumerate(self.source_addresses):
+                if self._shutdown_event.isSet():
+                    break
+                if i and self.stagger:
+                    timeit.time.sleep(self.stagger)
+                self._test(source_address, 0, download, upload,
+                           pre_allocate, callback)
+            return dict(self.results)
+
+        workers = []
+        for i, source_address in enumerate(self.source_addresses):
+            worker = threading.Thread(
+                target=self._test,
+                args=(source_address, i * self.stagger, download, upload,
+                      pre_allocate, callback)
+            )
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+        return dict(self.results)
+
+    def _connect(self, source_address):
+        """Instantiate ``Speedtest`` bound to ``source_address``, retrying
+        while speedtest.net is not accepting connections
+        """
+
+        for attempt in range(self.retries):
+            try:
+                return Speedtest(source_address=source_address,
+                                 timeout=self._timeout, secure=self._secure,
+                                 shutdown_event=self._shutdown_event)
+            except Exception:
+                e = get_exception()
+                printer('Speedtest failed to start for source %s (%r)' %
+                        (source_address, e), debug=True)
+                if attempt + 1 < self.retries:
+                    timeit.time.sleep(1)
+        raise e
+
+    def _test(self, source_address, delay, download, upload, pre_allocate,
+              callback):
+        try:
+            if delay:
+                timeit.time.sleep(delay)
+            speedtest = self._connect(source_address)
+            self.server_cache.load(speedtest)
+            for attempt in range(3):
+                try:
+                    speedtest.get_best_server()
+                    break
+                except SpeedtestBestServerFailure:
+                    if attempt == 2:
+                        raise
+            if download:
+                callback(source_address, 'download')
+                speedtest.download(threads=min(
+                    self.threads_per_test,
+                    speedtest.config['threads']['download']))
+            if upload:
+                callback(source_address, 'upload')
+                speedtest.upload(pre_allocate=pre_allocate, threads=min(
+                    self.threads_per_test,
+                    speedtest.config['threads']['upload']))
+            callback(source_address, 'done')
+            self.results[source_address] = speedtest.results
+        except Exception:
+            self.results[source_address] = None
+            self.errors[source_address] = get_exception()
+
+
 def ctrl_c(shutdown_event):
     """Catch Ctrl-C key sequence and set a SHUTDOWN_EVENT for our threaded
     operations
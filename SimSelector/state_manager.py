@@ -1,57 +1,198 @@
 """
-A helper module to handle reading/writing the script's state 
+A helper module to handle reading/writing the script's state
 (e.g., "validation complete").
+
+State is loaded once and served from memory.  Writes replace the state file
+atomically (write temp file, fsync, rename) so power loss mid-write leaves
+either the old or the new state.  Per-SIM results are appended to a journal
+so an interrupted run can resume from the last completed SIM without
+rewriting the whole file after every test.  Writes made inside batch() (i.e.
+the results of one test round) are saved together with a single fsync.
 """
+import contextlib
 import json
 import os
+import threading
 
 STATE_FILE = '/data/simselector_state.json'
 
+
+class StateStore:
+    """In-memory state backed by an atomically replaced JSON file and an append-only journal."""
+
+    def __init__(self, path: str = STATE_FILE, journal_path: str = None):
+        self.path = path
+        self.journal_path = journal_path or f'{path}.journal'
+        self.data = {}
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._journal = []  # Entries recorded during a batch, not yet appended
+        self._load()
+        if os.path.exists(self.journal_path):
+            self.flush()  # Fold the journal into the state file so appends never follow a torn line
+
+    def get(self, state_name: str, default: any = None) -> any:
+        """Return the value for state_name, or default."""
+        with self._lock:
+            return self.data.get(state_name, default)
+
+    def set(self, state_name: str, value: any):
+        """Set state_name to value and save (deferred until the end of a batch)."""
+        with self._lock:
+            self.data[state_name] = value
+            self._dirty = True
+            if not self._batch_depth:
+                self.flush()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group several set() and record() calls into a single write."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    if self._dirty:
+                        self.flush()  # The state file includes the batch's records
+                    elif self._journal:
+                        self._append(self._journal)
+                    self._journal = []
+
+    def record(self, state_name: str, key: str, value: any):
+        """Set state[state_name][key] = value by appending to the journal (at the end of a batch)."""
+        entry = json.dumps({"state": state_name, "key": key, "value": value})
+        with self._lock:
+            self.data.setdefault(state_name, {})[key] = value
+            if self._batch_depth:
+                self._journal.append(entry)
+            else:
+                self._append([entry])
+
+    def _append(self, entries):
+        try:
+            self._makedirs()
+            with open(self.journal_path, 'a') as f:
+                f.write(''.join(entry + '\n' for entry in entries))
+                f.flush()
+                os.fsync(f.fileno())
+        except IOError as e:
+            print(f"Could not write to state journal: {e}")
+            self.flush()
+
+    def flush(self):
+        """Atomically write all state to the state file and truncate the journal."""
+        with self._lock:
+            tmp = f'{self.path}.tmp'
+            try:
+                self._makedirs()
+                with open(tmp, 'w') as f:
+                    json.dump(self.data, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                self._fsync_dir()
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self._dirty = False
+            except IOError as e:
+                print(f"Could not write to state file: {e}")
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    # Handle empty file case
+                    content = f.read()
+                    if content:
+                        self.data = json.loads(content)
+        except (IOError, json.JSONDecodeError) as e:
+            # For a real device, you'd use a proper logger.
+            # This print is a placeholder for development.
+            print(f"Could not read state file, starting fresh: {e}")
+            self.data = {}
+        try:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # Torn final write
+                        self.data.setdefault(entry["state"], {})[entry["key"]] = entry["value"]
+        except IOError as e:
+            print(f"Could not read state journal: {e}")
+
+    def _makedirs(self):
+        # Ensure the directory exists
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(os.path.dirname(self.path) or '.', os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> StateStore:
+    """Return the shared StateStore for STATE_FILE, loading it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != STATE_FILE:
+            _store = StateStore(STATE_FILE)
+        return _store
+
+
 def set_state(state_name: str, value: any):
     """
     Writes a key-value pair to the persistent state file.
     """
-    data = {}
-    try:
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-        
-        # Read existing data if file exists
-        if os.path.exists(STATE_FILE):
-            with open(STATE_FILE, 'r') as f:
-                # Handle empty file case
-                content = f.read()
-                if content:
-                    data = json.loads(content)
-    except (IOError, json.JSONDecodeError) as e:
-        # For a real device, you'd use a proper logger.
-        # This print is a placeholder for development.
-        print(f"Could not read state file, starting fresh: {e}")
-        data = {}
-
-    # Update data and write back to file
-    data[state_name] = value
-    try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
-    except IOError as e:
-        print(f"Could not write to state file: {e}")
+    get_store().set(state_name, value)
+
+
+def batch():
+    """
+    Returns a context manager that saves the state written inside it with a single write.
+    """
+    return get_store().batch()
+
 
 def get_state(state_name: str) -> any:
     """
-    Reads the state file and returns the value for the given state_name.
+    Returns the value for the given state_name.
     Returns None if the file or key does not exist.
     """
-    if not os.path.exists(STATE_FILE):
-        return None
-    
-    try:
-        with open(STATE_FILE, 'r') as f:
-            content = f.read()
-            if not content:
-                return None
-            data = json.loads(content)
-            return data.get(state_name)
-    except (IOError, json.JSONDecodeError) as e:
-        print(f"Could not read state file: {e}")
-        return None 
\ No newline at end of file
+    return get_store().get(state_name)
+
+
+def record_result(sim: str, result: dict):
+    """
+    Journals the test result of a SIM so an interrupted run can resume after it.
+    """
+    get_store().record('results', sim, result)
+
+
+def get_results() -> dict:
+    """
+    Returns a dict of SIM: result for every SIM recorded since the last clear_results().
+    """
+    return dict(get_store().get('results') or {})
+
+
+def clear_results():
+    """
+    Forgets all recorded SIM results.
+    """
+    get_store().set('results', {})
@@ -7,17 +7,111 @@ This module provides comprehensive mocking for testing SimSelector without real
 import json
 import time
 import random
+import socket
+import threading
 from unittest.mock import Mock, MagicMock, patch
 from typing import Dict, Any, Optional, List
 import sys
 import os
 
 
+class VirtualClock:
+    """Deterministic simulated clock for the app under test and the mocks.
+
+    While installed, time.sleep() returns immediately and advances simulated
+    time instead, and time.time()/time.monotonic() return simulated time.
+    Each thread keeps its own timeline: threads start at their parent's time
+    and join() moves the caller up to the joined thread's time, so concurrent
+    waits (e.g. one per modem) overlap instead of adding up.  now is the
+    latest time any thread has reached.
+    """
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.start_time = start
+        self.now = start
+        self.slept = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = []
+
+    @property
+    def elapsed(self) -> float:
+        """Simulated seconds since the clock started."""
+        return self.now - self.start_time
+
+    def time(self) -> float:
+        """Current simulated time of the calling thread."""
+        return getattr(self._local, 'now', None) or self.now
+
+    def sleep(self, seconds: float):
+        """Advance the calling thread's simulated time without blocking."""
+        seconds = max(0.0, seconds)
+        with self._lock:
+            now = self.time() + seconds
+            if getattr(self._local, 'now', None) is not None:
+                self._local.now = now
+            self.now = max(self.now, now)
+            self.slept += seconds
+
+    def _catch_up(self, when: float):
+        """Move the calling thread's time forward to when."""
+        if getattr(self._local, 'now', None) is not None:
+            self._local.now = max(self._local.now, when)
+
+    def install(self):
+        """Patch time and thread start/join for the app under test."""
+        clock = self
+        original_start = threading.Thread.start
+        original_join = threading.Thread.join
+
+        def start(thread):
+            parent_time = clock.time()
+            run = thread.run
+
+            def run_from_parent_time():
+                clock._local.now = parent_time
+                try:
+                    run()
+                finally:
+                    thread.virtual_end = clock.time()
+
+            thread.run = run_from_parent_time
+            original_start(thread)
+
+        def join(thread, timeout=None):
+            original_join(thread, timeout)
+            if not thread.is_alive() and hasattr(thread, 'virtual_end'):
+                clock._catch_up(thread.virtual_end)
+
+        self._local.now = self.now
+        self._patches = [patch('time.sleep', self.sleep), patch('time.time', self.time),
+                         patch('time.monotonic', self.time), patch.object(threading.Thread, 'start', start),
+                         patch.object(threading.Thread, 'join', join)]
+        for p in self._patches:
+            p.start()
+        return self
+
+    def uninstall(self):
+        """Restore real time."""
+        for p in reversed(self._patches):
+            p.stop()
+        self._patches = []
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+
 class MockEventingCSClient:
     """Mock implementation of EventingCSClient for testing."""
     
-    def __init__(self, name='SimSelector'):
+    def __init__(self, name='SimSelector', clock: VirtualClock = None, quiet: bool = False):
         self.name = name
+        self.clock = clock
+        self.quiet = quiet
+        self.enabled_at = {}  # rule _id_: time the rule was last enabled
         self.logs = []
         self.alerts = []
         self.config_data = {
@@ -139,6 +233,8 @@ class MockEventingCSClient:
         """Mock PUT request to router API."""
         self.log(f"PUT {path} = {data}")
         
+        # Normalize path to always have leading slash
+        path = path if path.startswith('/') else '/' + path
         if path.startswith('/config'):
             self._set_config_data(path, data)
         elif path.startswith('/control'):
@@ -166,19 +262,94 @@ class MockEventingCSClient:
         # For testing, just log the delete operation
         return True
     
+    def wait_for_state(self, path: str, predicate: Any, timeout: float = None, poll_interval: float = 2) -> bool:
+        """Mock wait_for_state - polls the mock router tree."""
+        return path in self.wait_for_states([path], predicate, timeout, poll_interval)
+
+    def wait_for_states(self, paths: List[str], predicate: Any, timeout: float = None,
+                        poll_interval: float = 2, count: int = None) -> Dict[str, Any]:
+        """Mock wait_for_states - polls the mock router tree on the virtual clock.
+
+        Without a virtual clock it returns the paths already in the expected state."""
+        matches = predicate if callable(predicate) else (lambda value: value == predicate)
+        count = len(paths) if count is None else count
+        deadline = None if timeout is None or self.clock is None else self.clock.time() + timeout
+        reached = {}
+        while True:
+            for path in paths:
+                if path not in reached:
+                    value = self.get(path)
+                    if matches(value):
+                        reached[path] = value
+            if len(reached) >= count or deadline is None or self.clock.time() >= deadline:
+                return reached
+            self.clock.sleep(min(poll_interval, deadline - self.clock.time()))
+
+    def connection_state(self, device_id: str) -> str:
+        """Connection state of a mock modem.
+
+        Devices with a 'connect_time' connect that many (virtual) seconds after their
+        WAN rule is enabled and report 'connecting' until then; others report their
+        static scenario state."""
+        device = self.status_data['/status/wan/devices'][device_id]
+        state = device['status']['connection_state']
+        if 'connect_time' not in device or state != 'connected':
+            return state
+        rule = self._find_rule(device['config'].get('_id_'))
+        if rule is not None and rule.get('disabled'):
+            return 'standby'
+        now = self.clock.time() if self.clock else time.time()
+        enabled_at = self.enabled_at.get(device['config'].get('_id_'), 0)
+        return 'connected' if now - enabled_at >= device['connect_time'] else 'connecting'
+
+    def ip_address(self, device_id: str) -> Optional[str]:
+        """IP address of a connected mock modem."""
+        devices = list(self.status_data['/status/wan/devices'])
+        if device_id not in devices or self.connection_state(device_id) != 'connected':
+            return None
+        return f'10.0.{devices.index(device_id) + 1}.2'
+
+    def active_devices(self) -> List[str]:
+        """Connected mock modems whose WAN rule is enabled."""
+        return [uid for uid in self.status_data['/status/wan/devices']
+                if self.connection_state(uid) == 'connected']
+
+    def load_scenario(self, scenario_data: Dict):
+        """Replace the mock modems and WAN rules with those of a scenario."""
+        self.status_data['/status/wan/devices'] = scenario_data
+        self.config_data['/config/wan/rules2'] = [
+            {
+                '_id_': sim_data['config']['_id_'],
+                'priority': sim_data['config'].get('priority', 1.0),
+                'trigger_name': f"{sim_data['info']['port']} {sim_data['info']['sim']}",
+                'trigger_string': f"type|is|mdm%sim|is|{sim_data['info']['sim']}%port|is|{sim_data['info']['port']}",
+                'disabled': False
+            } for sim_data in scenario_data.values()
+        ]
+        self.enabled_at = {}
+
+    def _find_rule(self, rule_index_or_id: Any) -> Optional[Dict]:
+        rules = self.config_data['/config/wan/rules2']
+        if str(rule_index_or_id).isdigit():
+            index = int(rule_index_or_id)
+            return rules[index] if 0 <= index < len(rules) else None
+        return next((r for r in rules if r['_id_'] == rule_index_or_id), None)
+
     def log(self, message: str):
         """Mock logging function."""
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
         log_entry = f"[{timestamp}] {self.name}: {message}"
         self.logs.append(log_entry)
-        print(log_entry)  # Also print for real-time feedback
+        if not self.quiet:
+            print(log_entry)  # Also print for real-time feedback
     
     def alert(self, message: str):
         """Mock alert function."""
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
         alert_entry = f"[{timestamp}] ALERT - {self.name}: {message}"
         self.alerts.append(alert_entry)
-        print(f"🚨 {alert_entry}")
+        if not self.quiet:
+            print(f"🚨 {alert_entry}")
     
     def _get_status_data(self, path: str) -> Any:
         """Get status data from mock."""
@@ -195,8 +366,12 @@ class MockEventingCSClient:
         if '/status/wan/devices/' in path and '/status/connection_state' in path:
             device_id = path.split('/')[4]
             if device_id in self.status_data['/status/wan/devices']:
-                return self.status_data['/status/wan/devices'][device_id]['status']['connection_state']
+                return self.connection_state(device_id)
         
+        if '/status/wan/devices/' in path and '/status/ipinfo/ip_address' in path:
+            device_id = path.split('/')[4]
+            return self.ip_address(device_id)
+
         if '/status/wan/devices/' in path and '/info/iface' in path:
             device_id = path.split('/')[4]
             if device_id in self.status_data['/status/wan/devices']:
@@ -254,17 +429,17 @@ class MockEventingCSClient:
                 rule_id = parts[4]
                 
                 # Find and update rule
-                rules = self.config_data['/config/wan/rules2']
-                for rule in rules:
-                    if rule['_id_'] == rule_id:
-                        if len(parts) > 5:
-                            # Update specific field
-                            field = parts[5]
-                            rule[field] = data
-                        else:
-                            # Update entire rule
-                            rule.update(data)
-                        break
+                rule = self._find_rule(rule_id)
+                if rule is not None:
+                    if len(parts) > 5:
+                        # Update specific field
+                        field = parts[5]
+                        if field == 'disabled' and rule.get('disabled') and not data:
+                            self.enabled_at[rule['_id_']] = self.clock.time() if self.clock else time.time()
+                        rule[field] = data
+                    else:
+                        # Update entire rule
+                        rule.update(data)
         else:
             self.config_data[path] = data
     
@@ -279,12 +454,29 @@ class MockEventingCSClient:
 
 
 class MockSpeedtest:
-    """Mock implementation of Speedtest for testing."""
+    """Mock implementation of Speedtest for testing.
+
+    With a client, speeds follow the scenario's expected speeds for the one
+    connected SIM under test (+/- 5%); otherwise they are random.  Each test
+    takes duration seconds, which is simulated time under a VirtualClock."""
     
-    def __init__(self):
+    def __init__(self, client: MockEventingCSClient = None, rng: random.Random = None, duration: float = 0.1):
         self.results = Mock()
         self.servers = []
         self.best_server = None
+        self.client = client
+        self.rng = rng or random.Random()
+        self.duration = duration
+
+    def _expected(self, key: str, low: float, high: float) -> float:
+        """Expected speed in Mbps of the SIM under test, or a random speed."""
+        if self.client is not None:
+            active = self.client.active_devices()
+            if len(active) == 1:
+                device = self.client.status_data['/status/wan/devices'][active[0]]
+                if key in device:
+                    return device[key] * self.rng.uniform(0.95, 1.05)
+        return self.rng.uniform(low, high)
         
     def get_servers(self, servers_list: List = None):
         """Mock get_servers method."""
@@ -303,22 +495,45 @@ class MockSpeedtest:
     def download(self) -> float:
         """Mock download speed test - returns speed in bits per second."""
         # Simulate realistic 5G/LTE speeds (convert Mbps to bps)
-        download_mbps = random.uniform(20, 100)  # 20-100 Mbps
+        download_mbps = self._expected('expected_download', 20, 100)  # 20-100 Mbps
         download_bps = download_mbps * 1_000_000  # Convert to bits per second
         self.results.download = download_bps
-        time.sleep(0.1)  # Simulate test time
+        time.sleep(self.duration)  # Simulate test time
         return download_bps
     
     def upload(self, pre_allocate: bool = True) -> float:
         """Mock upload speed test - returns speed in bits per second."""
         # Simulate realistic upload speeds (usually lower than download)
-        upload_mbps = random.uniform(5, 30)  # 5-30 Mbps  
+        upload_mbps = self._expected('expected_upload', 5, 30)  # 5-30 Mbps  
         upload_bps = upload_mbps * 1_000_000  # Convert to bits per second
         self.results.upload = upload_bps
-        time.sleep(0.1)  # Simulate test time
+        time.sleep(self.duration)  # Simulate test time
         return upload_bps
 
 
+class MockSpeedtestOrchestrator:
+    """Mock implementation of SpeedtestOrchestrator - concurrent tests bound to modem IPs."""
+
+    def __init__(self, speedtest: MockSpeedtest, source_addresses, **kwargs):
+        self.speedtest = speedtest
+        self.source_addresses = list(source_addresses)
+        self.errors = {}
+
+    def run(self, download=True, upload=True, pre_allocate=True, callback=None):
+        """Return dict of source address: results with download/upload in bits per second."""
+        client = self.speedtest.client
+        devices = {client.ip_address(uid): uid for uid in client.status_data['/status/wan/devices']}
+        results = {}
+        for source_address in self.source_addresses:
+            device = client.status_data['/status/wan/devices'].get(devices.get(source_address), {})
+            result = Mock()
+            result.download = device.get('expected_download', 0.0) * self.speedtest.rng.uniform(0.95, 1.05) * 1_000_000
+            result.upload = device.get('expected_upload', 0.0) * self.speedtest.rng.uniform(0.95, 1.05) * 1_000_000
+            results[source_address] = result
+        time.sleep(self.speedtest.duration * (int(download) + int(upload)))  # Tests run concurrently
+        return results
+
+
 class MockScenarios:
     """Pre-defined test scenarios for different SIM configurations."""
     
@@ -611,13 +826,49 @@ class MockScenarios:
         }
 
 
+def random_scenario(rng: random.Random, max_modems: int = 4, max_sims_per_modem: int = 2) -> Dict:
+    """Scenario with a random number of modems and SIMs, signals, speeds and connect delays."""
+    carriers = [('Verizon', '311480'), ('T-Mobile', '310260'), ('AT&T', '310410'), ('US Cellular', '311580')]
+    scenario = {}
+    for modem in range(1, rng.randint(1, max_modems) + 1):
+        for slot in range(1, rng.randint(1, max_sims_per_modem) + 1):
+            index = len(scenario) + 1
+            carrier, home_carrier = rng.choice(carriers)
+            rsrp = rng.randint(-120, -65)
+            connected = rng.random() > 0.1
+            quality = max(0.05, (rsrp + 125) / 60)
+            scenario[f'mdm-sim{index}'] = {
+                'info': {'port': f'MODEM{modem}', 'sim': f'SIM{slot}', 'tech': rng.choice(['5G', 'LTE']),
+                         'iface': f'wwan{index - 1}'},
+                'config': {'_id_': f'rule_{index:03d}', 'priority': 1.0 + (index - 1) * 0.1},
+                'diagnostics': {'RSRP': rsrp, 'PRD': carrier, 'HOMECARRID': home_carrier, 'RFBAND': 'B2'},
+                'status': {'connection_state': 'connected' if connected else 'disconnected',
+                           'error_text': '' if connected else 'NO SIGNAL'},
+                'connect_time': rng.uniform(5, 120),
+                'expected_download': round(rng.uniform(1, 150) * quality, 1) if connected else 0.0,
+                'expected_upload': round(rng.uniform(0.5, 40) * quality, 1) if connected else 0.0
+            }
+    if len(scenario) < 2:  # SimSelector needs at least 2 SIMs
+        return random_scenario(rng, max_modems, max_sims_per_modem)
+    return scenario
+
+
 class TestHarness:
-    """Main test harness for running SimSelector scenarios."""
+    """Main test harness for running SimSelector scenarios.
+
+    With virtual_time (the default) scenarios run on a VirtualClock, so the
+    app's sleeps, modem connection delays and speedtests take simulated time
+    and a scenario finishes in well under a second.  seed makes mock speeds
+    reproducible."""
     
-    def __init__(self):
-        self.mock_client = MockEventingCSClient('SimSelector')
-        self.mock_speedtest = MockSpeedtest()
+    def __init__(self, virtual_time: bool = True, seed: int = None, quiet: bool = False):
+        self.virtual_time = virtual_time
+        self.clock = VirtualClock() if virtual_time else None
+        self.rng = random.Random(seed)
+        self.mock_client = MockEventingCSClient('SimSelector', clock=self.clock, quiet=quiet)
+        self.mock_speedtest = MockSpeedtest(self.mock_client, self.rng, duration=10.0 if virtual_time else 0.1)
         self.original_modules = {}
+        self.simselector = None
     
     def setup_mocks(self, scenario_data: Dict):
         """Setup mock objects with scenario-specific data."""
@@ -628,9 +879,20 @@ class TestHarness:
         # Set up WAN devices based on scenario
         for sim_uid, sim_data in scenario_data.items():
             self.mock_client.wan_devices[sim_uid] = sim_data
+        self.mock_client.load_scenario(scenario_data)
     
     def run_test_scenario(self, scenario_name: str, scenario_data: dict):
         """Execute a complete test scenario with the given SIM configuration."""
+        if self.clock is None:
+            return self._run_test_scenario(scenario_name, scenario_data)
+        real_start = time.perf_counter()
+        virtual_start = self.clock.elapsed
+        # No real network access under simulation
+        with self.clock, patch('socket.create_connection', return_value=MagicMock()):
+            self._run_test_scenario(scenario_name, scenario_data)
+        print(f"⏱️  Simulated {self.clock.elapsed - virtual_start:.0f}s in {time.perf_counter() - real_start:.2f}s")
+
+    def _run_test_scenario(self, scenario_name: str, scenario_data: dict):
         print(f"🧪 Running Test Scenario: {scenario_name}")
         print(f"📋 SIMs to test: {len(scenario_data)}")
         print()
@@ -664,10 +926,14 @@ class TestHarness:
             # Import SimSelector after patching
             sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
             import SimSelector
+            from result_cache import ResultCache
             
             # Set up global instances for SimSelector functions
             SimSelector.simselector = SimSelector.SimSelector()
             SimSelector.simselector.client = self.mock_client
+            SimSelector.simselector.routing.client = self.mock_client
+            SimSelector.simselector.result_cache = ResultCache()  # Every scenario starts untested
+            self.simselector = SimSelector.simselector
             SimSelector.simselector.speedtest = self.mock_speedtest
             SimSelector.cp = self.mock_client
             
@@ -677,6 +943,10 @@ class TestHarness:
             SimSelector.run_validation_phase()
             print()
             
+            # The device reboots between phases, so SIMs are tested again
+            for sim_data in SimSelector.simselector.sims.values():
+                sim_data.pop('OK', None)
+
             # Run the performance phase
             print("🚀 Phase 2: Performance/Run")
             print("-" * 30)
@@ -721,15 +991,15 @@ class TestHarness:
             raise
         
         finally:
-            # Remove patches
-            self._remove_patches()
-            
             # Clean up module imports
             modules_to_remove = [mod for mod in sys.modules.keys() 
                                if mod.startswith('SimSelector') or mod in ['csclient', 'speedtest', 'state_manager']]
             for mod in modules_to_remove:
                 if mod in sys.modules:
                     del sys.modules[mod]
+
+            # Remove patches
+            self._remove_patches()
     
     def _apply_patches(self):
         """Apply module patches for testing."""
@@ -738,30 +1008,47 @@ class TestHarness:
         
         # Store original modules
         self.original_modules = {}
-        modules_to_mock = ['csclient', 'speedtest', 'state_manager']
+        modules_to_mock = ['csclient', 'speedtest', 'state_manager', 'state_wait']
         
-        for module_name in modules_to_mock:
+        for module_name in modules_to_mock + ['SimSelector']:
             if module_name in sys.modules:
                 self.original_modules[module_name] = sys.modules[module_name]
+        # SimSelector must be imported again against the mocks
+        sys.modules.pop('SimSelector', None)
         
         # Import mock state manager functions
         sys.path.insert(0, os.path.dirname(__file__))
         import mock_state_manager
+        mock_state_manager.clear_state()
         
         # Mock csclient module
         mock_csclient_module = MagicMock()
         mock_csclient_module.EventingCSClient = lambda name: self.mock_client
         sys.modules['csclient'] = mock_csclient_module
+
+        # Mock state_wait module - waits poll the mock router tree on the virtual clock
+        mock_state_wait_module = MagicMock()
+        mock_state_wait_module.wait_for_state = \
+            lambda client, *args, **kwargs: client.wait_for_state(*args, **kwargs)
+        mock_state_wait_module.wait_for_states = \
+            lambda client, *args, **kwargs: client.wait_for_states(*args, **kwargs)
+        sys.modules['state_wait'] = mock_state_wait_module
         
         # Mock speedtest module  
         mock_speedtest_module = MagicMock()
         mock_speedtest_module.Speedtest = lambda: self.mock_speedtest
+        mock_speedtest_module.SpeedtestOrchestrator = \
+            lambda source_addresses, **kwargs: MockSpeedtestOrchestrator(self.mock_speedtest, source_addresses, **kwargs)
         sys.modules['speedtest'] = mock_speedtest_module
         
         # Mock state_manager module with the imported functions
         mock_state_manager_module = MagicMock()
         mock_state_manager_module.get_state = mock_state_manager.get_state
         mock_state_manager_module.set_state = mock_state_manager.set_state
+        mock_state_manager_module.record_result = mock_state_manager.record_result
+        mock_state_manager_module.get_results = mock_state_manager.get_results
+        mock_state_manager_module.clear_results = mock_state_manager.clear_results
+        mock_state_manager_module.batch = mock_state_manager.batch
         sys.modules['state_manager'] = mock_state_manager_module
     
     def _remove_patches(self):
@@ -772,7 +1059,7 @@ class TestHarness:
                 sys.modules[module_name] = original_module
         
         # Remove mock modules that weren't originally present
-        modules_to_clean = ['csclient', 'speedtest', 'state_manager']
+        modules_to_clean = ['csclient', 'speedtest', 'state_manager', 'state_wait']
         for module_name in modules_to_clean:
             if module_name in sys.modules and (not hasattr(self, 'original_modules') or module_name not in self.original_modules):
                 del sys.modules[module_name] 
\ No newline at end of file
@@ -3,6 +3,7 @@ Mock State Manager for SimSelector Testing
 ==========================================
 This mock replaces the real state_manager.py during testing.
 """
+import contextlib
 
 # In-memory state storage for testing
 _test_state = {}
@@ -21,6 +22,28 @@ def set_state(key: str, value):
     print(f"[MOCK STATE] SET {key} = {value}")
 
 
+def record_result(sim: str, result: dict):
+    """Record SIM result for testing."""
+    _test_state.setdefault('results', {})[sim] = result
+    print(f"[MOCK STATE] RECORD {sim} = {result}")
+
+
+def batch():
+    """Group state writes for testing - writes are in memory, so nothing to defer."""
+    return contextlib.nullcontext()
+
+
+def get_results() -> dict:
+    """Get recorded SIM results for testing."""
+    return dict(_test_state.get('results') or {})
+
+
+def clear_results():
+    """Clear recorded SIM results for testing."""
+    _test_state['results'] = {}
+    print("[MOCK STATE] CLEARED RESULTS")
+
+
 def clear_state():
     """Clear all state for testing."""
     global _test_state
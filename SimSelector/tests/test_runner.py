@@ -27,13 +27,17 @@ Usage:
 
 import sys
 import os
+import io
+import time
+import random
 import argparse
+import contextlib
 from unittest.mock import patch
 
 # Add the SimSelector directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from tests.mock_framework import TestHarness, MockScenarios
+from tests.mock_framework import TestHarness, MockScenarios, random_scenario
 
 
 def run_all_scenarios():
@@ -121,6 +125,39 @@ def run_single_scenario(scenario_name: str):
     return True
 
 
+def run_benchmark(count: int = 1000, seed: int = 0):
+    """Run count randomised scenarios on the virtual clock as a regression and performance benchmark."""
+    print(f"🎲 Running {count} randomised scenarios (seed={seed})")
+    rng = random.Random(seed)
+    failures = []
+    simulated = 0.0
+    start = time.perf_counter()
+    for i in range(count):
+        scenario = random_scenario(rng)
+        harness = TestHarness(seed=rng.randrange(2 ** 32), quiet=True)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                harness.run_test_scenario(f"Random #{i}", scenario)
+            sims = harness.simselector.sims
+            for uid, sim_data in scenario.items():
+                connected = sim_data['status']['connection_state'] == 'connected'
+                if connected and not sims[uid].get('download'):
+                    raise AssertionError(f"{uid} connected but has no speedtest result")
+                if not connected and sims[uid].get('OK'):
+                    raise AssertionError(f"{uid} never connected but marked OK")
+        except Exception as e:
+            failures.append((i, scenario, e))
+        simulated += harness.clock.elapsed
+    elapsed = time.perf_counter() - start
+
+    print(f"📊 {count - len(failures)}/{count} scenarios passed")
+    print(f"⏱️  Simulated {simulated / 3600:.1f}h in {elapsed:.1f}s ({count / elapsed:.0f} scenarios/s)")
+    for i, scenario, e in failures[:10]:
+        print(f"❌ Random #{i}: {type(e).__name__}: {e}")
+        print(f"   {scenario}")
+    return not failures
+
+
 def interactive_test():
     """Run interactive testing mode."""
     print("🔧 SimSelector Interactive Test Mode")
@@ -239,7 +276,9 @@ def main():
     """Main entry point for test runner."""
     parser = argparse.ArgumentParser(description='SimSelector Test Runner')
     parser.add_argument('scenario', nargs='?', 
-                       help='Test scenario: all, good, weak, failed, triple, quad, allweak, allfailed, highspeed, tiebreaker, apn, roaming, mvno, interactive')
+                       help='Test scenario: all, good, weak, failed, triple, quad, allweak, allfailed, highspeed, tiebreaker, apn, roaming, mvno, benchmark, interactive')
+    parser.add_argument('--count', type=int, default=1000, help='Number of randomised scenarios for benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for benchmark')
     
     args = parser.parse_args()
     
@@ -259,11 +298,14 @@ def main():
         print("  apn       - Carrier-specific APN testing")
         print("  roaming   - International roaming")
         print("  mvno      - MVNO carrier testing")
+        print("  benchmark - Randomised scenarios on the virtual clock (--count, --seed)")
         print("  interactive - Interactive mode")
         sys.exit(1)
     
     if args.scenario == "all":
         run_all_scenarios()
+    elif args.scenario == "benchmark":
+        sys.exit(0 if run_benchmark(args.count, args.seed) else 1)
     elif args.scenario == "interactive":
         interactive_test()
     else:
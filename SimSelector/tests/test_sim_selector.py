@@ -153,6 +153,19 @@ class TestSimSelectorEnhancements(unittest.TestCase):
         # Should prioritize sim1 due to better RSRP (-85 > -95)
         self.assertEqual(sorted_results, ['sim1', 'sim2'])
 
+    def test_schedule_sims_one_per_modem(self):
+        """Test that SIMs sharing a modem are tested in separate rounds."""
+        self.sim_selector.sims = {
+            'mdm-1': {'info': {'port': 'MODEM1', 'sim': 'SIM2'}},
+            'mdm-2': {'info': {'port': 'MODEM1', 'sim': 'SIM1'}},
+            'mdm-3': {'info': {'port': 'MODEM2', 'sim': 'SIM1'}}
+        }
+        rounds = self.sim_selector.schedule_sims(['mdm-1', 'mdm-2', 'mdm-3'])
+
+        # MODEM1 SIM1 and MODEM2 SIM1 together, then MODEM1 SIM2
+        self.assertEqual(rounds, [['mdm-2', 'mdm-3'], ['mdm-1']])
+        self.assertEqual(self.sim_selector.schedule_sims([]), [])
+
 
 class TestStatePersistence(unittest.TestCase):
     """Test cases for state management functionality."""
@@ -181,5 +194,235 @@ class TestStatePersistence(unittest.TestCase):
         self.assertEqual(phase, 'complete')
 
 
+class TestStateStore(unittest.TestCase):
+    """Test cases for the cached, journaled state store."""
+
+    def setUp(self):
+        """Set up a state file in a temporary directory."""
+        import tempfile
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'state.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_state_survives_reload(self):
+        """Test that set values and journaled results are reloaded."""
+        from state_manager import StateStore
+        store = StateStore(self.path)
+        store.set('phase', 'performance')
+        store.record('results', 'mdm-1', {'passed': True})
+
+        reloaded = StateStore(self.path)
+        self.assertEqual(reloaded.get('phase'), 'performance')
+        self.assertEqual(reloaded.get('results'), {'mdm-1': {'passed': True}})
+        self.assertFalse(os.path.exists(reloaded.journal_path))
+
+    def test_torn_journal_entry_is_ignored(self):
+        """Test that a partially written journal line does not lose earlier results."""
+        from state_manager import StateStore
+        store = StateStore(self.path)
+        store.record('results', 'mdm-1', {'passed': True})
+        with open(store.journal_path, 'a') as f:
+            f.write('{"state": "results", "key": "mdm-2"')
+
+        reloaded = StateStore(self.path)
+        self.assertEqual(reloaded.get('results'), {'mdm-1': {'passed': True}})
+
+    def test_batch_writes_once(self):
+        """Test that set() calls inside batch() are written together."""
+        from state_manager import StateStore
+        store = StateStore(self.path)
+        with patch.object(store, 'flush', wraps=store.flush) as flush:
+            with store.batch():
+                store.set('a', 1)
+                store.set('b', 2)
+            self.assertEqual(flush.call_count, 1)
+        self.assertEqual(StateStore(self.path).get('b'), 2)
+
+    def test_batch_journals_records_once(self):
+        """Test that record() calls inside batch() are appended to the journal together."""
+        from state_manager import StateStore
+        store = StateStore(self.path)
+        with patch.object(store, '_append', wraps=store._append) as append:
+            with store.batch():
+                store.record('results', 'mdm-1', {'passed': True})
+                store.record('results', 'mdm-2', {'passed': False})
+                self.assertFalse(os.path.exists(store.journal_path))
+            self.assertEqual(append.call_count, 1)
+        self.assertEqual(StateStore(self.path).get('results'),
+                         {'mdm-1': {'passed': True}, 'mdm-2': {'passed': False}})
+
+
+class TestResultCache(unittest.TestCase):
+    """Test cases for the per-ICCID/cell-ID speedtest result cache."""
+
+    DIAGNOSTICS = {'ICCID': '8901', 'CELL_ID': '1234', 'RSRP': -85, 'SINR': 12}
+
+    def setUp(self):
+        """Set up a cache file in a temporary directory."""
+        import tempfile
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'cache.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_unchanged_sim_reuses_persisted_result(self):
+        """Test that a result is reused after reload while cell and signal are unchanged."""
+        from result_cache import ResultCache
+        ResultCache(self.path).store(self.DIAGNOSTICS, 50.0, 10.0)
+        cached = ResultCache(self.path).lookup(dict(self.DIAGNOSTICS, RSRP=-88))
+        self.assertEqual((cached['download'], cached['upload']), (50.0, 10.0))
+
+    def test_changed_signal_or_cell_forces_retest(self):
+        """Test that signal moves beyond thresholds, a new cell or missing IDs are cache misses."""
+        from result_cache import ResultCache
+        cache = ResultCache(self.path)
+        cache.store(self.DIAGNOSTICS, 50.0, 10.0)
+        self.assertIsNone(cache.lookup(dict(self.DIAGNOSTICS, RSRP=-95)))
+        self.assertIsNone(cache.lookup(dict(self.DIAGNOSTICS, SINR=3)))
+        self.assertIsNone(cache.lookup(dict(self.DIAGNOSTICS, CELL_ID='5678')))
+        self.assertIsNone(cache.lookup({'RSRP': -85}))
+
+    def test_expired_result_forces_retest(self):
+        """Test that results older than the TTL are not reused."""
+        from result_cache import ResultCache
+        cache = ResultCache(self.path, ttl=60)
+        with patch('time.time', return_value=1000.0):
+            cache.store(self.DIAGNOSTICS, 50.0, 10.0)
+        with patch('time.time', return_value=1061.0):
+            self.assertIsNone(cache.lookup(self.DIAGNOSTICS))
+
+
+class TestCachedSims(unittest.TestCase):
+    """Test that cached results are only reused with live diagnostics."""
+
+    DIAGNOSTICS = {'ICCID': '8901', 'CELL_ID': '1234', 'RSRP': -85, 'SINR': 12}
+
+    def setUp(self):
+        """Set up a SimSelector on a mock client, without its network checks."""
+        import tempfile
+        from result_cache import ResultCache
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.status = {
+            '/status/wan/devices/mdm-1/diagnostics': self.DIAGNOSTICS,
+            '/status/wan/devices/mdm-1/config/_id_': 'rule_001',
+        }
+        self.sim_selector = SimSelector.__new__(SimSelector)
+        self.sim_selector.client = MagicMock()
+        self.sim_selector.client.get.side_effect = self.status.get
+        self.sim_selector.routing = MagicMock()
+        self.sim_selector.pending_updates = []
+        self.sim_selector.sims = {'mdm-1': {'info': {'port': 'MODEM1', 'sim': 'SIM1', 'tech': 'lte/3g'}}}
+        self.sim_selector.result_cache = ResultCache(os.path.join(self.tmp_dir.name, 'cache.json'))
+        self.sim_selector.result_cache.store(self.DIAGNOSTICS, 50.0, 10.0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_connected_sim_reuses_cached_result(self):
+        """Test that a connected SIM is served from the cache without switching to it."""
+        self.status['/status/wan/devices/mdm-1/status/connection_state'] = 'connected'
+        self.assertTrue(self.sim_selector.use_cached_result('mdm-1'))
+        self.assertEqual(self.sim_selector.sims['mdm-1']['download'], 50.0)
+
+    def test_disabled_sim_is_connected_before_cache_lookup(self):
+        """Test that a SIM whose rule is disabled is connected, then skips only the speedtest."""
+        self.status['/status/wan/devices/mdm-1/status/connection_state'] = 'disconnected'
+        self.assertFalse(self.sim_selector.use_cached_result('mdm-1'))
+
+        def connect_sim(sim):
+            self.sim_selector.sims[sim]['diagnostics'] = self.DIAGNOSTICS
+            return True
+        self.sim_selector.connect_sim = connect_sim
+        self.sim_selector.do_concurrent_speedtests = Mock()
+        with patch('time.sleep'):
+            results = self.sim_selector.test_sims(['mdm-1'])
+        self.assertEqual(results, {'mdm-1': True})
+        self.sim_selector.do_concurrent_speedtests.assert_not_called()
+        self.assertEqual(self.sim_selector.sims['mdm-1']['download'], 50.0)
+
+
+class TestConcurrentSpeedtests(unittest.TestCase):
+    """Test that SIMs without a source route are isolated for their speedtest."""
+
+    def setUp(self):
+        """Set up a SimSelector on a mock client with one routable and one unroutable SIM."""
+        self.disabled = {'rule_001': False, 'rule_002': False}
+        self.sim_selector = SimSelector.__new__(SimSelector)
+        self.sim_selector.client = MagicMock()
+        self.sim_selector.client.put.side_effect = \
+            lambda path, value: self.disabled.__setitem__(path.split('/')[3], value)
+        wait_for_state = patch('SimSelector.wait_for_state', return_value=True)
+        wait_for_state.start()
+        self.addCleanup(wait_for_state.stop)
+        self.sim_selector.routing = MagicMock()
+        self.sim_selector.routing.ensure.side_effect = {'mdm-1': '10.0.0.1', 'mdm-2': None}.get
+        self.sim_selector.sims = {
+            'mdm-1': {'info': {'port': 'MODEM1', 'sim': 'SIM1'}},
+            'mdm-2': {'info': {'port': 'MODEM2', 'sim': 'SIM1'}},
+        }
+        self.enabled_during_test = {}
+
+        def do_speedtest(sim):
+            self.enabled_during_test[sim] = sorted(k for k, v in self.disabled.items() if not v)
+            return 20.0, 5.0
+        self.sim_selector.do_speedtest = do_speedtest
+
+    def test_default_route_speedtests_run_alone(self):
+        """Test that each default route speedtest runs with only its own rule enabled."""
+        with patch('time.sleep'):
+            self.sim_selector.do_concurrent_speedtests(
+                ['mdm-1', 'mdm-2'], {'mdm-1': 'rule_001', 'mdm-2': 'rule_002'})
+        self.assertEqual(self.enabled_during_test, {'mdm-1': ['rule_001'], 'mdm-2': ['rule_002']})
+        self.assertEqual(self.sim_selector.sims['mdm-2']['download'], 20.0)
+
+
+class TestVirtualClock(unittest.TestCase):
+    """Test cases for the simulated clock used by the test harness."""
+
+    def setUp(self):
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from mock_framework import VirtualClock
+        self.clock = VirtualClock(start=1000.0)
+
+    def test_sleep_advances_instantly(self):
+        """Test that sleep advances simulated time without blocking."""
+        import time
+        real_start = time.perf_counter()
+        with self.clock:
+            time.sleep(3600)
+            self.assertEqual(time.time(), 4600.0)
+        self.assertLess(time.perf_counter() - real_start, 1.0)
+        self.assertEqual(self.clock.elapsed, 3600.0)
+
+    def test_concurrent_sleeps_overlap(self):
+        """Test that threads sleeping at the same time do not add up."""
+        import time
+        import threading
+        with self.clock:
+            threads = [threading.Thread(target=time.sleep, args=(60,)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(time.time(), 1060.0)
+
+    def test_scenario_runs_on_virtual_clock(self):
+        """Test that a full quad SIM scenario takes simulated, not real, time."""
+        import io
+        import time
+        import contextlib
+        from mock_framework import TestHarness, MockScenarios
+        harness = TestHarness(seed=1, quiet=True)
+        real_start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            harness.run_test_scenario('quad', MockScenarios.quad_sim_all_carriers())
+        self.assertLess(time.perf_counter() - real_start, 5.0)
+        self.assertGreater(harness.clock.elapsed, 20.0)
+        self.assertTrue(all(sim.get('download') for sim in harness.simselector.sims.values()))
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
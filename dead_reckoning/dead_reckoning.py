@@ -5,25 +5,36 @@
 # Load the app and configure settings in System > SDK Data
 
 import json
+import queue
 import socket
-import socketserver
+import selectors
+import sys
 import serial
+import threading
 import time
+from functools import reduce
+from operator import xor
 from csclient import EventingCSClient
 from pynmeagps import NMEAReader, NMEAMessage
 
-class handler(socketserver.BaseRequestHandler):
+class handler:
     listen_port = 10000
     servers = [{"hostname": "server.example.com", "port": 5005, "protocol": "tcp"}]
     add_sentences = []
+    add_interval = 1  # Seconds between refreshes of add_sentences from status/gps/nmea
     fix_sentences = ["$GPRMC", "$GPGGA"]
     DR_LAT, DR_LON = None, None
+    DR_TIME, DR_BATCHES = None, 0  # When the DR position arrived, batches received since
+    dr_max_age, dr_max_batches = 12, 3  # Forget the DR position after two 5s GPS reports without one
     debug = False
-    def handle(self):
+    @classmethod
+    def handle(cls, data):
+        """Fix a batch of NMEA lines and send it to the servers.
+
+        The last PCPTMINR position is kept for a few batches since a TCP
+        stream may deliver it in a different read than the GPRMC/GPGGA."""
         try:
-            data = self.request.recv(2048).decode()
             debug_log(f'Received NMEA data:\n{data}')
-            data = data.split('\r\n')
             PCPTMINR = None
             for line in data:
                 if '$PCPTMINR' in line:
@@ -33,10 +44,14 @@ class handler(socketserver.BaseRequestHandler):
                     PCPTMINR = PCPTMINR.split(',')
                     if PCPTMINR[0][0] != '$':
                         PCPTMINR.pop(0)
-                    self.DR_LAT, self.DR_LON = float(PCPTMINR[2]), float(PCPTMINR[3])
-                    debug_log(f'DR: lat: {self.DR_LAT} lon: {self.DR_LON}')
+                    cls.DR_LAT, cls.DR_LON = float(PCPTMINR[2]), float(PCPTMINR[3])
+                    cls.DR_TIME, cls.DR_BATCHES = time.monotonic(), 0
+                    debug_log(f'DR: lat: {cls.DR_LAT} lon: {cls.DR_LON}')
                 except Exception as e:
                     debug_log(f'Exception handling PCPTMINR: {e}')
+            else:
+                cls.DR_BATCHES += 1
+            DR_LAT, DR_LON = cls.dr_position()
             sentences = []
             identifier = ''
             for line in data:
@@ -52,63 +67,202 @@ class handler(socketserver.BaseRequestHandler):
                         msg_identity = line[1]
                         sentence = ','.join(line[1:])
 
-                    if msg_identity in self.fix_sentences:
-                        fixed_sentence = fix_NMEA(sentence, self.DR_LAT, self.DR_LON)
+                    if msg_identity in cls.fix_sentences:
+                        fixed_sentence = fix_NMEA(sentence, DR_LAT, DR_LON)
                         sentences.append(f'{identifier}{fixed_sentence}')
                     else:
                         sentences.append(f'{identifier}{sentence}\r\n')
             # Add Sentences
-            nmea = cp.get('status/gps/nmea')
-            for sentence in nmea:
-                if sentence.split(',')[0] in self.add_sentences:
-                    sentences.append(f'{identifier}{sentence}\r\n')
+            by_identity = sampler.get()
+            for identity in cls.add_sentences:
+                sentences.extend(f'{identifier}{sentence}' for sentence in by_identity.get(identity, ()))
             # Send Sentences to Servers
             send_sentences(sentences)
         except Exception as e:
             cp.logger.exception(f'Exception in handler: {e}')
 
+    @classmethod
+    def dr_position(cls):
+        """Return the last PCPTMINR lat, lon, or None, None if it is too old to use."""
+        if cls.DR_TIME is None or cls.DR_BATCHES > cls.dr_max_batches or \
+                time.monotonic() - cls.DR_TIME > cls.dr_max_age:
+            return None, None
+        return cls.DR_LAT, cls.DR_LON
+
+class IngestServer:
+    """Receives NMEA from UDP datagrams and TCP streams on one selector loop.
+
+    TCP data is split into complete lines, keeping any partial line until
+    the rest arrives.  The lines of each datagram or read are queued as one
+    batch for a worker thread, so a burst from several GPS connections
+    doesn't wait on processing.  If the worker falls behind the oldest
+    batch is dropped."""
+    queue_size = 1000
+    max_line = 4096  # Longest partial line kept for a TCP connection
+
+    def __init__(self, port):
+        self.selector = selectors.DefaultSelector()
+        self.queue = queue.Queue(self.queue_size)
+        self.partial = {}
+        self.dropped = 0
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        tcp.bind(('', port))
+        tcp.listen()
+        tcp.setblocking(False)
+        self.selector.register(tcp, selectors.EVENT_READ, self.accept)
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        udp.bind(('', port))
+        udp.setblocking(False)
+        self.selector.register(udp, selectors.EVENT_READ, self.read_datagram)
+
+    def serve_forever(self):
+        threading.Thread(target=self.process, name='process', daemon=True).start()
+        while True:
+            for key, _ in self.selector.select():
+                key.data(key.fileobj)
+
+    def process(self):
+        while True:
+            handler.handle(self.queue.get())
+
+    def accept(self, sock):
+        try:
+            conn, addr = sock.accept()
+        except OSError:
+            return
+        debug_log(f'TCP connection from {addr}')
+        conn.setblocking(False)
+        self.partial[conn] = b''
+        self.selector.register(conn, selectors.EVENT_READ, self.read_stream)
+
+    def read_stream(self, conn):
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.put([self.partial.pop(conn)])
+            self.selector.unregister(conn)
+            conn.close()
+            return
+        lines = (self.partial[conn] + data).split(b'\n')
+        self.partial[conn] = lines.pop()
+        if len(self.partial[conn]) > self.max_line:
+            debug_log(f'Discarding {len(self.partial[conn])} bytes without a line ending')
+            self.partial[conn] = b''
+        self.put(lines)
+
+    def read_datagram(self, sock):
+        try:
+            data = sock.recv(65535)
+        except (BlockingIOError, InterruptedError):
+            return
+        self.put(data.split(b'\n'))
+
+    def put(self, lines):
+        """Queue the non-empty lines as one batch."""
+        batch = [line.strip().decode(errors='replace') for line in lines if line.strip()]
+        if not batch:
+            return
+        while True:
+            try:
+                self.queue.put_nowait(batch)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    cp.log(f'NMEA processing is falling behind, {self.dropped} batches dropped')
+                except queue.Empty:
+                    pass
+
 def fix_NMEA(data, DR_LAT, DR_LON):
-    msg = NMEAReader.parse(data, validate=0x00)
-    debug_log(f'Before Fix: {msg}')
-    # GPRMC Sentences:
-    if msg.identity == 'GPRMC':
-        status = msg.status
-        posMode = msg.posMode
-        if posMode == 'N' or status == 'V':
-            debug_log(f'FIXING GPRMC SENTENCE!')
-            debug_log(f'DR_LAT: {DR_LAT} DR_LON: {DR_LON}')
-            if posMode == 'N':
-                posMode = 'E'
-            if status == 'V':
-                status = 'A'
-                if DR_LAT and DR_LON:
-                    lat, lon = DR_LAT, DR_LON
-                else:
-                    debug_log('Dead reckoning detected from GPRMC status=V but no PCPTMINR location available!')
-                    lat, lon = None, None
-                message = NMEAMessage(msg.talker, msg.msgID, 0, time=msg.time, status=status, lat=lat, NS=msg.NS,
-                                      lon=lon, EW=msg.EW, spd=msg.spd, cog=msg.cog, date=msg.date, mv=msg.mv,
-                                      mvEW=msg.mvEW, posMode=posMode)
-        else:  # Status is not 'V' so passthrough msg
-            message = msg
-    # GPGGA Sentences:
-    elif msg.identity == 'GPGGA':
-        lat, lon = msg.lat, msg.lon
-        quality = msg.quality
-        if quality == 0:
+    """Return the corrected GPRMC/GPGGA sentence terminated by CRLF.
+
+    Sentences are rewritten in place by splice_NMEA, which only touches the
+    fields that change; anything it can't handle goes through pynmeagps."""
+    fixed = splice_NMEA(data, DR_LAT, DR_LON)
+    if fixed is None:
+        debug_log(f'Parsing unexpected sentence: {data}')
+        fixed = parse_NMEA(data, DR_LAT, DR_LON)
+    return fixed
+
+def splice_NMEA(data, DR_LAT, DR_LON):
+    """Fix a GPRMC/GPGGA sentence by replacing its fields, or return None if it isn't one we know."""
+    body = data.rstrip('\r\n').partition('*')[0]
+    fields = body.split(',')
+    msg_type = fields[0][3:]
+    changed = False
+    if msg_type == 'RMC' and len(fields) >= 12:
+        # time, status, lat, NS, lon, EW, spd, cog, date, mv, mvEW[, posMode[, navStatus]]
+        if len(fields) > 12 and fields[12] == 'N':
+            fields[12] = 'E'
+            changed = True
+        if fields[2] == 'V':
+            fields[2] = 'A'
+            changed = True
+            if DR_LAT and DR_LON:
+                fields[3:7] = format_latlon(DR_LAT, DR_LON)
+            else:
+                debug_log('Dead reckoning detected from GPRMC status=V but no PCPTMINR location available!')
+        if changed:
+            debug_log(f'FIXING GPRMC SENTENCE! DR_LAT: {DR_LAT} DR_LON: {DR_LON}')
+    elif msg_type == 'GGA' and len(fields) >= 15:
+        # time, lat, NS, lon, EW, quality, numSV, HDOP, alt, altUnit, sep, sepUnit, diffAge, diffStation
+        if fields[6] == '0':
             debug_log(f'FIXING GPGGA SENTENCE!')
-            quality = 6
+            fields[6] = '6'
+            changed = True
             if DR_LAT and DR_LON:
-                lat, lon = DR_LAT, DR_LON
+                fields[2:6] = format_latlon(DR_LAT, DR_LON)
             else:
                 debug_log('Dead reckoning detected from GPGGA quality=6 but no PCPTMINR location available!')
-            message = NMEAMessage(msg.talker, msg.msgID, 0, time=msg.time, lat=lat, NS=msg.NS,
-                              lon=lon, EW=msg.EW, quality=quality,  numSV=msg.numSV, HDOP=msg.HDOP,
+    else:
+        return None
+    if len(fields[1]) > 9:  # Trim time to hhmmss.ss
+        fields[1] = fields[1][:9]
+        changed = True
+    if not changed and '*' in data:
+        return f'{data.rstrip()}\r\n'
+    return nmeafixchecksum(','.join(fields))
+
+def format_latlon(lat, lon):
+    """Return [lat, NS, lon, EW] NMEA fields (ddmm.mmmmm) for decimal degrees."""
+    lat_deg, lat_min = divmod(round(abs(lat) * 60, 5), 60)
+    lon_deg, lon_min = divmod(round(abs(lon) * 60, 5), 60)
+    return [f'{int(lat_deg):02d}{lat_min:08.5f}', 'N' if lat >= 0 else 'S',
+            f'{int(lon_deg):03d}{lon_min:08.5f}', 'E' if lon >= 0 else 'W']
+
+def parse_NMEA(data, DR_LAT, DR_LON):
+    """Fix a sentence by parsing and re-serializing it with pynmeagps."""
+    msg = NMEAReader.parse(data, validate=0x00)
+    debug_log(f'Before Fix: {msg}')
+    if DR_LAT and DR_LON:
+        lat, NS, lon, EW = DR_LAT, 'N' if DR_LAT >= 0 else 'S', DR_LON, 'E' if DR_LON >= 0 else 'W'
+    else:
+        lat, NS, lon, EW = msg.lat, msg.NS, msg.lon, msg.EW
+    # GPRMC Sentences:
+    posMode = getattr(msg, 'posMode', '')  # Not sent before NMEA 2.3
+    if msg.identity == 'GPRMC' and (posMode == 'N' or msg.status == 'V'):
+        debug_log(f'FIXING GPRMC SENTENCE!')
+        posMode = 'E' if posMode == 'N' else posMode
+        if msg.status != 'V':
+            lat, NS, lon, EW = msg.lat, msg.NS, msg.lon, msg.EW
+        message = NMEAMessage(msg.talker, msg.msgID, 0, time=msg.time, status='A', lat=lat, NS=NS,
+                              lon=lon, EW=EW, spd=msg.spd, cog=msg.cog, date=msg.date, mv=msg.mv,
+                              mvEW=msg.mvEW, posMode=posMode)
+    # GPGGA Sentences:
+    elif msg.identity == 'GPGGA' and msg.quality == 0:
+        debug_log(f'FIXING GPGGA SENTENCE!')
+        message = NMEAMessage(msg.talker, msg.msgID, 0, time=msg.time, lat=lat, NS=NS,
+                              lon=lon, EW=EW, quality=6, numSV=msg.numSV, HDOP=msg.HDOP,
                               alt=msg.alt, altUnit=msg.altUnit, sep=msg.sep, sepUnit=msg.sepUnit, diffAge=msg.diffAge,
                               diffStation=msg.diffStation)
-        else:  # Quality not 0 so passthrough msg
-            message = msg
-    else:  # Unknown identity - catch all, passthrough
+    else:  # Nothing to fix or unknown identity - passthrough
         message = msg
     debug_log(f'After Fix: {message}')
     return fixtimeprecision(message.serialize().decode())
@@ -119,47 +273,202 @@ def fixtimeprecision(nmea):
     return nmeafixchecksum(','.join([prefix, timestamp[:9], rest]))
 
 def nmeafixchecksum(nmea):
-    nmea = nmea[:-2] + ('%02X' % nmeachecksum(nmea))
-    return nmea
+    """Return $...*XX sentence with its checksum recomputed and a CRLF terminator."""
+    body = nmea.rstrip('\r\n').partition('*')[0]
+    return f'{body}*{nmeachecksum(body):02X}\r\n'
 
 def nmeachecksum(payload):
-    # assert payload[0] == '$' and payload[-3] == '*'
-    cksum = 0
-    for by in payload[1:-3]:  # Ignore leading $ and trailing checksum.
-        cksum = cksum ^ ord(by)
-    return cksum
+    """XOR of the characters between the leading $ and the *."""
+    return reduce(xor, payload[1:].partition('*')[0].encode(), 0)
 
-def send_sentences(sentences):
-    for server in handler.servers:
-        if server["protocol"] == 'tcp':
-            my_server = socket.socket()
+def benchmark(count=20000):
+    """Time splice_NMEA against parse_NMEA and check both agree on the fixed fields."""
+    sentences = {
+        'passthrough': ['$GPRMC,123519.00,A,4807.03800,N,01131.00000,E,22.4,84.4,230394,3.1,W,A*29',
+                        '$GPGGA,123519.00,4807.03800,N,01131.00000,E,1,08,0.9,545.4,M,46.9,M,,*69'],
+        'dead reckoning': ['$GPRMC,123519.000,V,,,,,0.0,0.0,230394,,,N*4F',
+                           '$GPGGA,123519.000,,,,,0,00,99.9,,M,,M,,*62'],
+    }
+    DR_LAT, DR_LON = 43.6150186, -116.2023137
+    for name, batch in sentences.items():
+        for sentence in batch:
+            fast = NMEAReader.parse(splice_NMEA(sentence, DR_LAT, DR_LON))
+            slow = NMEAReader.parse(parse_NMEA(sentence, DR_LAT, DR_LON))
+            for field in ('time', 'status', 'posMode', 'quality', 'lat', 'lon'):
+                assert getattr(fast, field, None) == getattr(slow, field, None), (sentence, field)
+        rates = []
+        for fix in (splice_NMEA, parse_NMEA):
+            start = time.perf_counter()
+            for _ in range(count // len(batch)):
+                for sentence in batch:
+                    fix(sentence, DR_LAT, DR_LON)
+            rates.append(count / (time.perf_counter() - start))
+        print(f'{name}: splice {rates[0]:,.0f} sentences/sec, pynmeagps {rates[1]:,.0f} sentences/sec '
+              f'({rates[0] / rates[1]:.0f}x faster)')
+
+class Sampler(threading.Thread):
+    """Refreshes the add_sentences from status/gps/nmea every add_interval seconds.
+
+    handle() looks up the precomputed sentences from get() by identity instead
+    of reading the status tree for every batch.  stats() reports how old they
+    are and is logged every stats_interval seconds."""
+    stats_interval = 300
+
+    def __init__(self):
+        super().__init__(name='sampler', daemon=True)
+        self.by_identity = {}
+        self.updated = None
+        self.refreshes = 0
+        self.failures = 0
+        self.stale = 0  # Batches given sentences older than two refresh intervals
+
+    def run(self):
+        logged = time.monotonic()
+        while True:
+            self.refresh()
+            if time.monotonic() - logged >= self.stats_interval:
+                cp.log(f'Supplementary sentences: {self.stats()}')
+                logged = time.monotonic()
+            time.sleep(handler.add_interval)
+
+    def refresh(self):
+        try:
+            nmea = cp.get('status/gps/nmea') or []
+        except Exception as e:
+            self.failures += 1
+            debug_log(f'Failed to read status/gps/nmea: {e}')
+            return
+        by_identity = {}
+        for sentence in nmea:
+            identity = sentence.split(',', 1)[0]
+            if identity in handler.add_sentences:
+                by_identity.setdefault(identity, []).append(f'{sentence}\r\n')
+        self.by_identity = by_identity
+        self.updated = time.monotonic()
+        self.refreshes += 1
+
+    def get(self):
+        """Return the latest add_sentences as {identity: [sentence, ...]}, CRLF terminated."""
+        if self.updated is not None and time.monotonic() - self.updated > 2 * handler.add_interval:
+            self.stale += 1
+            debug_log(f'Supplementary sentences are stale: {self.stats()}')
+        return self.by_identity
+
+    def stats(self):
+        """Return age in seconds of the add_sentences and refresh counters."""
+        age = None if self.updated is None else round(time.monotonic() - self.updated, 1)
+        return {"age": age, "refreshes": self.refreshes, "failures": self.failures, "stale": self.stale}
+
+sampler = Sampler()
+
+class Sender(threading.Thread):
+    """Sends NMEA batches to one server over a persistent connection.
+
+    Each server has its own thread and queue so a slow or unreachable server
+    can't hold up the others.  If the queue fills up the oldest batch is
+    dropped, since stale positions are of no use to a real time feed.
+    While reconnect backoff is in effect batches are discarded."""
+    queue_size = 10
+    min_backoff, max_backoff = 1, 60
+    max_datagram = 1400  # Keep UDP datagrams below a typical MTU
+
+    def __init__(self, server):
+        super().__init__(name=f'{server["protocol"]}:{server.get("hostname")}:{server.get("port")}', daemon=True)
+        self.server = server
+        self.queue = queue.Queue(self.queue_size)
+        self.conn = None
+        self.backoff = self.min_backoff
+        self.retry_at = 0
+
+    def send(self, sentences):
+        """Queue a batch of sentences without blocking."""
+        while True:
             try:
-                my_server.connect((server["hostname"], server["port"]))
-                for sentence in sentences:
-                    my_server.sendall(sentence.encode())
-                    debug_log(f'Sent TCP to {server["hostname"]}:{server["port"]} - {sentence}')
-                    time.sleep(0.05)
-            except Exception as e:
-                cp.logger.exception(f'Failed to send to server {server["hostname"]} {server["port"]} - {e}')
-        elif server["protocol"] == 'udp':
-            my_server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.queue.put_nowait(sentences)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    debug_log(f'{self.name} is falling behind, dropped oldest batch')
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        while True:
+            sentences = self.queue.get()
+            if time.monotonic() < self.retry_at:
+                continue
             try:
-                my_server.connect((server["hostname"], server["port"]))
-                for sentence in sentences:
-                    my_server.send(sentence.encode())
-                    debug_log(f'Sent UDP to {server["hostname"]}:{server["port"]} - {sentence}')
-                    time.sleep(0.05)
+                self.deliver(''.join(sentences).encode())
+                self.backoff = self.min_backoff
+                debug_log(f'Sent to {self.name} - {sentences}')
             except Exception as e:
-                cp.logger.exception(f'Failed to send to server {server["hostname"]} {server["port"]} - {e}')
-        elif server["protocol"] == 'serial':
+                cp.log(f'Failed to send to {self.name} - {e}. Retrying in {self.backoff}s')
+                self.close()
+                self.retry_at = time.monotonic() + self.backoff
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def deliver(self, data):
+        """Write data, reconnecting once if an existing connection has gone stale."""
+        if self.conn is not None:
             try:
-                with serial.Serial('/dev/ttyS1', 9600, timeout=1) as ser:
-                    cp.log("Open /dev/ttyS1: %s" % ser)
-                    for sentence in sentences:
-                        ser.write(sentence.encode())
-                    time.sleep(0.1)
-            except Exception as e:
-                cp.logger.exception(f'Failed to send to serial: {e}')
+                self.write(data)
+                return
+            except (OSError, serial.SerialException):
+                self.close()
+        self.conn = self.connect()
+        self.write(data)
+
+    def connect(self):
+        protocol = self.server["protocol"]
+        if protocol == 'tcp':
+            conn = socket.create_connection((self.server["hostname"], self.server["port"]), timeout=10)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        elif protocol == 'udp':
+            conn = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            conn.connect((self.server["hostname"], self.server["port"]))
+        elif protocol == 'serial':
+            conn = serial.Serial('/dev/ttyS1', 9600, timeout=1, write_timeout=5)
+        else:
+            raise ValueError(f'Unknown protocol {protocol}')
+        cp.log(f'Connected to {self.name}')
+        return conn
+
+    def write(self, data):
+        if self.server["protocol"] == 'tcp':
+            self.conn.sendall(data)
+        elif self.server["protocol"] == 'udp':
+            # One datagram per batch, split at sentence boundaries if it would be too large
+            datagram = b''
+            for line in data.splitlines(keepends=True):
+                if datagram and len(datagram) + len(line) > self.max_datagram:
+                    self.conn.send(datagram)
+                    datagram = b''
+                datagram += line
+            if datagram:
+                self.conn.send(datagram)
+        else:
+            self.conn.write(data)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+senders = []
+
+def start_senders():
+    for server in handler.servers:
+        sender = Sender(server)
+        sender.start()
+        senders.append(sender)
+
+def send_sentences(sentences):
+    for sender in senders:
+        sender.send(sentences)
 
 def get_appdata(name):
     try:
@@ -175,12 +484,14 @@ def get_config(name):
         handler.servers = config["servers"]
         handler.add_sentences = config["add_sentences"]
         handler.debug = config["debug"]
+        handler.add_interval = config.get("add_interval", handler.add_interval)
         cp.log(f'Loaded config: {config}')
     else:
         config = {
             "listen_port": handler.listen_port,
             "servers": handler.servers,
             "add_sentences": handler.add_sentences,
+            "add_interval": handler.add_interval,
             "debug": handler.debug
         }
         cp.post('config/system/sdk/appdata', {"name": name, "value": json.dumps(config)})
@@ -245,14 +556,16 @@ def debug_log(msg):
     if handler.debug:
         cp.log(msg)
 
-if __name__ == '__main__':
+if __name__ == '__main__' and sys.argv[1:] == ['bench']:
+    benchmark()
+elif __name__ == '__main__':
     cp = EventingCSClient('dead_reckoning')
     cp.log(f'Starting...')
     enable_GPS_send_to_server()
     get_config('dead_reckoning')
-    cp.log(f'Binding to port {handler.listen_port}')
-    server = socketserver.TCPServer(('', handler.listen_port), handler, bind_and_activate=False)
-    server.allow_reuse_address = True
-    server.server_bind()
-    server.server_activate()
+    start_senders()
+    if handler.add_sentences:
+        sampler.start()
+    cp.log(f'Binding to TCP and UDP port {handler.listen_port}')
+    server = IngestServer(handler.listen_port)
     server.serve_forever()
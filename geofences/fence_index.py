@@ -0,0 +1,230 @@
+"""Spatial index for large geofence sets.
+
+Fences are circles (CircleFence) or polygons (PolygonFence).  Each fence
+is reduced to a lat/lon bounding box that is guaranteed to contain it, and
+registered in every cell of a uniform lat/lon grid its box overlaps.  A
+lookup only visits the fences registered in the point's cell, rejects those
+whose box does not contain the point, and runs the exact test on the rest:
+geopy.distance.within (flat-earth with geodesic fallback) for circles, a
+crossing number test in a local planar frame for polygons.  Fences are
+checked in config order, so the first matching fence wins just like a
+linear scan.
+
+Benchmark with 10,000 fences:
+    python fence_index.py 10000
+"""
+
+from geopy import distance
+import heapq
+import math
+
+METERS_PER_DEG_LAT = 110574.0  # Shortest degree of latitude (at the equator) on WGS84
+METERS_PER_DEG_LON = 111319.0  # Degree of longitude at the equator on WGS84
+SLACK = 1.001  # Widen boxes slightly so rounding never excludes a fence
+EARTH_RADIUS = 6371008.8  # Mean earth radius in meters
+EDGES_PER_BAND = 8
+
+
+class CircleFence:
+    """Circular geofence of radius meters around lat, lon."""
+
+    def __init__(self, name, lat, lon, radius):
+        self.name = name
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.radius = float(radius)
+        dlat = self.radius / METERS_PER_DEG_LAT * SLACK
+        self.min_lat = max(-90.0, self.lat - dlat)
+        self.max_lat = min(90.0, self.lat + dlat)
+        widest = math.radians(max(abs(self.min_lat), abs(self.max_lat)))
+        if math.cos(widest) * METERS_PER_DEG_LON * 180 <= self.radius * SLACK:
+            self.lon_ranges = [(-180.0, 180.0)]  # Reaches a pole
+        else:
+            self.lon_ranges = lon_ranges(self.lon, self.radius / (METERS_PER_DEG_LON * math.cos(widest)) * SLACK)
+
+    def in_bbox(self, lat, lon):
+        return self.min_lat <= lat <= self.max_lat and any(lo <= lon <= hi for lo, hi in self.lon_ranges)
+
+    def contains(self, lat, lon):
+        return distance.within((lat, lon), (self.lat, self.lon), self.radius)[0]
+
+
+class PolygonFence:
+    """Polygon geofence with vertices [[lat, lon], ...].
+
+    Vertices are projected once to a local equirectangular frame (meters
+    around the polygon center) and the edges are bucketed into horizontal
+    bands, so a point is only tested against the edges of its band."""
+
+    def __init__(self, name, points):
+        self.name = name
+        if len(points) < 3:
+            raise ValueError('polygon needs at least 3 points')
+        lats = [float(lat) for lat, _ in points]
+        lons = [float(points[0][1])]
+        for _, lon in points[1:]:
+            lons.append(lons[0] + wrap(float(lon) - lons[0]))  # Unwrap across the antimeridian
+        self.min_lat, self.max_lat = min(lats), max(lats)
+        self.lat0 = (self.min_lat + self.max_lat) / 2
+        self.lon0 = (min(lons) + max(lons)) / 2
+        self.lon_ranges = lon_ranges(wrap(self.lon0), (max(lons) - min(lons)) / 2)
+        self.kx = math.radians(1) * EARTH_RADIUS * math.cos(math.radians(self.lat0))
+        self.ky = math.radians(1) * EARTH_RADIUS
+        xs = [(lon - self.lon0) * self.kx for lon in lons]
+        ys = [(lat - self.lat0) * self.ky for lat in lats]
+
+        # Edge arrays: start y, end y, start x, dx/dy (horizontal edges never cross a ray)
+        edges = []
+        for i in range(len(xs)):
+            x1, y1, x2, y2 = xs[i - 1], ys[i - 1], xs[i], ys[i]
+            if y1 != y2:
+                edges.append((y1, y2, x1, (x2 - x1) / (y2 - y1)))
+        self.min_y, self.max_y = min(ys), max(ys)
+        count = max(1, min(256, len(edges) // EDGES_PER_BAND))
+        self.band_height = (self.max_y - self.min_y) / count or 1.0
+        self.bands = [[] for _ in range(count)]
+        for edge in edges:
+            low, high = sorted(edge[:2])
+            for band in range(self._band(low), self._band(high) + 1):
+                self.bands[band].append(edge)
+
+    def _band(self, y):
+        return min(len(self.bands) - 1, max(0, int((y - self.min_y) / self.band_height)))
+
+    def in_bbox(self, lat, lon):
+        return self.min_lat <= lat <= self.max_lat and any(lo <= lon <= hi for lo, hi in self.lon_ranges)
+
+    def contains(self, lat, lon):
+        """Crossing number test of a ray from lat, lon towards +x"""
+        x = wrap(lon - self.lon0) * self.kx
+        y = (lat - self.lat0) * self.ky
+        if not self.min_y <= y <= self.max_y:
+            return False
+        inside = False
+        for y1, y2, x1, slope in self.bands[self._band(y)]:
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * slope:
+                inside = not inside
+        return inside
+
+
+def fence_from_config(geofence):
+    """Return CircleFence or PolygonFence for a geofence config dict"""
+    if "polygon" in geofence:
+        return PolygonFence(geofence["name"], geofence["polygon"])
+    return CircleFence(geofence["name"], geofence["lat"], geofence["lon"], geofence["radius"])
+
+
+def wrap(lon):
+    """Return lon normalized to [-180, 180)"""
+    return (lon + 180) % 360 - 180
+
+
+def lon_ranges(lon, dlon):
+    """Return [(min_lon, max_lon)] of lon +/- dlon, split in two where it crosses the antimeridian"""
+    if dlon >= 180:
+        return [(-180.0, 180.0)]
+    lo, hi = lon - dlon, lon + dlon
+    if lo < -180:
+        return [(lo + 360, 180.0), (-180.0, hi)]
+    if hi > 180:
+        return [(lo, 180.0), (-180.0, hi - 360)]
+    return [(lo, hi)]
+
+
+class FenceIndex:
+    """Uniform lat/lon grid over fence bounding boxes.
+
+    Fences covering more than max_cells cells are kept in a short list that
+    is checked for every point instead."""
+
+    def __init__(self, fences, cell_size=0.05, max_cells=4096):
+        self.fences = list(fences)
+        self.cell_size = cell_size
+        self.cells = {}
+        self.wide = []
+        for order, fence in enumerate(self.fences):
+            keys = self._keys(fence, max_cells)
+            if keys is None:
+                self.wide.append(order)
+                continue
+            for key in keys:
+                self.cells.setdefault(key, []).append(order)
+
+    def __len__(self):
+        return len(self.fences)
+
+    def candidates(self, lat, lon):
+        """Return fences whose bounding box may contain lat, lon, in config order"""
+        orders = self.cells.get(self._key(lat, lon), [])
+        if self.wide:
+            orders = heapq.merge(orders, self.wide)
+        return [self.fences[order] for order in orders]
+
+    def find(self, lat, lon):
+        """Return the first fence containing lat, lon, or None"""
+        for fence in self.candidates(lat, lon):
+            if fence.in_bbox(lat, lon) and fence.contains(lat, lon):
+                return fence
+        return None
+
+    def _key(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _keys(self, fence, max_cells):
+        """Return grid keys overlapped by fence's bounding box, or None if there are more than max_cells"""
+        rows = range(math.floor(fence.min_lat / self.cell_size), math.floor(fence.max_lat / self.cell_size) + 1)
+        cols = []
+        for lo, hi in fence.lon_ranges:
+            cols.extend(range(math.floor(lo / self.cell_size), math.floor(hi / self.cell_size) + 1))
+        if len(rows) * len(cols) > max_cells:
+            return None
+        return [(row, col) for row in rows for col in cols]
+
+
+def benchmark(count=10000, points=2000, seed=0):
+    """Compare indexed lookups against a linear scan over count random fences (one in ten a polygon)"""
+    import random
+    import time
+    rng = random.Random(seed)
+    fences, centers = [], []
+    for i in range(count):
+        lat, lon, radius = rng.uniform(25, 49), rng.uniform(-124, -67), rng.uniform(100, 2000)
+        centers.append((lat, lon, radius))
+        if i % 10:
+            fences.append(CircleFence(f'fence {i}', lat, lon, radius))
+        else:
+            corners = [distance.distance(meters=radius).destination((lat, lon), bearing)
+                       for bearing in range(0, 360, 30)]
+            fences.append(PolygonFence(f'fence {i}', [[p.latitude, p.longitude] for p in corners]))
+    queries = []
+    for _ in range(points):
+        if rng.random() < 0.5:  # Near a fence, inside or just outside
+            lat, lon, radius = rng.choice(centers)
+            bearing, meters = rng.uniform(0, 360), rng.uniform(0, radius * 1.2)
+            point = distance.distance(meters=meters).destination((lat, lon), bearing)
+            queries.append((point.latitude, point.longitude))
+        else:
+            queries.append((rng.uniform(25, 49), rng.uniform(-124, -67)))
+
+    start = time.perf_counter()
+    index = FenceIndex(fences)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    found = [index.find(lat, lon) for lat, lon in queries]
+    indexed = (time.perf_counter() - start) / len(queries)
+
+    sample = queries[:5]
+    start = time.perf_counter()
+    expected = [next((f for f in fences if f.contains(lat, lon)), None) for lat, lon in sample]
+    linear = (time.perf_counter() - start) / len(sample)
+    assert found[:len(sample)] == expected, 'Indexed lookup disagrees with linear scan'
+
+    print(f'{count} fences, index built in {build * 1000:.0f}ms, {sum(f is not None for f in found)} of '
+          f'{len(queries)} points inside a fence')
+    print(f'indexed: {indexed * 1e6:.0f}us per fix, linear scan: {linear * 1e6:.0f}us per fix '
+          f'({linear / indexed:.0f}x faster)')
+
+
+if __name__ == '__main__':
+    import sys
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
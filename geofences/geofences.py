@@ -2,8 +2,10 @@
 # Take custom action when inside or outside a geofence
 # Requires 3 consecutive readings (3 seconds) before switching to prevent rapid changes
 # Example uses SIM1 when outside geofence, SIM2 when inside geofence
+# Geofences are reloaded only when the geofences appdata changes
 
-from geopy import distance
+from fence_index import FenceIndex, fence_from_config
+from threading import Lock
 import time
 import json
 from cpsdk import CPSDK
@@ -51,21 +53,47 @@ def dec(deg, min, sec):
         dec = deg + (min / 60) + (sec / 3600)
     return round(dec, 5)
 
-def inside_geofence(lat, lon, geofences_list):
+def inside_geofence(lat, lon, index):
     """Check if location is inside any of the geofences"""
-    for geofence in geofences_list:
-        dist = distance.distance((lat, lon), (geofence["lat"], geofence["lon"])).m
-        if dist < geofence["radius"]:
-            return True, geofence["name"]
+    geofence = index.find(lat, lon)
+    if geofence:
+        return True, geofence.name
     return False, None
 
+def build_index(geofences_list):
+    """Return FenceIndex of geofences, skipping invalid entries"""
+    fences = []
+    for geofence in geofences_list:
+        try:
+            fences.append(fence_from_config(geofence))
+        except (KeyError, TypeError, ValueError) as e:
+            cp.log(f'Invalid geofence {geofence}: {e}')
+    return FenceIndex(fences)
+
 def get_geofences():
+    """Return geofences appdata JSON, creating the default config if missing"""
     geofences = cp.get_appdata('geofences')
     if geofences is None:
-        geofences = default_geofences
-        cp.post_appdata('geofences', json.dumps(geofences))
+        geofences = json.dumps(default_geofences)
+        cp.post_appdata('geofences', geofences)
         cp.log(f'Created default config: {geofences}')
-    return json.loads(geofences)
+    return geofences
+
+def load_geofences(*args):
+    """Rebuild the geofence index if the geofences JSON changed and swap it in"""
+    global geofences_json, index
+    with load_lock:
+        latest = get_geofences()
+        if latest == geofences_json:
+            return
+        geofences_json = latest
+        try:
+            geofences = json.loads(latest)
+        except ValueError as e:
+            cp.log(f'Invalid geofences config, keeping {len(index)} geofences: {e}')
+            return
+        index = build_index(geofences)
+        cp.log(f'Loaded {len(index)} geofences')
 
 cp.log('Starting...')
 # Initialize with a default state based on first reading
@@ -73,12 +101,19 @@ in_geofence = None
 consecutive_readings = 0
 last_state = None
 current_geofence = None
+geofences_json = None
+index = FenceIndex([])
+load_lock = Lock()
+
+# Load geofences now and again whenever appdata changes
+for action in ('put', 'post', 'delete'):
+    cp.on(action, '/config/system/sdk/appdata', load_geofences)
+load_geofences()
 
 # Get initial location and set default state
 lat, lon, accuracy = get_location()
-geofences = get_geofences()
 if lat and lon:
-    initial_state, geofence_name = inside_geofence(lat, lon, geofences)
+    initial_state, geofence_name = inside_geofence(lat, lon, index)
     last_state = initial_state
     in_geofence = initial_state
     current_geofence = geofence_name
@@ -91,10 +126,9 @@ if lat and lon:
         cp.put('config/wan/dual_sim_disable_mask', 'int1,1')
 
 while True:
-    geofences = get_geofences()    
     lat, lon, accuracy = get_location()
     if lat and lon:
-        current_state, geofence_name = inside_geofence(lat, lon, geofences)
+        current_state, geofence_name = inside_geofence(lat, lon, index)
         
         if current_state == last_state and geofence_name == current_geofence:
             consecutive_readings += 1
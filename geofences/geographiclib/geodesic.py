@@ -9,6 +9,9 @@ inverse geodesic problems are solved by
     geodesic problem
   * :meth:`~geographiclib.geodesic.Geodesic.ArcDirect` Solve the direct
     geodesic problem in terms of spherical arc length
+  * :meth:`~geographiclib.geodesic.Geodesic.InverseMany` and
+    :meth:`~geographiclib.geodesic.Geodesic.DirectMany` Solve batches of
+    inverse or direct geodesic problems
 
 :class:`~geographiclib.geodesicline.GeodesicLine` objects can be created
 with
@@ -1134,6 +1137,127 @@ class Geodesic:
     if outmask & Geodesic.AREA: result['S12'] = S12
     return result
 
+  @staticmethod
+  def _Batch(*args):
+    """Private: broadcast scalar and sequence arguments to equal length lists
+
+    Returns the lists and a function converting a list of results back to
+    the type and shape of the input (a NumPy array if any argument was
+    one, else a list).
+
+    """
+    if any(hasattr(x, '__array__') and not isinstance(x, (int, float))
+           for x in args):
+      import numpy
+      arrays = numpy.broadcast_arrays(*[numpy.asarray(x, dtype = float)
+                                        for x in args])
+      shape = arrays[0].shape
+      return ([a.ravel().tolist() for a in arrays],
+              lambda values: numpy.array(values, dtype = float).reshape(shape))
+    lists = [x if isinstance(x, list) else
+             None if isinstance(x, (int, float)) else list(x) for x in args]
+    sizes = set(len(x) for x in lists if x is not None)
+    if len(sizes) > 1:
+      raise ValueError("sequences have different lengths {}".format(
+        sorted(sizes)))
+    n = sizes.pop() if sizes else 1
+    return ([[x] * n if l is None else l for x, l in zip(args, lists)],
+            lambda values: values)
+
+  def InverseMany(self, lat1s, lon1s, lat2s, lon2s,
+                  outmask = GeodesicCapability.STANDARD):
+    """Solve many inverse geodesic problems
+
+    :param lat1s: latitudes of the first points in degrees
+    :param lon1s: longitudes of the first points in degrees
+    :param lat2s: latitudes of the second points in degrees
+    :param lon2s: longitudes of the second points in degrees
+    :param outmask: the :ref:`output mask <outmask>`
+    :return: a :ref:`dict` of the same keys as
+      :meth:`~geographiclib.geodesic.Geodesic.Inverse`, each a list of
+      values (a NumPy array if any input is an array)
+
+    Each argument is a sequence, a NumPy array or a scalar applying to
+    every problem.  Every problem is solved by
+    :meth:`~geographiclib.geodesic.Geodesic.Inverse`, so the results are
+    identical to the scalar ones; repeated point pairs (e.g. a stationary
+    vehicle logging the same fix) are only solved once.  That is the only
+    saving: a batch of distinct pairs takes as long as calling
+    :meth:`~geographiclib.geodesic.Geodesic.Inverse` in a loop.
+
+    """
+
+    (lat1s, lon1s, lat2s, lon2s), wrap = Geodesic._Batch(
+      lat1s, lon1s, lat2s, lon2s)
+    inverse = self.Inverse
+    solved = {}
+    rows = []
+    for args in zip(lat1s, lon1s, lat2s, lon2s):
+      key = Geodesic._Key(args)
+      result = solved.get(key)
+      if result is None:
+        result = solved[key] = inverse(*args, outmask)
+      rows.append(result)
+    return Geodesic._Columns(rows, wrap, lambda: inverse(0, 0, 0, 0, outmask))
+
+  def DirectMany(self, lat1s, lon1s, azi1s, s12s,
+                 outmask = GeodesicCapability.STANDARD):
+    """Solve many direct geodesic problems
+
+    :param lat1s: latitudes of the first points in degrees
+    :param lon1s: longitudes of the first points in degrees
+    :param azi1s: azimuths at the first points in degrees
+    :param s12s: distances from the first points to the second in meters
+    :param outmask: the :ref:`output mask <outmask>`
+    :return: a :ref:`dict` of the same keys as
+      :meth:`~geographiclib.geodesic.Geodesic.Direct`, each a list of
+      values (a NumPy array if any input is an array)
+
+    Each argument is a sequence, a NumPy array or a scalar applying to
+    every problem.  Problems sharing a starting point and azimuth share
+    one :class:`~geographiclib.geodesicline.GeodesicLine`, constructed as
+    :meth:`~geographiclib.geodesic.Geodesic.Direct` does, so the results
+    are identical to the scalar ones.  That is the only saving: problems
+    with distinct starting points and azimuths take as long as calling
+    :meth:`~geographiclib.geodesic.Geodesic.Direct` in a loop.
+
+    """
+
+    from geographiclib.geodesicline import GeodesicLine
+    (lat1s, lon1s, azi1s, s12s), wrap = Geodesic._Batch(
+      lat1s, lon1s, azi1s, s12s)
+    caps = outmask | Geodesic.DISTANCE_IN
+    lines = {}
+    rows = []
+    for lat1, lon1, azi1, s12 in zip(lat1s, lon1s, azi1s, s12s):
+      key = Geodesic._Key((lat1, lon1, azi1))
+      line = lines.get(key)
+      if line is None:
+        line = lines[key] = GeodesicLine(self, lat1, lon1, azi1, caps)
+      rows.append(line.Position(s12, caps))
+    return Geodesic._Columns(
+      rows, wrap, lambda: GeodesicLine(self, 0, 0, 0, caps).Position(0, caps))
+
+  @staticmethod
+  def _Key(args):
+    """Private: dedup key of a problem, distinguishing 0.0 from -0.0
+
+    The sign of a zero argument can change the result (e.g. azi1 of
+    Inverse(0, 0, 0, -0.0) is -180), but 0.0 == -0.0 as a dict key.
+
+    """
+    return tuple((x, math.copysign(1, x)) for x in args)
+
+  @staticmethod
+  def _Columns(rows, wrap, template):
+    """Private: convert a list of result dicts to a dict of columns
+
+    template() returns a result with the keys to use when rows is empty.
+
+    """
+    keys = rows[0] if rows else template()
+    return {key: wrap([row[key] for row in rows]) for key in keys}
+
   def Line(self, lat1, lon1, azi1,
            caps = GeodesicCapability.STANDARD |
            GeodesicCapability.DISTANCE_IN):
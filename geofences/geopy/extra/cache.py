@@ -0,0 +1,292 @@
+""":class:`.CachingGeocoder` wraps a geocoder with a two tier cache so
+repeated lookups of the same address or nearby points never hit the
+network twice.
+
+Results are kept in an in-memory LRU and, when a ``path`` is given, in a
+SQLite database that survives restarts. Forward queries are keyed by the
+normalized query string (case folded, whitespace collapsed) and reverse
+queries by the coordinates rounded to ``precision`` decimal places, so
+fixes a few meters apart share one entry (5 places is about 1 m).
+Extra keyword arguments such as ``language`` are part of the key.
+
+Identical queries made concurrently from several threads result in a
+single request; the other callers wait for its result. Misses go through
+a :class:`geopy.extra.rate_limiter.RateLimiter`, and the batch methods
+answer every cached query first so the provider's delay is only paid for
+the misses::
+
+    from geopy.extra.cache import CachingGeocoder
+    from geopy.geocoders import Nominatim
+
+    geolocator = Nominatim(user_agent="specify_your_app_name_here")
+    cached = CachingGeocoder(geolocator, path="/data/geocode.sqlite",
+                             min_delay_seconds=1)
+    addresses = cached.reverse_many([(43.6, -116.2), (43.61, -116.21)])
+
+Empty results (``None``) are cached too. Errors are not: an exception
+from the geocoder is raised to every caller waiting on that query.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+
+from geopy.extra.rate_limiter import RateLimiter
+from geopy.location import Location
+from geopy.point import Point
+from geopy.util import logger
+
+__all__ = ("CachingGeocoder",)
+
+
+class _Call:
+    """A request in flight that other callers of the same query wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _dump(result):
+    if result is None:
+        return None
+    if isinstance(result, Location):
+        return {"address": result.address, "point": list(result.point),
+                "raw": result.raw}
+    return [_dump(location) for location in result]
+
+
+def _load(data):
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        return Location(data["address"], data["point"], data["raw"])
+    return [_load(location) for location in data]
+
+
+class CachingGeocoder:
+    """Memory and SQLite cache in front of a geocoder's
+    ``geocode`` and ``reverse`` methods.
+
+    Thread-safe. Only synchronous geocoders are supported.
+    """
+
+    def __init__(
+        self,
+        geocoder,
+        *,
+        path=None,
+        maxsize=1024,
+        precision=5,
+        ttl=None,
+        min_delay_seconds=0.0,
+        max_retries=2,
+        error_wait_seconds=5.0
+    ):
+        """
+        :param geocoder:
+            A geocoder instance, e.g. :class:`geopy.geocoders.Nominatim`.
+
+        :param str path:
+            SQLite database file for the on-disk tier. ``None`` keeps
+            results in memory only.
+
+        :param int maxsize:
+            Number of results kept in the in-memory LRU tier.
+
+        :param int precision:
+            Decimal places reverse query coordinates are rounded to.
+
+        :param float ttl:
+            Seconds a result stays valid, ``None`` for no expiry.
+
+        :param float min_delay_seconds:
+            Minimum delay between requests to the geocoder. See
+            :class:`geopy.extra.rate_limiter.RateLimiter`.
+
+        :param int max_retries:
+            Retries of a request failing with
+            :class:`geopy.exc.GeocoderServiceError`.
+
+        :param float error_wait_seconds:
+            Time to wait between retries.
+        """
+        self.geocoder = geocoder
+        self.path = path
+        self.maxsize = maxsize
+        self.precision = precision
+        self.ttl = ttl
+        self._limiter = RateLimiter(
+            self._call,
+            min_delay_seconds=min_delay_seconds,
+            max_retries=max_retries,
+            error_wait_seconds=max(error_wait_seconds, min_delay_seconds),
+            swallow_exceptions=False,
+        )
+
+        # State:
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode "
+                "(key TEXT PRIMARY KEY, result TEXT, created REAL)"
+            )
+            self._db.commit()
+
+    def geocode(self, query, **kwargs):
+        """Cached ``geocoder.geocode(query, **kwargs)``."""
+        key = self.geocode_key(query, kwargs)
+        return self._get(key, "geocode", query, kwargs)
+
+    def reverse(self, query, **kwargs):
+        """Cached ``geocoder.reverse(query, **kwargs)``."""
+        key = self.reverse_key(query, kwargs)
+        return self._get(key, "reverse", query, kwargs)
+
+    def geocode_many(self, queries, **kwargs):
+        """Return ``geocode`` results for queries, in order."""
+        return self._many("geocode", self.geocode_key, queries, kwargs)
+
+    def reverse_many(self, queries, **kwargs):
+        """Return ``reverse`` results for queries, in order."""
+        return self._many("reverse", self.reverse_key, queries, kwargs)
+
+    def geocode_key(self, query, kwargs=None):
+        """Cache key of a forward query."""
+        if isinstance(query, dict):
+            query = {k: " ".join(str(v).split()).casefold()
+                     for k, v in query.items()}
+        else:
+            query = " ".join(str(query).split()).casefold()
+        return self._key("geocode", query, kwargs)
+
+    def reverse_key(self, query, kwargs=None):
+        """Cache key of a reverse query."""
+        point = Point(query)
+        # Adding 0.0 turns -0.0 into 0.0 so both round to the same key
+        lat = round(point.latitude, self.precision) + 0.0
+        lon = round(point.longitude, self.precision) + 0.0
+        return self._key("reverse", [lat, lon], kwargs)
+
+    def clear(self):
+        """Forget all cached results, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM geocode")
+                self._db.commit()
+
+    def close(self):
+        """Close the on-disk tier."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _key(self, method, query, kwargs):
+        return json.dumps([method, query, kwargs or {}], sort_keys=True,
+                          default=str)
+
+    def _many(self, method, key_func, queries, kwargs):
+        keys = [key_func(query, kwargs) for query in queries]
+        results = {}
+        misses = OrderedDict()
+        for key, query in zip(keys, queries):
+            if key in results or key in misses:
+                continue
+            found, result = self._lookup(key)
+            if found:
+                results[key] = result
+            else:
+                misses[key] = query
+        if misses:
+            logger.debug(
+                "%s: %d of %d queries not cached",
+                type(self).__name__, len(misses), len(queries)
+            )
+        for key, query in misses.items():
+            results[key] = self._get(key, method, query, kwargs)
+        return [results[key] for key in keys]
+
+    def _get(self, key, method, query, kwargs):
+        found, result = self._lookup(key)
+        if found:
+            return result
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            # Another thread may have stored it since our lookup
+            found, call.result = self._lookup(key)
+            if not found:
+                call.result = self._limiter(method, query, kwargs)
+                self._store(key, call.result)
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _call(self, method, query, kwargs):
+        return getattr(self.geocoder, method)(query, **kwargs)
+
+    def _lookup(self, key):
+        """Return (found, result) from memory, then disk."""
+        now = time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self.ttl is None or now - entry[1] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    return True, entry[0]
+                del self._memory[key]
+        with self._db_lock:
+            if self._db is None:
+                return False, None
+            row = self._db.execute(
+                "SELECT result, created FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+            return False, None
+        result = _load(json.loads(row[0]))
+        self._remember(key, result, row[1])
+        return True, result
+
+    def _store(self, key, result):
+        created = time()
+        self._remember(key, result, created)
+        data = json.dumps(_dump(result), default=str)
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?)",
+                (key, data, created)
+            )
+            self._db.commit()
+
+    def _remember(self, key, result, created):
+        with self._lock:
+            self._memory[key] = (result, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
@@ -0,0 +1,13 @@
+"""
+
+test_cache: test geopy.extra.cache.CachingGeocoder
+test_fast_distance: test geopy.distance.flat_earth, chord and within
+
+Run these tests with one of
+
+    python3 -m unittest -v geopy.test.test_cache
+    python3 -m unittest -v geopy.test.test_fast_distance
+
+executed in this directory's parent directory.
+
+"""
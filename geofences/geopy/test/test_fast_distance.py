@@ -0,0 +1,106 @@
+"""Accuracy tests of geopy.distance.flat_earth/within against GeographicLib
+
+Run with
+
+    python3 -m unittest -v geopy.test.test_fast_distance
+
+executed in the geofences directory.  Pass "bench" to time within() against
+the geodesic instead:
+
+    python3 -m geopy.test.test_fast_distance bench
+
+"""
+
+import unittest
+import random
+
+from geographiclib.geodesic import Geodesic
+from geopy import distance
+
+def random_pairs(count, seed, max_lat = 89.5, max_log_dist = 6):
+  """Yield (lat1, lon1, lat2, lon2, s12) with s12 from 1 m to 10**max_log_dist m"""
+  rng = random.Random(seed)
+  while count:
+    lat1, lon1 = rng.uniform(-max_lat, max_lat), rng.uniform(-180, 180)
+    s12 = 10 ** rng.uniform(0, max_log_dist)
+    r = Geodesic.WGS84.Direct(lat1, lon1, rng.uniform(-180, 180), s12)
+    if abs(r['lat2']) > max_lat:
+      continue
+    count -= 1
+    yield lat1, lon1, r['lat2'], r['lon2'], s12
+
+class FastDistanceTest(unittest.TestCase):
+  """flat_earth/within test suite"""
+
+  def test_error_bound(self):
+    """The geodesic distance is within the reported error of flat_earth"""
+    bounded = 0
+    for lat1, lon1, lat2, lon2, s12 in random_pairs(20000, 1):
+      meters, error = distance.flat_earth((lat1, lon1), (lat2, lon2))
+      if error is not None:
+        bounded += 1
+        self.assertLessEqual(abs(meters - s12), error)
+    self.assertGreater(bounded, 19000)
+
+  def test_short_distance_accuracy(self):
+    """Below 1 km at moderate latitudes flat_earth is good to a millimeter"""
+    for lat1, lon1, lat2, lon2, s12 in random_pairs(5000, 2, 70, 3):
+      meters, error = distance.flat_earth((lat1, lon1), (lat2, lon2))
+      self.assertLess(error, 1e-3)
+      self.assertAlmostEqual(meters, s12, delta = 1e-3)
+
+  def test_within_matches_geodesic(self):
+    """within() decides like the geodesic, including at the threshold"""
+    rng = random.Random(3)
+    for lat1, lon1, lat2, lon2, s12 in random_pairs(5000, 4, 90, 7):
+      for threshold in (s12 * (1 - 1e-9), s12 * (1 + 1e-9),
+                        s12 * rng.uniform(0.5, 2)):
+        inside, meters = distance.within((lat1, lon1), (lat2, lon2), threshold)
+        exact = Geodesic.WGS84.Inverse(lat1, lon1, lat2, lon2)['s12']
+        error = distance.flat_earth((lat1, lon1), (lat2, lon2))[1]
+        self.assertEqual(inside, exact < threshold)
+        if error is None:  # Geodesic, or chord lower bound for far points
+          self.assertLessEqual(meters, exact + 1e-6)
+        else:
+          self.assertLessEqual(abs(meters - exact), error)
+
+  def test_bound_not_applied_far_or_polar(self):
+    """Long lines and polar points have no flat-earth bound"""
+    self.assertIsNone(distance.flat_earth((0, 0), (20, 20))[1])
+    self.assertIsNone(distance.flat_earth((89.9, 0), (89.9, 1))[1])
+    self.assertEqual(distance.within((89.9, 0), (89.9, 180), 22000)[0],
+                     distance.geodesic((89.9, 0), (89.9, 180)).m < 22000)
+
+  def test_chord_lower_bound(self):
+    """The chord is never longer than the geodesic"""
+    for lat1, lon1, lat2, lon2, s12 in random_pairs(5000, 6, 90, 7.3):
+      self.assertLessEqual(distance.chord((lat1, lon1), (lat2, lon2)),
+                           s12 + 1e-6)
+
+  def test_antimeridian(self):
+    """Longitude differences are reduced across the antimeridian"""
+    meters, error = distance.flat_earth((-16.5, 179.999), (-16.5, -179.999))
+    exact = Geodesic.WGS84.Inverse(-16.5, 179.999, -16.5, -179.999)['s12']
+    self.assertLessEqual(abs(meters - exact), error)
+
+def benchmark(count = 20000):
+  """Time within() against geodesic() for points around a 200 m threshold"""
+  import time
+  pairs = [(p[:2], p[2:4]) for p in random_pairs(count, 5, 70, 3.5)]
+  start = time.perf_counter()
+  exact = [distance.geodesic(a, b).m < 200 for a, b in pairs]
+  geodesic_time = time.perf_counter() - start
+  start = time.perf_counter()
+  fast = [distance.within(a, b, 200)[0] for a, b in pairs]
+  within_time = time.perf_counter() - start
+  assert fast == exact
+  print('{} pairs: geodesic {:.1f}us, within {:.1f}us per pair ({:.0f}x faster)'
+        .format(count, geodesic_time / count * 1e6, within_time / count * 1e6,
+                geodesic_time / within_time))
+
+if __name__ == '__main__':
+  import sys
+  if sys.argv[1:] == ['bench']:
+    benchmark()
+  else:
+    unittest.main()
@@ -1,8 +1,8 @@
-import time
 import serial
 import paho.mqtt.client as mqtt
 import json
 from csclient import EventingCSClient
+from state_wait import wait_for_state
 
 cp = EventingCSClient('serial_temp')
 broker_address = '127.0.0.01'
@@ -29,22 +29,13 @@ def parse_temp(temp_str):
 
 def modem_state(cp, state, sim):
     # Blocking call that will wait until a given state is shown as the modem's status
-    timeout_counter = 0
-    sleep_seconds = 0
     conn_path = '%s/%s/status/connection_state' % ('status/wan/devices', sim)
     cp.log(f"modem_state waiting sim={sim} state={state}")
-    while True:
-        sleep_seconds += 5
-        conn_state = cp.get(conn_path).get('data', '')
-        # TODO add checking for error states
-        cp.log(f'waiting for state={state} on sim={sim} curr state={conn_state}')
-        if conn_state == state:
-            break
-        if timeout_counter > 600:
-            cp.log(f"timeout waiting on sim={sim}")
-            raise Timeout(conn_path)
-        time.sleep(min(sleep_seconds, 45))
-        timeout_counter += min(sleep_seconds, 45)
+    # TODO add checking for error states
+    cp.log(f'waiting for state={state} on sim={sim} curr state={cp.get(conn_path)}')
+    if not wait_for_state(cp, conn_path, state, timeout=600):
+        cp.log(f"timeout waiting on sim={sim}")
+        raise Timeout(conn_path)
     cp.log(f"sim={sim} connected")
     return True
 